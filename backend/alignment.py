@@ -0,0 +1,386 @@
+import re
+import unicodedata
+from bisect import bisect_left
+from itertools import islice
+from statistics import median
+from typing import Dict, List, Optional, Tuple
+
+MATCH, SUBSTITUTION, OMISSION, INSERTION = "match", "substitution", "omission", "insertion"
+
+# Number of words in the n-grams used as alignment anchors
+ANCHOR_SIZE = 3
+# Initial half-width of the diagonal band explored by the aligner
+INITIAL_BAND = 16
+# The band stops growing here; beyond it the alignment is best-in-band
+MAX_BAND = 1024
+# Dynamic programme cells one alignment may fill (about half a second of pure Python);
+# a reading that needs more does not follow the text and is left unaligned
+MAX_CELLS = 1_000_000
+
+_DIAG, _UP, _LEFT = 0, 1, 2
+_WORD_RE = re.compile(r"\S+")
+
+
+class _TooExpensive(Exception):
+    """The alignment would fill more than its budget of cells"""
+
+
+class _CellBudget:
+    def __init__(self, cells: int):
+        self.cells = cells
+
+    def take(self, cells: int) -> bool:
+        """Spend cells if that many are left"""
+        if cells > self.cells:
+            return False
+        self.cells -= cells
+        return True
+
+
+def normalize_word(word: str) -> str:
+    """Case-fold a word and drop punctuation and symbols in any script"""
+    word = unicodedata.normalize("NFKC", word).casefold()
+    return "".join(ch for ch in word if unicodedata.category(ch)[0] not in "PSZC")
+
+
+def reference_slice(reference_text: str, start: int, max_words: int) -> str:
+    """Up to max_words whitespace tokens of the text starting at token index start"""
+    return " ".join(match.group() for match in islice(_WORD_RE.finditer(reference_text), start, start + max_words))
+
+
+def word_error_rate(reference_text: str, hypothesis_text: str) -> float:
+    """Word error rate of a transcript against the text that was read"""
+    reference = [w for w in map(normalize_word, reference_text.split()) if w]
+    hypothesis = [w for w in map(normalize_word, hypothesis_text.split()) if w]
+    if not reference:
+        return float(bool(hypothesis))
+    errors = sum(1 for op, _, _ in _align(reference, hypothesis) if op != MATCH)
+    return round(errors / len(reference), 4)
+
+
+def align_transcript(reference_text: str, chunks: List[Dict], first_word: int = 0) -> Dict:
+    """Align Whisper word chunks against the reference text.
+
+    Reference words are numbered like the whitespace tokens of the text
+    (punctuation-only tokens keep their number but are not aligned), so a
+    client can map results back onto the text it renders. Returns
+    {"aligned", "accuracy", "ref_start", "ref_end", "words"} where every
+    word carries an op of match / substitution / omission / insertion.
+    When the reference is an excerpt, first_word is the number of its first
+    word in the whole text, and word numbers count from there.
+
+    A reading that shares no anchors with the text (another text, or one
+    of a few sentences repeated over and over) would need a table too large
+    to fill in reasonable time; it comes back with aligned false, accuracy 0
+    and no words.
+    """
+    reference = [
+        (index, match.group(), normalize_word(match.group()))
+        for index, match in enumerate(_WORD_RE.finditer(reference_text), first_word)
+    ]
+    reference = [word for word in reference if word[2]]
+
+    heard = []
+    for chunk in chunks:
+        for word in chunk["text"].split():
+            normalized = normalize_word(word)
+            if normalized:
+                heard.append((word, normalized, chunk["start"], chunk["end"]))
+
+    ref_start, ref_end = _locate_passage([w[2] for w in reference], [w[1] for w in heard])
+    passage = reference[ref_start:ref_end]
+    try:
+        ops = _align([w[2] for w in passage], [w[1] for w in heard], _CellBudget(MAX_CELLS))
+    except _TooExpensive:
+        return {"aligned": False, "accuracy": 0.0, "ref_start": 0, "ref_end": 0, "words": []}
+    # The reading may cover any part of the passage, so unread words before and after it are not omissions
+    ops = _strip_edge_omissions(ops)
+    aligned = [pos for _, pos, _ in ops if pos is not None]
+    first = aligned[0] if aligned else 0
+    passage = passage[first:aligned[-1] + 1] if aligned else []
+    ops = [(op, None if pos is None else pos - first, h) for op, pos, h in ops]
+
+    words = []
+    for op, ref_pos, heard_pos in ops:
+        word: Dict = {"op": op}
+        if ref_pos is not None:
+            word["ref"] = passage[ref_pos][0]
+            word["word"] = passage[ref_pos][1]
+        if heard_pos is not None:
+            word["heard"] = heard[heard_pos][0]
+            word["start"] = heard[heard_pos][2]
+            word["end"] = heard[heard_pos][3]
+        words.append(word)
+    _fill_omission_times(words)
+
+    matched = sum(1 for word in words if word["op"] == MATCH)
+    return {
+        "aligned": True,
+        "accuracy": round(matched / len(passage), 4) if passage else 0.0,
+        "ref_start": passage[0][0] if passage else 0,
+        "ref_end": passage[-1][0] + 1 if passage else 0,
+        "words": words
+    }
+
+
+def _strip_edge_omissions(ops: List[Tuple[str, Optional[int], Optional[int]]]):
+    """Drop omissions before the first and after the last heard word"""
+    heard_positions = [index for index, (op, _, _) in enumerate(ops) if op != OMISSION]
+    if not heard_positions:
+        return []
+    return ops[heard_positions[0]:heard_positions[-1] + 1]
+
+
+def _locate_passage(reference: List[str], heard: List[str]) -> Tuple[int, int]:
+    """Find the slice of the reference the speaker most likely read.
+
+    Readers often practise one passage of a long text. Unique reference
+    trigrams that also occur in the transcript vote for the offset of the passage, so the aligner
+    only has to look at that slice instead of the whole document.
+    """
+    n, m = len(reference), len(heard)
+    pad = max(16, m // 50)
+    if n <= m + 2 * pad:
+        return 0, n
+
+    positions = _unique_ngrams(reference)
+    offsets = []
+    for j in range(m - ANCHOR_SIZE + 1):
+        i = positions.get(tuple(heard[j:j + ANCHOR_SIZE]))
+        if i is not None:
+            offsets.append(i - j)
+    if not offsets:
+        return 0, n
+
+    offset = int(median(offsets))
+    return max(0, offset - pad), min(n, offset + m + pad)
+
+
+def _align(
+        reference: List[str],
+        heard: List[str],
+        budget: Optional[_CellBudget] = None
+) -> List[Tuple[str, Optional[int], Optional[int]]]:
+    """Word-level Levenshtein alignment.
+
+    Trigrams that occur exactly once on both sides and in the same order
+    are taken as anchors, and only the short gaps between anchors go
+    through the banded dynamic programme. Cost stays close to linear in
+    the text length for readings that mostly follow the text. With a
+    budget, _TooExpensive is raised before the gaps would need more cells
+    than it has left.
+    """
+    gaps = []
+    anchored = []
+    ref_done = heard_done = 0
+    for i, j in _consistent_anchors(_anchors(reference, heard)):
+        if i < ref_done or j < heard_done:
+            continue  # overlaps the previous anchor
+        gaps.append((ref_done, i, heard_done, j))
+        anchored.append([(MATCH, i + k, j + k) for k in range(ANCHOR_SIZE)])
+        ref_done, heard_done = i + ANCHOR_SIZE, j + ANCHOR_SIZE
+    gaps.append((ref_done, len(reference), heard_done, len(heard)))
+    anchored.append([])
+
+    # The narrowest band every gap needs is known up front, so a hopeless alignment stops before any work
+    if budget and not budget.take(sum(_band_cells(i_to - i_from, j_to - j_from, INITIAL_BAND)
+                                      for i_from, i_to, j_from, j_to in gaps)):
+        raise _TooExpensive()
+
+    ops = []
+    for (ref_from, ref_to, heard_from, heard_to), anchor_ops in zip(gaps, anchored):
+        ops += _align_gap(reference, heard, ref_from, ref_to, heard_from, heard_to, budget)
+        ops += anchor_ops
+
+    # An anchor off the true path makes the result worse than it should be. Any cheaper alignment
+    # lies within a band as wide as this cost, so one banded pass of that width settles it when affordable.
+    cost = sum(1 for op, _, _ in ops if op != MATCH)
+    if len(anchored) > 1 and cost and (budget is None or budget.take(_band_cells(len(reference), len(heard), cost))):
+        banded = _banded_align(reference, heard, band=cost)
+        if sum(1 for op, _, _ in banded if op != MATCH) < cost:
+            ops = banded
+    return ops
+
+
+def _unique_ngrams(words: List[str]) -> Dict[Tuple[str, ...], int]:
+    """Positions of n-grams that occur exactly once"""
+    positions: Dict[Tuple[str, ...], Optional[int]] = {}
+    for i in range(len(words) - ANCHOR_SIZE + 1):
+        ngram = tuple(words[i:i + ANCHOR_SIZE])
+        positions[ngram] = None if ngram in positions else i
+    return {ngram: i for ngram, i in positions.items() if i is not None}
+
+
+def _anchors(reference: List[str], heard: List[str]) -> List[Tuple[int, int]]:
+    """Longest chain of shared unique n-grams increasing on both sides"""
+    ref_positions = _unique_ngrams(reference)
+    pairs = sorted(
+        (j, ref_positions[ngram])
+        for ngram, j in _unique_ngrams(heard).items()
+        if ngram in ref_positions
+    )
+
+    # Longest increasing subsequence of reference positions (patience sorting)
+    tails: List[int] = []
+    tail_pairs: List[int] = []
+    previous: List[Optional[int]] = [None] * len(pairs)
+    for index, (_, i) in enumerate(pairs):
+        slot = bisect_left(tails, i)
+        if slot == len(tails):
+            tails.append(i)
+            tail_pairs.append(index)
+        else:
+            tails[slot] = i
+            tail_pairs[slot] = index
+        previous[index] = tail_pairs[slot - 1] if slot else None
+
+    chain = []
+    index = tail_pairs[-1] if tail_pairs else None
+    while index is not None:
+        j, i = pairs[index]
+        chain.append((i, j))
+        index = previous[index]
+    chain.reverse()
+    return chain
+
+
+def _consistent_anchors(chain: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Drop anchors that do not agree with a neighbour in the chain.
+
+    A trigram that happens to be unique on both sides can pair words far
+    from where they were read. Its offset i - j then differs from those of
+    the anchors around it by more than the words between them could
+    explain, while true anchors come in runs of similar offsets (a skipped
+    or repeated passage starts a new run rather than a single anchor).
+    """
+    def agree(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+        drift = abs((a[0] - a[1]) - (b[0] - b[1]))
+        return drift <= max(ANCHOR_SIZE, abs(b[1] - a[1]) // 4)
+
+    return [
+        anchor for index, anchor in enumerate(chain)
+        if (index > 0 and agree(chain[index - 1], anchor))
+        or (index + 1 < len(chain) and agree(anchor, chain[index + 1]))
+    ]
+
+
+def _align_gap(
+        reference: List[str],
+        heard: List[str],
+        ref_from: int,
+        ref_to: int,
+        heard_from: int,
+        heard_to: int,
+        budget: Optional[_CellBudget] = None
+):
+    """Align reference[ref_from:ref_to] with heard[heard_from:heard_to]"""
+    ops = _banded_align(reference[ref_from:ref_to], heard[heard_from:heard_to], budget)
+    return [
+        (op, None if i is None else i + ref_from, None if j is None else j + heard_from)
+        for op, i, j in ops
+    ]
+
+
+def _band_cells(n: int, m: int, band: int) -> int:
+    """Upper bound of the cells _banded_distance fills"""
+    return (n + 1) * min(m + 1, abs(m - n) + 2 * band + 1)
+
+
+def _banded_align(
+        reference: List[str],
+        heard: List[str],
+        budget: Optional[_CellBudget] = None,
+        band: int = INITIAL_BAND
+) -> List[Tuple[str, Optional[int], Optional[int]]]:
+    """Levenshtein alignment restricted to a diagonal band.
+
+    The band is doubled until the edit distance fits inside it, which
+    proves the result optimal. It stops growing at MAX_BAND or when the
+    budget (already charged for the first band) runs out, and the result
+    is then the best alignment inside the band.
+    """
+    while True:
+        distance, backs, row_starts = _banded_distance(reference, heard, band)
+        if distance <= band or band >= max(len(reference), len(heard)) or band >= MAX_BAND:
+            break
+        if budget and not budget.take(_band_cells(len(reference), len(heard), band * 2)):
+            break
+        band *= 2
+
+    ops = []
+    i, j = len(reference), len(heard)
+    while i > 0 or j > 0:
+        move = backs[i][j - row_starts[i]] if i > 0 else _LEFT
+        if move == _DIAG:
+            op = MATCH if reference[i - 1] == heard[j - 1] else SUBSTITUTION
+            ops.append((op, i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif move == _UP:
+            ops.append((OMISSION, i - 1, None))
+            i -= 1
+        else:
+            ops.append((INSERTION, None, j - 1))
+            j -= 1
+    ops.reverse()
+    return ops
+
+
+def _banded_distance(reference: List[str], heard: List[str], band: int):
+    """Fill the DP table only for cells with j - i inside the band"""
+    n, m = len(reference), len(heard)
+    low = min(0, m - n) - band
+    high = max(0, m - n) + band
+    infinity = n + m + 1
+
+    previous = list(range(min(m, high) + 1))
+    previous_start = 0
+    backs = [bytearray([_LEFT]) * len(previous)]
+    row_starts = [0]
+
+    for i in range(1, n + 1):
+        start = max(0, i + low)
+        end = min(m, i + high)
+        current = [infinity] * (end - start + 1)
+        back = bytearray(end - start + 1)
+        word = reference[i - 1]
+        previous_len = len(previous)
+
+        for j in range(start, end + 1):
+            k = j - start
+            p = j - previous_start
+            best = previous[p] + 1 if 0 <= p < previous_len else infinity
+            move = _UP
+            if j > 0:
+                if 0 < p <= previous_len:
+                    diagonal = previous[p - 1] + (word != heard[j - 1])
+                    if diagonal <= best:
+                        best, move = diagonal, _DIAG
+                if k > 0 and current[k - 1] + 1 < best:
+                    best, move = current[k - 1] + 1, _LEFT
+            current[k] = best
+            back[k] = move
+
+        backs.append(back)
+        row_starts.append(start)
+        previous, previous_start = current, start
+
+    return previous[m - previous_start], backs, row_starts
+
+
+def _fill_omission_times(words: List[Dict]) -> None:
+    """Give omitted words the gap between the neighbouring heard words"""
+    next_starts = []
+    next_start = None
+    for word in reversed(words):
+        if "start" in word:
+            next_start = word["start"]
+        next_starts.append(next_start)
+    next_starts.reverse()
+
+    last_end = 0.0
+    for word, next_start in zip(words, next_starts):
+        if "start" in word:
+            last_end = word["end"]
+        else:
+            word["start"] = last_end
+            word["end"] = next_start if next_start is not None else last_end
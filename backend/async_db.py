@@ -0,0 +1,38 @@
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+
+class AsyncDatabase:
+    """Awaitable view of a database service for async endpoints.
+
+    Every method of the wrapped service becomes a coroutine that runs the
+    blocking call on a dedicated thread pool, so database round trips never
+    stall the event loop and independent calls can be awaited together:
+
+        text, audio_id = await asyncio.gather(db.get_pdf_fields(...), db.get_idempotent_audio_id(...))
+    """
+
+    def __init__(self, service: Any, workers: int):
+        self.service = service
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+
+    def __getattr__(self, name: str):
+        method = getattr(self.service, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            # Keep context variables (e.g. request tracing) visible to the call, like asyncio.to_thread
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(context.run, method, *args, **kwargs)
+            )
+
+        return call
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
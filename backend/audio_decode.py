@@ -0,0 +1,98 @@
+import tempfile
+import threading
+import subprocess
+from typing import Iterator, List
+
+import numpy as np
+
+# Whisper models expect 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+
+class AudioFormatError(Exception):
+    """Raised when uploaded audio cannot be decoded"""
+
+
+def decode_audio(audio_bytes: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode any ffmpeg-readable audio into a mono float32 waveform.
+
+    The upload is piped through a single ffmpeg process, so nothing touches
+    the filesystem and the container format is detected from the bytes
+    rather than from the file name.
+    """
+    try:
+        process = subprocess.run(_ffmpeg_command(sample_rate), input=audio_bytes, capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise AudioFormatError(e.stderr.decode("utf-8", errors="replace").strip()) from e
+
+    if not process.stdout:
+        raise AudioFormatError("No audio stream found")
+    return np.frombuffer(process.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def decode_audio_stream(
+        audio_bytes: bytes,
+        sample_rate: int = SAMPLE_RATE,
+        block_seconds: float = 1.0
+) -> Iterator[np.ndarray]:
+    """Decode audio like decode_audio, yielding the waveform in blocks.
+
+    Blocks are produced while ffmpeg is still decoding, so the whole
+    waveform of a long recording is never held in memory at once.
+    """
+    # ffmpeg's messages go to a file: nobody reads a stderr pipe while stdout is read, so a full one would block ffmpeg
+    errors = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        _ffmpeg_command(sample_rate),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=errors
+    )
+    # Feed stdin from a thread so a full stdout pipe cannot deadlock the two
+    writer = threading.Thread(target=_feed, args=(process.stdin, audio_bytes), daemon=True)
+    writer.start()
+
+    block_bytes = int(block_seconds * sample_rate) * 2
+    produced = False
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            data = data[:len(data) - len(data) % 2]
+            if not data:
+                break
+            produced = True
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        writer.join()
+        returncode = process.wait()
+        errors.seek(0)
+        stderr = errors.read()
+        errors.close()
+
+    if returncode != 0:
+        raise AudioFormatError(stderr.decode("utf-8", errors="replace").strip())
+    if not produced:
+        raise AudioFormatError("No audio stream found")
+
+
+def _ffmpeg_command(sample_rate: int) -> List[str]:
+    """ffmpeg reading any container from stdin and writing 16-bit mono PCM to stdout"""
+    return [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "pipe:1"
+    ]
+
+
+def _feed(pipe, data: bytes) -> None:
+    try:
+        pipe.write(data)
+    except BrokenPipeError:
+        pass  # ffmpeg stopped reading: bad input, or the consumer gave up
+    finally:
+        try:
+            pipe.close()
+        except BrokenPipeError:
+            pass
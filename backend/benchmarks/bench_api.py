@@ -0,0 +1,263 @@
+"""Load-test the API offline: latency percentiles, throughput and peak memory per endpoint.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_api --concurrency 1 8 32 --output results.json
+    python -m benchmarks.bench_api --engine whisper --model tiny --scenarios upload_audio --concurrency 1 4
+
+Starts uvicorn in a subprocess with the in-memory database (MEMORY_DB_LATENCY_MS
+simulates Firebase round trips), a temporary blob store, no transcription
+cache and the model-free fake engine or a real (tiny) model. It seeds the
+database with the multilingual corpus from benchmarks/corpus.py, then
+drives every scenario at every concurrency level with httpx over loopback.
+The JSON report has, per scenario and concurrency, p50/p95/p99 latency,
+throughput, status codes and the API's peak memory (the API process plus
+its transcription workers and PDF extractors). It includes the commit and
+configuration, so reports of two commits can be compared side by side.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import itertools
+import subprocess
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+from benchmarks import corpus
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Scenarios:
+    """Requests of each scenario; the i-th request of a run picks its inputs round-robin"""
+
+    def __init__(self, max_audio_seconds: float):
+        self.texts = list(corpus.texts().items())
+        self.pdfs = list(corpus.pdfs().items())
+        self.recordings = [r for r in corpus.recordings() if r["seconds"] <= max_audio_seconds]
+        self.pdf_ids: List[str] = []
+
+    async def seed(self, client: httpx.AsyncClient, documents: int) -> None:
+        for i in range(documents):
+            language, text = self.texts[i % len(self.texts)]
+            response = await client.post("/upload_pdf", data={"text": text, "user_id": f"user{i % 10}"})
+            response.raise_for_status()
+            self.pdf_ids.append(response.json()["pdf_id"])
+
+    async def upload_pdf_text(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        language, text = self.texts[i % len(self.texts)]
+        return await client.post("/upload_pdf", data={"text": text, "user_id": f"user{i % 10}"})
+
+    async def upload_pdf_file(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        language, pdf_bytes = self.pdfs[i % len(self.pdfs)]
+        return await client.post(
+            "/upload_pdf",
+            files={"file": (f"{language}.pdf", pdf_bytes, "application/pdf")},
+            data={"user_id": f"user{i % 10}"}
+        )
+
+    async def upload_audio(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        recording = self.recordings[i % len(self.recordings)]
+        return await client.post(
+            f"/upload_audio/{self.pdf_ids[i % len(self.pdf_ids)]}",
+            files={"audio": (recording["name"], recording["audio_bytes"], recording["content_type"])},
+            data={"uploader_id": f"reader{i}", "guided": "true"}
+        )
+
+    async def list_pdfs(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.get("/pdfs", params={"page": i % 5 + 1, "only_mine": "true", "user_id": f"user{i % 10}"})
+
+    async def pdf_data(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.get(f"/pdf_data/{self.pdf_ids[i % len(self.pdf_ids)]}", params={"fields": "text,language"})
+
+    async def recordings_list(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.get(f"/pdf_data/{self.pdf_ids[i % len(self.pdf_ids)]}/recordings")
+
+
+SCENARIOS = ["upload_pdf_text", "upload_pdf_file", "upload_audio", "list_pdfs", "pdf_data", "recordings_list"]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def process_tree(pid: int) -> List[int]:
+    """pid and all of its descendants (Linux /proc)"""
+    pids, queue = [], [pid]
+    while queue:
+        current = queue.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    queue += [int(child) for child in f.read().split()]
+        except OSError:
+            pass
+    return pids
+
+
+def peak_memory_mb(pid: int) -> float:
+    """Sum of the peak resident sizes of the API process and its children"""
+    total_kb = 0
+    for process in process_tree(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                total_kb += next((int(line.split()[1]) for line in f if line.startswith("VmHWM:")), 0)
+        except OSError:
+            pass
+    return round(total_kb / 1024, 1)
+
+
+def start_server(args, blob_dir: str) -> subprocess.Popen:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        args.port = s.getsockname()[1]
+    env = {
+        **os.environ,
+        "DATABASE_BACKEND": "memory",
+        "MEMORY_DB_LATENCY_MS": str(args.db_latency_ms),
+        "BLOB_STORE_PATH": blob_dir,
+        "TRANSCRIBE_CACHE_PATH": "",
+        "TRANSCRIBE_ENGINE": args.engine,
+        "WHISPER_MODEL": args.model,
+        "TRANSCRIBE_WORKERS": str(args.workers),
+        # Requests beyond the queue would be rejected with 503 instead of measured
+        "TRANSCRIBE_QUEUE_SIZE": str(max(args.concurrency)),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if server.poll() is not None:
+            raise RuntimeError("API process exited during startup")
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("API did not become ready")
+
+
+async def run_scenario(client, request, concurrency: int, count: int) -> Dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    indices = itertools.count()
+
+    async def worker():
+        while (i := next(indices)) < count:
+            started = time.perf_counter()
+            try:
+                status = (await request(client, i)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": count,
+        "errors": sum(n for status, n in statuses.items() if not status.startswith("2")),
+        "status_codes": dict(statuses),
+        "throughput_rps": round(count / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1)
+        }
+    }
+
+
+async def run(args) -> Dict:
+    scenarios = Scenarios(args.max_audio_seconds)
+    with tempfile.TemporaryDirectory() as blob_dir:
+        server = start_server(args, blob_dir)
+        try:
+            limits = httpx.Limits(max_connections=max(args.concurrency))
+            async with httpx.AsyncClient(
+                    base_url=f"http://127.0.0.1:{args.port}", timeout=args.timeout, limits=limits
+            ) as client:
+                ready_seconds = await wait_ready(client, server, args.timeout)
+                await scenarios.seed(client, args.documents)
+                results = []
+                for name in args.scenarios:
+                    count = args.audio_requests if name == "upload_audio" else args.requests
+                    for concurrency in args.concurrency:
+                        result = await run_scenario(client, getattr(scenarios, name), concurrency, count)
+                        results.append({"scenario": name, **result, "peak_memory_mb": peak_memory_mb(server.pid)})
+                        print(f"{name} x{concurrency}: p50 {result['latency_ms']['p50']} ms, "
+                              f"{result['throughput_rps']} req/s", file=sys.stderr)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        "commit": git_commit(),
+        "config": {
+            "engine": args.engine,
+            "model": args.model,
+            "workers": args.workers,
+            "db_latency_ms": args.db_latency_ms,
+            "documents": args.documents,
+            "max_audio_seconds": args.max_audio_seconds,
+            "cpu_count": os.cpu_count()
+        },
+        "ready_seconds": round(ready_seconds, 2),
+        "results": results
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per run of the light scenarios")
+    parser.add_argument("--audio-requests", type=int, default=16, help="requests per run of upload_audio")
+    parser.add_argument("--max-audio-seconds", type=float, default=20, help="longest corpus recording uploaded")
+    parser.add_argument("--documents", type=int, default=60, help="documents stored before the runs")
+    parser.add_argument("--engine", default="fake", help="fake, or a real engine such as whisper")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--workers", type=int, default=1, help="transcription worker processes")
+    parser.add_argument("--db-latency-ms", type=float, default=0)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
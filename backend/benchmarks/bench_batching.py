@@ -0,0 +1,67 @@
+"""Measure the batch size / latency tradeoff of batched transcription.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_batching voice1.ogg voice2.ogg ... --batch-sizes 1 2 4 8 16
+
+Loads the model in this process the way a pool worker does and feeds the
+given recordings through transcribe_batch_job in batches of each size.
+Reports recordings per minute and per-batch latency. In the API a request
+additionally waits up to TRANSCRIBE_BATCH_WAIT_MS for its batch to fill.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from itertools import cycle, islice
+
+import settings
+import transcription
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--recordings", type=int, default=32, help="recordings transcribed per batch size")
+    parser.add_argument("--engine", default=settings.TRANSCRIBE_ENGINE)
+    parser.add_argument("--model", default=settings.WHISPER_MODEL)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    recordings = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            recordings.append((f.read(), None))
+    workload = list(islice(cycle(recordings), args.recordings))
+
+    transcription._init_worker(args.model, args.threads, None, engine_name=args.engine)
+    transcription.transcribe_batch_job(workload[:1])  # warm-up
+
+    results = []
+    for batch_size in args.batch_sizes:
+        latencies = []
+        started = time.perf_counter()
+        for offset in range(0, len(workload), batch_size):
+            batch_started = time.perf_counter()
+            transcription.transcribe_batch_job(workload[offset:offset + batch_size])
+            latencies.append(time.perf_counter() - batch_started)
+        elapsed = time.perf_counter() - started
+        results.append({
+            "batch_size": batch_size,
+            "recordings_per_minute": len(workload) / elapsed * 60,
+            "batch_latency_p50_s": statistics.median(latencies),
+            "batch_latency_max_s": max(latencies)
+        })
+
+    json.dump(
+        {"engine": args.engine, "model": args.model, "threads": args.threads, "results": results},
+        sys.stdout,
+        indent=2
+    )
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Count database round trips and latency of the API's database operations.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_database --latency-ms 40 --documents 200 --concurrency 16
+
+Runs FirebaseService against the in-memory database with a simulated
+network round trip, so no Firebase project is needed. For each operation
+it reports round trips per call and mean latency, with the read-through
+cache on and off; the last section awaits concurrent reads through
+AsyncDatabase the way async endpoints do.
+"""
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+
+import settings
+from async_db import AsyncDatabase
+from firebase_service import FirebaseService
+from memory_db import MemoryDatabase
+from ttl_cache import TTLCache
+
+
+def measure(database, name, calls):
+    """Round trips and latency of a list of zero-argument callables"""
+    calls_before = database.calls
+    timings = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return {
+        "operation": name,
+        "calls": len(calls),
+        "round_trips_per_call": (database.calls - calls_before) / len(calls),
+        "mean_ms": statistics.mean(timings) * 1000
+    }
+
+
+def run_operations(args, cache_size):
+    database = MemoryDatabase(args.latency_ms)
+    service = FirebaseService(database.reference)
+    service.field_cache = TTLCache(cache_size, settings.DATABASE_CACHE_TTL)
+    service.listing_cache = TTLCache(cache_size, settings.DATABASE_CACHE_TTL)
+    pdf_ids = [str(uuid.uuid4()) for _ in range(args.documents)]
+
+    results = [
+        measure(database, "save_pdf_data", [
+            lambda pdf_id=pdf_id, i=i: service.save_pdf_data({
+                "pdf_blob": {"sha256": pdf_id}, "text": "word " * 500, "user_id": f"user{i % 10}",
+                "errors": [], "audio_recordings": {}, "page_count": 1
+            }, pdf_id, ["word " * 500])
+            for i, pdf_id in enumerate(pdf_ids)
+        ]),
+        measure(database, "get_pdf_fields(text, language)", [
+            lambda pdf_id=pdf_id: service.get_pdf_fields(pdf_id, ["text", "language"]) for pdf_id in pdf_ids * 2
+        ]),
+        measure(database, "save_audio_data", [
+            lambda pdf_id=pdf_id: service.save_audio_data(pdf_id, {
+                "uploader_id": "reader", "chunks": [{"text": "word", "start": 0.0, "end": 0.5}] * 100,
+                "alignment": {"ref_end": 100}, "accuracy": 1.0, "semantic_ok": True
+            })
+            for pdf_id in pdf_ids
+        ]),
+        measure(database, "list_pdf_summaries", [
+            lambda page=page: service.list_pdf_summaries(page_size=10, page=page) for page in [1, 2, 3] * 20
+        ]),
+    ]
+    return {"cache_size": cache_size, "operations": results}
+
+
+async def run_concurrent(args):
+    database = MemoryDatabase(args.latency_ms)
+    service = FirebaseService(database.reference)
+    pdf_id = str(uuid.uuid4())
+    service.save_pdf_data({"text": "word", "user_id": "user", "audio_recordings": {}}, pdf_id)
+    async_db = AsyncDatabase(service, args.concurrency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        async_db.get_reading_position(pdf_id, f"reader{i}") for i in range(args.concurrency * 4)
+    ))
+    elapsed = time.perf_counter() - started
+    async_db.shutdown()
+    return {
+        "operation": "get_reading_position via AsyncDatabase",
+        "calls": args.concurrency * 4,
+        "threads": args.concurrency,
+        "wall_seconds": elapsed,
+        "sequential_seconds_estimate": args.concurrency * 4 * args.latency_ms / 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=settings.DATABASE_WORKERS)
+    args = parser.parse_args()
+
+    results = {
+        "latency_ms": args.latency_ms,
+        "cached": run_operations(args, settings.DATABASE_CACHE_SIZE),
+        "uncached": run_operations(args, 0),
+        "concurrent": asyncio.run(run_concurrent(args))
+    }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Compare the in-memory ffmpeg decode with the previous temp-file path.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_decode recording.ogg [audio.mp3 ...] --repeat 10
+
+The previous path wrote the upload to disk, converted OGG to WAV with pydub
+and let whisper spawn ffmpeg again on the WAV. It needs pydub and
+openai-whisper installed; the new path only needs ffmpeg.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import statistics
+
+from audio_decode import decode_audio
+
+
+def legacy_decode(audio_bytes: bytes, filename: str):
+    """Decode the way AudioService did before the in-memory pipeline"""
+    import whisper
+    from pydub import AudioSegment
+
+    temp_audio_path = f"temp_{uuid.uuid4().hex}_{filename}"
+    wav_temp_audio_path = None
+    try:
+        with open(temp_audio_path, "wb") as f:
+            f.write(audio_bytes)
+        if filename.lower().endswith(".ogg"):
+            wav_temp_audio_path = temp_audio_path.replace(".ogg", ".wav")
+            AudioSegment.from_file(temp_audio_path, format="ogg").export(wav_temp_audio_path, format="wav")
+            return whisper.load_audio(wav_temp_audio_path)
+        return whisper.load_audio(temp_audio_path)
+    finally:
+        for path in (temp_audio_path, wav_temp_audio_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def measure(fn, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        "mean_ms": statistics.mean(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "max_ms": max(timings) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time the new decoder")
+    args = parser.parse_args()
+
+    results = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            audio_bytes = f.read()
+        filename = os.path.basename(path)
+        audio = decode_audio(audio_bytes)
+        result = {
+            "file": filename,
+            "bytes": len(audio_bytes),
+            "audio_seconds": len(audio) / 16000,
+            "in_memory": measure(lambda: decode_audio(audio_bytes), args.repeat)
+        }
+        if not args.skip_legacy:
+            result["legacy"] = measure(lambda: legacy_decode(audio_bytes, filename), args.repeat)
+            result["speedup"] = result["legacy"]["mean_ms"] / result["in_memory"]["mean_ms"]
+        results.append(result)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare transcription engines on real-time factor, memory and word timestamps.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_engines voice1.ogg voice2.ogg --engines whisper faster-whisper
+
+Each engine runs in its own subprocess so peak RSS covers only that engine.
+Real-time factor is processing time divided by audio duration (lower is
+faster). Word timestamp drift is measured against the first engine: words
+are aligned like a reading against its reference text, and drift is the
+start time difference of matching words.
+"""
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+
+import settings
+from alignment import MATCH, align_transcript
+from audio_decode import SAMPLE_RATE, decode_audio
+from engines import create_engine
+
+
+def run_engine(engine_name, model_name, threads, files):
+    """Transcribe the files with one engine and return timings and words"""
+    started = time.perf_counter()
+    engine = create_engine(engine_name, model_name, threads)
+    load_seconds = time.perf_counter() - started
+
+    recordings = []
+    for path in files:
+        with open(path, "rb") as f:
+            audio = decode_audio(f.read())
+        started = time.perf_counter()
+        result = engine.transcribe(audio, {})
+        elapsed = time.perf_counter() - started
+        recordings.append({
+            "file": path,
+            "rtf": elapsed / (len(audio) / SAMPLE_RATE),
+            "words": [
+                {"text": word["word"], "start": word["start"], "end": word["end"]}
+                for segment in result["segments"]
+                for word in segment.get("words", [])
+            ]
+        })
+
+    return {
+        "engine": engine_name,
+        "load_seconds": load_seconds,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "recordings": recordings
+    }
+
+
+def timestamp_drift(baseline_words, words):
+    """Start time differences of the words both engines recognised identically"""
+    reference_text = " ".join("".join(word["text"].split()) or "-" for word in baseline_words)
+    alignment = align_transcript(reference_text, words)
+    return [
+        abs(word["start"] - baseline_words[word["ref"]]["start"])
+        for word in alignment["words"]
+        if word["op"] == MATCH
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--engines", nargs="+", default=["whisper", "faster-whisper"])
+    parser.add_argument("--model", default=settings.WHISPER_MODEL)
+    parser.add_argument("--threads", type=int, default=settings.TORCH_THREADS)
+    parser.add_argument("--run-engine", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_engine:
+        json.dump(run_engine(args.run_engine, args.model, args.threads, args.files), sys.stdout)
+        return
+
+    runs = []
+    for engine_name in args.engines:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_engines", *args.files,
+             "--run-engine", engine_name, "--model", args.model, "--threads", str(args.threads)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        runs.append(json.loads(output))
+
+    baseline = runs[0]
+    results = []
+    for run in runs:
+        rtfs = [recording["rtf"] for recording in run["recordings"]]
+        drift = []
+        for recording, baseline_recording in zip(run["recordings"], baseline["recordings"]):
+            drift += timestamp_drift(baseline_recording["words"], recording["words"])
+        results.append({
+            "engine": run["engine"],
+            "load_seconds": run["load_seconds"],
+            "peak_rss_mb": run["peak_rss_mb"],
+            "rtf_mean": statistics.mean(rtfs),
+            "rtf_max": max(rtfs),
+            "drift_vs": baseline["engine"],
+            "matched_words": len(drift),
+            "drift_mean_s": statistics.mean(drift) if drift else None,
+            "drift_max_s": max(drift) if drift else None
+        })
+
+    json.dump({"model": args.model, "threads": args.threads, "results": results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare unguided and reference-guided transcription on a fixed corpus.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_guided corpus.jsonl --repeat 3
+
+Each line of the corpus is {"audio": <path>, "text": <reference text>} with
+an optional "language". Paths are relative to the corpus file. Both modes
+run through transcribe_job in this process with the model loaded the way a
+pool worker does, and report latency plus word error rate against the text.
+The guided mode gets the same options as an upload with guided=true.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import settings
+import transcription
+from alignment import word_error_rate
+
+
+def run(corpus, make_options, repeat):
+    latencies = []
+    errors = []
+    for entry in corpus:
+        options = make_options(entry)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = transcription.transcribe_job(entry["audio_bytes"], options)
+            latencies.append(time.perf_counter() - started)
+        errors.append(word_error_rate(entry["text"], result["text"]))
+    return {
+        "latency_p50_s": statistics.median(latencies),
+        "latency_mean_s": statistics.mean(latencies),
+        "latency_max_s": max(latencies),
+        "wer_mean": statistics.mean(errors),
+        "wer_per_recording": errors
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--engine", default=settings.TRANSCRIBE_ENGINE)
+    parser.add_argument("--model", default=settings.WHISPER_MODEL)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.abspath(args.corpus))
+    corpus = []
+    with open(args.corpus) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                with open(os.path.join(base_dir, entry["audio"]), "rb") as audio:
+                    entry["audio_bytes"] = audio.read()
+                corpus.append(entry)
+
+    transcription._init_worker(args.model, args.threads, None, engine_name=args.engine)
+    transcription.transcribe_job(corpus[0]["audio_bytes"])  # warm-up
+
+    results = {
+        "unguided": run(corpus, lambda entry: None, args.repeat),
+        "guided": run(
+            corpus,
+            lambda entry: transcription.guided_options(
+                entry["text"], entry.get("language"), prompt_words=settings.GUIDED_PROMPT_WORDS
+            ),
+            args.repeat
+        )
+    }
+    json.dump({"engine": args.engine, "model": args.model, "recordings": len(corpus), "results": results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
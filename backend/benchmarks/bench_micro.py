@@ -0,0 +1,124 @@
+"""Micro-benchmarks of the CPU-bound steps of the pipelines on the fixed corpus.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_micro --repeat 5 --output micro.json
+    python -m benchmarks.bench_micro --only align decode
+
+Times PDF text extraction, text-to-PDF rendering, audio decoding and
+transcript alignment in this process, one input of the corpus at a time,
+and reports per-input timings plus a throughput figure (pages, seconds of
+audio or words per second) as JSON, next to the commit it was measured on.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+import settings
+from alignment import align_transcript
+from audio_decode import decode_audio
+from benchmarks import corpus
+from benchmarks.bench_api import git_commit
+from pdf_render import PdfRenderer
+from pdf_text import count_pages, extract_page_range
+
+
+def timed(function, repeat):
+    """(result of the last call, list of call durations)"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - started)
+    return result, durations
+
+
+def summary(name, durations, units, unit_name):
+    return {
+        "input": name,
+        "mean_ms": round(statistics.mean(durations) * 1000, 2),
+        "min_ms": round(min(durations) * 1000, 2),
+        f"{unit_name}_per_second": round(units / statistics.mean(durations), 1)
+    }
+
+
+def bench_extract(repeat):
+    results = []
+    for language, pdf_bytes in corpus.pdfs(sentences=400).items():
+        pages = count_pages(pdf_bytes)
+        _, durations = timed(lambda: extract_page_range(pdf_bytes, 0, pages), repeat)
+        results.append(summary(language, durations, pages, "pages"))
+    return results
+
+
+def bench_render(repeat):
+    results = []
+    for language, text in corpus.texts(sentences=400).items():
+        # A fresh renderer per run, so the layout cache does not turn later runs into lookups
+        (_, pages), durations = timed(
+            lambda: PdfRenderer(settings.PDF_FONTS, settings.PDF_FONT_SIZE).render(text), repeat
+        )
+        results.append(summary(language, durations, len(pages), "pages"))
+    return results
+
+
+def bench_decode(repeat):
+    results = []
+    for recording in corpus.recordings():
+        _, durations = timed(lambda: decode_audio(recording["audio_bytes"]), repeat)
+        results.append(summary(recording["name"], durations, recording["seconds"], "audio_seconds"))
+    return results
+
+
+def bench_align(repeat):
+    """Align a reading of part of each text with a tenth of the words misread.
+
+    The last input repeats a few sentences over and over (think of a poem
+    with a refrain): without unique phrases to anchor on, alignment falls
+    back to one banded table over the whole text, bounded by MAX_CELLS.
+    """
+    inputs = [
+        (language, text) for language, text in corpus.texts(sentences=400).items()
+        if language != "zh"  # written without spaces: a whole sentence is one reference word
+    ]
+    inputs.append(("en, repeated sentences", corpus.make_text("en", 100, shuffle_words=False)))
+
+    results = []
+    rng = random.Random(0)
+    for name, text in inputs:
+        words = text.split()
+        start = len(words) // 3
+        read = [w if rng.random() > 0.1 else "x" + w for w in words[start:start + 300]]
+        chunks = [{"text": f" {word}", "start": i * 0.4, "end": i * 0.4 + 0.3} for i, word in enumerate(read)]
+        _, durations = timed(lambda: align_transcript(text, chunks), repeat)
+        results.append(summary(f"{name} ({len(words)} reference words)", durations, len(read), "words"))
+    return results
+
+
+BENCHMARKS = {"extract": bench_extract, "render": bench_render, "decode": bench_decode, "align": bench_align}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "repeat": args.repeat,
+        "results": {name: BENCHMARKS[name](args.repeat) for name in args.only}
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Measure text-to-PDF rendering speed in pages per second.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_render --megabytes 1 4 --scripts latin cyrillic cjk --repeat 3
+    python -m benchmarks.bench_render --file book.txt
+
+Generated texts are paragraphs of random words in the given script. The
+first run of every text uses a fresh renderer (cold font, width and
+layout caches); later runs reuse it, like requests served by one process.
+--legacy also times the previous renderer, which drew every input line
+with drawString and neither wrapped lines nor embedded fonts.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from io import BytesIO
+
+import settings
+from pdf_render import PdfRenderer
+
+ALPHABETS = {
+    "latin": "abcdefghijklmnopqrstuvwxyz",
+    "cyrillic": "абвгдеёжзийклмнопрстуфхцчшщыьэюя",
+    "cjk": "的一是不了人我在有他这中大来上国个到说们为子和你地出道也时年得就那要下以生会自着去之过家学对可她里后小么心多天而能好都然没日于起还发成事只作当想看文无开手十用主行方又如前所本见经头面公同三已老从动两长知民样现",
+}
+
+
+def generate_text(script: str, megabytes: float, seed: int = 0) -> str:
+    """Paragraphs of random words until the UTF-8 text reaches the size"""
+    rng = random.Random(seed)
+    alphabet = ALPHABETS[script]
+    words = ["".join(rng.choices(alphabet, k=rng.randint(2, 9))) for _ in range(5000)]
+    # CJK is written without spaces between words
+    separator = "" if script == "cjk" else " "
+
+    paragraphs, size = [], 0
+    while size < megabytes * 1024 * 1024:
+        paragraph = separator.join(rng.choices(words, k=rng.randint(20, 120))) + "."
+        paragraphs.append(paragraph)
+        size += len(paragraph.encode()) + 1
+    return "\n".join(paragraphs)
+
+
+def legacy_render(text: str) -> bytes:
+    """Render the way FileService did before the layout engine"""
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer)
+    y = 800
+    for line in text.splitlines():
+        c.drawString(50, y, line)
+        y -= 15
+        if y < 50:
+            c.showPage()
+            y = 800
+    c.save()
+    return buffer.getvalue()
+
+
+def measure(name, text, repeat, legacy):
+    renderer = PdfRenderer(settings.PDF_FONTS, settings.PDF_FONT_SIZE, settings.PDF_LAYOUT_CACHE_SIZE)
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pdf_bytes, pages = renderer.render(text)
+        runs.append(time.perf_counter() - started)
+
+    megabytes = len(text.encode()) / 1024 / 1024
+    result = {
+        "text": name,
+        "text_mb": round(megabytes, 2),
+        "pages": len(pages),
+        "pdf_mb": round(len(pdf_bytes) / 1024 / 1024, 2),
+        "cold_seconds": runs[0],
+        "cold_pages_per_second": len(pages) / runs[0],
+        "layout_cache": renderer.wrap.cache_info()._asdict()
+    }
+    if len(runs) > 1:
+        warm = statistics.median(runs[1:])
+        result.update({"warm_seconds": warm, "warm_pages_per_second": len(pages) / warm})
+    if legacy:
+        started = time.perf_counter()
+        legacy_render(text)
+        result["legacy_seconds"] = time.perf_counter() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", nargs="*", default=[])
+    parser.add_argument("--megabytes", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--scripts", nargs="+", default=["latin", "cyrillic", "cjk"], choices=sorted(ALPHABETS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    texts = []
+    for path in args.file:
+        with open(path, encoding="utf-8") as f:
+            texts.append((path, f.read()))
+    if not args.file:
+        texts = [
+            (f"{script}-{megabytes}mb", generate_text(script, megabytes))
+            for script in args.scripts
+            for megabytes in args.megabytes
+        ]
+
+    results = [measure(name, text, args.repeat, args.legacy) for name, text in texts]
+    json.dump({"fonts": settings.PDF_FONTS, "results": results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measure API cold start and transcription worker memory.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup --workers 2 --start-methods spawn forkserver
+
+Reports the time and peak RSS of importing main in a fresh interpreter,
+then for every start method the time until all workers have loaded the
+model and each worker's RSS and PSS. PSS splits shared pages between the
+processes sharing them, so it shows the saving of copy-on-write weights.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+
+import settings
+from transcription import TranscriptionPool
+
+IMPORT_PROBE = (
+    "import time, resource; started = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+
+
+def measure_import():
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], check=True, capture_output=True, text=True
+    ).stdout.split()
+    return {
+        "interpreter_seconds": time.perf_counter() - started,
+        "import_main_seconds": float(output[0]),
+        "peak_rss_mb": int(output[1]) / 1024
+    }
+
+
+def memory_mb(pid):
+    """RSS and PSS of a process from /proc (Linux only)"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss"):
+                values[name.lower() + "_mb"] = int(rest.split()[0]) / 1024
+    return values
+
+
+async def measure_pool(start_method, args):
+    pool = TranscriptionPool(
+        model_name=args.model,
+        workers=args.workers,
+        queue_size=0,
+        torch_threads=args.threads,
+        engine_name=args.engine,
+        start_method=start_method,
+        preload_model=True
+    )
+    started = time.perf_counter()
+    await pool.warm_up()
+    ready_seconds = time.perf_counter() - started
+    workers = [memory_mb(pid) for pid in pool.worker_pids()]
+    pool.shutdown()
+    return {
+        "start_method": start_method,
+        "ready": pool.ready,
+        "ready_seconds": ready_seconds,
+        "workers": workers,
+        "total_pss_mb": sum(worker.get("pss_mb", 0) for worker in workers)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--start-methods", nargs="+", default=["spawn", "forkserver"])
+    parser.add_argument("--engine", default=settings.TRANSCRIBE_ENGINE)
+    parser.add_argument("--model", default=settings.WHISPER_MODEL)
+    parser.add_argument("--threads", type=int, default=settings.TORCH_THREADS)
+    args = parser.parse_args()
+
+    # The fork server preloads the model named in the environment
+    os.environ["TRANSCRIBE_ENGINE"] = args.engine
+    os.environ["WHISPER_MODEL"] = args.model
+
+    results = {"import": measure_import(), "pools": []}
+    for start_method in args.start_methods:
+        results["pools"].append(asyncio.run(measure_pool(start_method, args)))
+
+    json.dump({"engine": args.engine, "model": args.model, **results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Fixed multilingual corpus for the offline benchmarks.
+
+Everything is generated from seeds, so every run and every commit sees
+the same texts, PDFs and recordings without shipping binary fixtures.
+Texts are drawn from the words of a few sentences per language; PDFs
+are those texts rendered by PdfRenderer; recordings are speech-like
+signals (syllable-length harmonic bursts separated by pauses) encoded by
+ffmpeg as OGG/Opus, like Telegram voice notes, and as MP3.
+"""
+import random
+import subprocess
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+
+import settings
+from audio_decode import SAMPLE_RATE
+from pdf_render import PdfRenderer
+
+SENTENCES = {
+    "en": [
+        "The old lighthouse keeper climbed the stairs every evening before sunset.",
+        "Children in the village learned to read from the books he kept on a shelf.",
+        "When the storm came, the light was the only thing the sailors could see.",
+        "She opened the window and listened to the rain falling on the roof.",
+    ],
+    "ru": [
+        "Старый смотритель маяка каждый вечер поднимался по лестнице перед закатом.",
+        "Дети в деревне учились читать по книгам, которые он хранил на полке.",
+        "Когда пришёл шторм, свет маяка был единственным, что видели моряки.",
+        "Она открыла окно и слушала, как дождь стучит по крыше.",
+    ],
+    "de": [
+        "Der alte Leuchtturmwärter stieg jeden Abend vor Sonnenuntergang die Treppe hinauf.",
+        "Die Kinder im Dorf lernten mit den Büchern lesen, die er im Regal aufbewahrte.",
+        "Als der Sturm kam, war das Licht das Einzige, was die Seeleute sehen konnten.",
+        "Sie öffnete das Fenster und hörte dem Regen auf dem Dach zu.",
+    ],
+    "es": [
+        "El viejo farero subía las escaleras cada tarde antes de la puesta del sol.",
+        "Los niños del pueblo aprendieron a leer con los libros que guardaba en un estante.",
+        "Cuando llegó la tormenta, la luz era lo único que los marineros podían ver.",
+        "Ella abrió la ventana y escuchó la lluvia que caía sobre el tejado.",
+    ],
+    "zh": [
+        "老灯塔看守人每天傍晚在日落之前爬上楼梯。",
+        "村里的孩子们用他放在书架上的书学习阅读。",
+        "暴风雨来临时，灯光是水手们唯一能看到的东西。",
+        "她打开窗户，听着雨水落在屋顶上的声音。",
+    ],
+    "ar": [
+        "كان حارس المنارة العجوز يصعد الدرج كل مساء قبل غروب الشمس.",
+        "تعلم أطفال القرية القراءة من الكتب التي كان يحتفظ بها على الرف.",
+        "عندما جاءت العاصفة كان الضوء هو الشيء الوحيد الذي يراه البحارة.",
+        "فتحت النافذة واستمعت إلى المطر وهو يسقط على السطح.",
+    ],
+}
+LANGUAGES = list(SENTENCES)
+
+# Recording lengths in seconds; the longest one spans several Whisper windows
+RECORDING_SECONDS = (5, 20, 75)
+AUDIO_FORMATS = {
+    "ogg": (["-c:a", "libopus", "-b:a", "32k", "-f", "ogg"], "audio/ogg"),
+    "mp3": (["-c:a", "libmp3lame", "-b:a", "64k", "-f", "mp3"], "audio/mpeg"),
+}
+
+
+def make_text(language: str, sentences: int, seed: int = 0, shuffle_words: bool = True) -> str:
+    """Paragraphs of sentences in one language.
+
+    With shuffle_words every sentence is a random draw from the words of
+    the language's sentences, so the text does not repeat itself the way
+    the few source sentences would; without it whole sentences repeat.
+    """
+    rng = random.Random(f"{language}:{seed}")
+    source = SENTENCES[language]
+    if language == "zh":
+        # Written without spaces: draw characters instead of words
+        vocabulary = [char for sentence in source for char in sentence.rstrip("。")]
+        draw = lambda: "".join(rng.sample(vocabulary, rng.randint(8, 20))) + "。"
+    else:
+        vocabulary = [word.strip(".,") for sentence in source for word in sentence.split()]
+        draw = lambda: " ".join(rng.sample(vocabulary, rng.randint(6, 14))) + "."
+    chosen = [draw() if shuffle_words else rng.choice(source) for _ in range(sentences)]
+    separator = "" if language == "zh" else " "
+    return "\n".join(separator.join(chosen[i:i + 5]) for i in range(0, len(chosen), 5))
+
+
+def make_waveform(seconds: float, seed: int = 0) -> np.ndarray:
+    """Speech-like 16 kHz signal: bursts of a few harmonics with pauses between phrases"""
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), np.float32)
+    position = 0
+    while position < len(audio):
+        phrase_end = min(len(audio), position + int(rng.uniform(1.5, 4.0) * SAMPLE_RATE))
+        while position < phrase_end:
+            length = min(phrase_end - position, int(rng.uniform(0.12, 0.3) * SAMPLE_RATE))
+            t = np.arange(length) / SAMPLE_RATE
+            pitch = rng.uniform(110, 220)
+            burst = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 5))
+            audio[position:position + length] = 0.2 * burst * np.hanning(length)
+            position += length + int(rng.uniform(0.02, 0.08) * SAMPLE_RATE)
+        position += int(rng.uniform(0.4, 0.9) * SAMPLE_RATE)  # pause between phrases
+    return audio
+
+
+def encode(audio: np.ndarray, audio_format: str) -> bytes:
+    """Encode a waveform with ffmpeg"""
+    arguments, _ = AUDIO_FORMATS[audio_format]
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes()
+    return subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1",
+         "-i", "pipe:0", *arguments, "pipe:1"],
+        input=pcm, capture_output=True, check=True
+    ).stdout
+
+
+@lru_cache(maxsize=None)
+def texts(sentences: int = 40) -> Dict[str, str]:
+    """One text per language"""
+    return {language: make_text(language, sentences) for language in LANGUAGES}
+
+
+@lru_cache(maxsize=None)
+def pdfs(sentences: int = 40) -> Dict[str, bytes]:
+    """The texts rendered to PDF, one per language"""
+    renderer = PdfRenderer(settings.PDF_FONTS, settings.PDF_FONT_SIZE)
+    return {language: renderer.render(text)[0] for language, text in texts(sentences).items()}
+
+
+@lru_cache(maxsize=None)
+def recordings() -> List[Dict]:
+    """Every recording length in every format: [{name, seconds, format, content_type, audio_bytes}]"""
+    result = []
+    for index, seconds in enumerate(RECORDING_SECONDS):
+        waveform = make_waveform(seconds, seed=index)
+        for audio_format, (_, content_type) in AUDIO_FORMATS.items():
+            result.append({
+                "name": f"{seconds}s.{audio_format}",
+                "seconds": seconds,
+                "format": audio_format,
+                "content_type": content_type,
+                "audio_bytes": encode(waveform, audio_format)
+            })
+    return result
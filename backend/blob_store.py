@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, Optional
+
+import settings
+
+CHUNK_SIZE = 64 * 1024
+
+
+def is_valid_digest(digest: str) -> bool:
+    """Check that a string looks like a hex SHA-256 digest"""
+    return len(digest) == 64 and all(c in "0123456789abcdef" for c in digest)
+
+
+class BlobStore(ABC):
+    """Content-addressed storage for uploaded files.
+
+    Blobs are keyed by the SHA-256 of their bytes, so storing the same file
+    twice keeps a single copy. The database only holds the reference
+    returned by put().
+    """
+
+    def put(self, data: bytes, content_type: str) -> Dict:
+        """Store bytes and return a reference for the database"""
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.exists(digest):
+            self._write(digest, data, content_type)
+        return {"sha256": digest, "size": len(data), "content_type": content_type}
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        """Check whether a blob is stored"""
+
+    @abstractmethod
+    def info(self, digest: str) -> Optional[Dict]:
+        """Return {"size", "content_type"} of a blob or None"""
+
+    @abstractmethod
+    def iter_range(self, digest: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the bytes start..end (inclusive) of a blob in chunks"""
+
+    @abstractmethod
+    def _write(self, digest: str, data: bytes, content_type: str) -> None:
+        """Persist a blob that is not stored yet"""
+
+    def read(self, digest: str) -> bytes:
+        """Return the whole blob"""
+        return b"".join(self.iter_range(digest))
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store on the local filesystem, sharded by digest prefix"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def info(self, digest: str) -> Optional[Dict]:
+        path = self._path(digest)
+        if not os.path.exists(path):
+            return None
+        with open(path + ".meta") as f:
+            meta = json.load(f)
+        return {"size": os.path.getsize(path), "content_type": meta["content_type"]}
+
+    def iter_range(self, digest: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self._path(digest), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def _write(self, digest: str, data: bytes, content_type: str) -> None:
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".meta", "w") as f:
+            json.dump({"content_type": content_type}, f)
+        # Write to a temp file first so readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+
+BLOB_STORES = {
+    "local": lambda: LocalBlobStore(settings.BLOB_STORE_PATH),
+}
+
+
+def create_blob_store() -> BlobStore:
+    """Build the blob store selected by BLOB_STORE_BACKEND"""
+    return BLOB_STORES[settings.BLOB_STORE_BACKEND]()
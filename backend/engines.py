@@ -0,0 +1,303 @@
+import sys
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import settings
+from audio_decode import SAMPLE_RATE
+
+# Whisper decodes audio in windows of 30 seconds (3000 mel frames)
+WINDOW_SECONDS = 30
+FRAMES_PER_WINDOW = 3000
+
+# Called with (windows done, windows total) while a recording is transcribed
+ProgressCallback = Callable[[int, int], None]
+
+
+class TranscriptionEngine(ABC):
+    """Speech recognition backend used by the transcription workers.
+
+    Every engine returns whisper's result layout: {"text", "language",
+    "segments"} where each segment has start, end, text and a "words" list
+    of {"word", "start", "end", "probability"}. Options are whisper
+    transcribe() arguments (language, initial_prompt, temperature).
+    """
+
+    name: str
+
+    def __init__(self, model_name: str, threads: int):
+        self.model_name = model_name
+        self.threads = threads
+
+    @abstractmethod
+    def transcribe(self, audio: np.ndarray, options: Dict, progress: Optional[ProgressCallback] = None) -> Dict:
+        """Transcribe a 16 kHz mono waveform with word timestamps"""
+
+    def transcribe_batch(self, audios: List[np.ndarray], options: Dict) -> List[Dict]:
+        """Transcribe several waveforms that share the same options"""
+        return [self.transcribe(audio, options) for audio in audios]
+
+    def set_threads(self, threads: int) -> None:
+        """Change the number of inference threads"""
+        self.threads = threads
+
+
+class _WindowProgress:
+    """Stand-in for whisper's tqdm bar that reports decoded windows"""
+
+    callback: Optional[ProgressCallback] = None
+
+    def __init__(self, total: int = 0, **kwargs):
+        self.total = total
+        self.n = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def update(self, n: int = 1) -> None:
+        self.n += n
+        if _WindowProgress.callback:
+            _WindowProgress.callback(
+                math.ceil(self.n / FRAMES_PER_WINDOW),
+                math.ceil(self.total / FRAMES_PER_WINDOW)
+            )
+
+
+class _ProgressModule:
+    tqdm = _WindowProgress
+
+
+class WhisperEngine(TranscriptionEngine):
+    """openai-whisper on PyTorch, fp32 on the CPU"""
+
+    name = "whisper"
+
+    def __init__(self, model_name: str, threads: int):
+        super().__init__(model_name, threads)
+        import torch
+        import whisper
+
+        torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_name, device="cpu", in_memory=False)
+        # whisper only reports progress through tqdm, so route it to the callback
+        sys.modules["whisper.transcribe"].tqdm = _ProgressModule
+
+    def set_threads(self, threads: int) -> None:
+        import torch
+
+        super().set_threads(threads)
+        torch.set_num_threads(threads)
+
+    def transcribe(self, audio: np.ndarray, options: Dict, progress: Optional[ProgressCallback] = None) -> Dict:
+        _WindowProgress.callback = progress
+        try:
+            return self.model.transcribe(audio, word_timestamps=True, fp16=False, **options)
+        finally:
+            _WindowProgress.callback = None
+
+    def transcribe_batch(self, audios: List[np.ndarray], options: Dict) -> List[Dict]:
+        """Decode recordings that fit into one window together, longer ones one by one"""
+        results: List[Optional[Dict]] = [None] * len(audios)
+        short = []
+        for index, audio in enumerate(audios):
+            if len(audio) <= WINDOW_SECONDS * SAMPLE_RATE:
+                short.append(index)
+            else:
+                results[index] = self.transcribe(audio, options)
+        if short:
+            for index, result in zip(short, self._transcribe_window_batch([audios[i] for i in short], options)):
+                results[index] = result
+        return results
+
+    def _transcribe_window_batch(self, audios: List[np.ndarray], options: Dict) -> List[Dict]:
+        """Greedy-decode single-window recordings as one batch, with word timestamps"""
+        import torch
+        import whisper
+        from whisper.timing import add_word_timestamps
+        from whisper.tokenizer import get_tokenizer
+
+        mels = [
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=self.model.dims.n_mels)
+            for audio in audios
+        ]
+        decoding_options = whisper.DecodingOptions(
+            fp16=False,
+            without_timestamps=True,
+            temperature=0.0,
+            language=options.get("language"),
+            prompt=options.get("initial_prompt")
+        )
+        decoded = whisper.decode(self.model, torch.stack(mels), decoding_options)
+
+        transcriptions = []
+        for audio, mel, result in zip(audios, mels, decoded):
+            duration = len(audio) / SAMPLE_RATE
+            segment = {
+                "id": 0,
+                "seek": 0,
+                "start": 0.0,
+                "end": duration,
+                "text": result.text,
+                "tokens": result.tokens,
+                "temperature": result.temperature,
+                "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio,
+                "no_speech_prob": result.no_speech_prob
+            }
+            tokenizer = get_tokenizer(
+                self.model.is_multilingual,
+                num_languages=self.model.num_languages,
+                language=result.language,
+                task="transcribe"
+            )
+            add_word_timestamps(
+                segments=[segment],
+                model=self.model,
+                tokenizer=tokenizer,
+                mel=mel,
+                num_frames=len(audio) // whisper.audio.HOP_LENGTH,
+                last_speech_timestamp=0.0
+            )
+            transcriptions.append({"text": result.text, "segments": [segment], "language": result.language})
+        return transcriptions
+
+
+class FasterWhisperEngine(TranscriptionEngine):
+    """faster-whisper (CTranslate2) with int8-quantized weights on the CPU"""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_name: str, threads: int, compute_type: str = "int8"):
+        super().__init__(model_name, threads)
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=threads)
+
+    def transcribe(self, audio: np.ndarray, options: Dict, progress: Optional[ProgressCallback] = None) -> Dict:
+        # Greedy decoding like openai-whisper's transcribe(), not faster-whisper's default beam of 5
+        segments, info = self.model.transcribe(audio, word_timestamps=True, beam_size=1, best_of=1, **options)
+        windows_total = math.ceil(info.duration / WINDOW_SECONDS)
+
+        result_segments = []
+        for segment in segments:  # a generator: decoding happens while iterating
+            result_segments.append({
+                "id": segment.id,
+                "seek": segment.seek,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "tokens": list(segment.tokens),
+                "temperature": segment.temperature,
+                "avg_logprob": segment.avg_logprob,
+                "compression_ratio": segment.compression_ratio,
+                "no_speech_prob": segment.no_speech_prob,
+                "words": [
+                    {"word": word.word, "start": word.start, "end": word.end, "probability": word.probability}
+                    for word in segment.words or []
+                ]
+            })
+            if progress:
+                progress(min(windows_total, math.ceil(segment.end / WINDOW_SECONDS)), windows_total)
+
+        return {
+            "text": "".join(segment["text"] for segment in result_segments),
+            "segments": result_segments,
+            "language": info.language
+        }
+
+
+class FakeEngine(TranscriptionEngine):
+    """Model-free engine for offline benchmarks and load tests.
+
+    Keeps the CPU busy for real_time_factor times the audio duration, like
+    inference would, and returns a whisper-shaped result with one word every
+    WORD_SECONDS. The words repeat the initial prompt when there is one (a
+    guided upload then reads as correct), otherwise they are placeholders.
+    """
+
+    name = "fake"
+    WORD_SECONDS = 0.4
+
+    def __init__(self, model_name: str, threads: int, real_time_factor: float = 0.1):
+        super().__init__(model_name, threads)
+        self.real_time_factor = real_time_factor
+
+    def transcribe(self, audio: np.ndarray, options: Dict, progress: Optional[ProgressCallback] = None) -> Dict:
+        duration = len(audio) / SAMPLE_RATE
+        windows_total = max(1, math.ceil(duration / WINDOW_SECONDS))
+        vocabulary = (options.get("initial_prompt") or "").split() or ["word"]
+
+        segments = []
+        word_count = 0
+        for window in range(windows_total):
+            started = time.perf_counter()
+            window_start = window * WINDOW_SECONDS
+            window_end = min(duration, window_start + WINDOW_SECONDS)
+            words = []
+            position = window_start
+            while position + self.WORD_SECONDS <= window_end:
+                words.append({
+                    "word": f" {vocabulary[word_count % len(vocabulary)]}",
+                    "start": round(position, 2),
+                    "end": round(position + self.WORD_SECONDS * 0.8, 2),
+                    "probability": 1.0
+                })
+                word_count += 1
+                position += self.WORD_SECONDS
+            segments.append({
+                "id": window, "seek": window * FRAMES_PER_WINDOW, "start": window_start, "end": window_end,
+                "text": "".join(word["word"] for word in words), "tokens": [], "temperature": 0.0,
+                "avg_logprob": 0.0, "compression_ratio": 1.0, "no_speech_prob": 0.0, "words": words
+            })
+            # Busy-wait rather than sleep: a fake that sleeps would not compete for the CPU
+            deadline = started + (window_end - window_start) * self.real_time_factor
+            while time.perf_counter() < deadline:
+                pass
+            if progress:
+                progress(window + 1, windows_total)
+
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": options.get("language") or "en"
+        }
+
+
+# Engines whose loaded model keeps working in a process forked after loading
+PRELOADABLE_ENGINES = {"whisper"}
+
+# Models loaded before worker processes were forked, by (engine, model)
+_preloaded: Dict[Tuple[str, str], TranscriptionEngine] = {}
+
+ENGINES = {
+    "whisper": lambda model_name, threads: WhisperEngine(model_name, threads),
+    "faster-whisper": lambda model_name, threads: FasterWhisperEngine(
+        model_name, threads, settings.FASTER_WHISPER_COMPUTE_TYPE
+    ),
+    "fake": lambda model_name, threads: FakeEngine(model_name, threads, settings.FAKE_ENGINE_REAL_TIME_FACTOR),
+}
+
+
+def create_engine(name: str, model_name: str, threads: int) -> TranscriptionEngine:
+    """Build the engine selected by TRANSCRIBE_ENGINE, reusing a preloaded model"""
+    engine = _preloaded.get((name, model_name))
+    if engine:
+        engine.set_threads(threads)
+        return engine
+    return ENGINES[name](model_name, threads)
+
+
+def preload_engine(name: str, model_name: str) -> None:
+    """Load a model in a process that will fork the workers.
+
+    Loading runs single-threaded so no OpenMP thread pool exists at fork
+    time; each worker sets its own thread count in create_engine().
+    """
+    if name in PRELOADABLE_ENGINES:
+        _preloaded[(name, model_name)] = ENGINES[name](model_name, 1)
@@ -0,0 +1,402 @@
+import time
+import uuid
+import logging
+from typing import Any, Callable, Optional, Dict, Iterator, List, Tuple
+
+from fastapi import HTTPException
+
+import settings
+from repository import Repository, make_index_key, make_recording_summary, make_summary
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Document fields that are written once on upload (or only changed through
+# FirebaseService), so they can be served from the read-through cache
+CACHED_FIELDS = {"text", "user_id", "created_at", "index_key", "language", "pdf_blob", "page_count"}
+
+
+def make_page_key(index: int) -> str:
+    """Key of a page text that sorts in page order"""
+    return f"{index:05d}"
+
+
+def make_pages_entry(pages: List[str]) -> Dict:
+    """Stored form of the page texts of a PDF"""
+    return {"count": len(pages), "pages": {make_page_key(index): text for index, text in enumerate(pages)}}
+
+
+def increment(delta: int = 1) -> Dict:
+    """Server-side counter increment, usable inside multi-path updates"""
+    return {".sv": {"increment": delta}}
+
+
+class FirebaseService(Repository):
+    """Service for Firebase Realtime Database operations.
+
+    Methods block on network round trips; async code calls them through
+    AsyncDatabase. Every write is a single multi-path update with counters
+    incremented on the server. Stable document fields and listing pages are
+    kept in a read-through cache that this instance clears on its own
+    writes; other processes see changes after DATABASE_CACHE_TTL at most.
+    """
+
+    def __init__(self, reference: Optional[Callable[..., Any]] = None):
+        self.field_cache = TTLCache(settings.DATABASE_CACHE_SIZE, settings.DATABASE_CACHE_TTL)
+        self.listing_cache = TTLCache(settings.DATABASE_CACHE_SIZE, settings.DATABASE_CACHE_TTL)
+        self._initialize_firebase(reference)
+
+    def _initialize_firebase(self, reference: Optional[Callable[..., Any]] = None):
+        """Initialize Firebase app with credentials, or use the given db.reference stand-in"""
+        try:
+            if reference is None:
+                reference = self._connect()
+
+            self.root_ref = reference()
+            self.pdf_db_ref = reference("pdf_files")
+            self.pdf_index_ref = reference("pdf_index")
+            self.user_pdf_index_ref = reference("user_pdf_index")
+            self.pdf_counts_ref = reference("pdf_index_counts")
+            self.recording_index_ref = reference("recording_index")
+            self.idempotency_ref = reference("idempotency_keys")
+            self.pdf_pages_ref = reference("pdf_pages")
+        except Exception as e:
+            logger.error(f"Firebase initialization failed: {str(e)}")
+            raise
+
+    @staticmethod
+    def _connect() -> Callable[..., Any]:
+        """db.reference of the configured Firebase project"""
+        # firebase_admin pulls in the Google API client stack, so import it only when used
+        import firebase_admin
+        from firebase_admin import _http_client, credentials, db
+        from requests.adapters import HTTPAdapter
+
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(settings.FIREBASE_CRED_PATH)
+            firebase_admin.initialize_app(cred, {
+                "databaseURL": settings.DATABASE_URL,
+                "httpTimeout": settings.FIREBASE_TIMEOUT_SECONDS
+            })
+        # All references share one session; by default it keeps only 10 connections alive,
+        # fewer than the threads calling it
+        try:
+            db.reference()._client.session.mount("https://", HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=settings.FIREBASE_HTTP_POOL_SIZE,
+                max_retries=_http_client.DEFAULT_RETRY_CONFIG
+            ))
+        except AttributeError:
+            logger.warning("Could not resize the Firebase connection pool")
+        return db.reference
+
+    def save_pdf_data(self, data: Dict, pdf_id: str, pages: Optional[List[str]] = None) -> None:
+        """Save PDF data and its listing entry to database.
+
+        pages, if given, are stored like save_pdf_pages in the same update.
+        """
+        try:
+            data = {**data, "created_at": data.get("created_at") or time.time()}
+            data["index_key"] = make_index_key(data["created_at"], pdf_id)
+            self._write_document(pdf_id, data, pages)
+        except Exception as e:
+            logger.error(f"Failed to save PDF data: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to save PDF data")
+
+    def _write_document(self, pdf_id: str, data: Dict, pages: Optional[List[str]] = None) -> None:
+        """Write a document together with its index entries and counters in one update"""
+        summary = make_summary(pdf_id, data)
+        index_key = data["index_key"]
+        updates = {
+            f"pdf_files/{pdf_id}": data,
+            f"pdf_index/{index_key}": summary,
+            f"user_pdf_index/{data.get('user_id')}/{index_key}": summary,
+            "pdf_index_counts/total": increment(),
+            f"pdf_index_counts/users/{data.get('user_id')}": increment()
+        }
+        if pages is not None:
+            updates[f"pdf_pages/{data['pdf_blob']['sha256']}"] = make_pages_entry(pages)
+        self.root_ref.update(updates)
+        self.listing_cache.clear()
+        for field in CACHED_FIELDS & data.keys():
+            if data[field] is not None:
+                self.field_cache.put((pdf_id, field), data[field])
+
+    def save_audio_data(
+            self,
+            pdf_id: str,
+            audio_data: Dict,
+            idempotency_key: Optional[str] = None,
+            audio_id: Optional[str] = None
+    ) -> str:
+        """Save audio data to database and bump the document's recording count.
+
+        An idempotency key (see make_idempotency_key) is recorded in the same
+        update, so a retried upload can be answered with this audio_id. Pass
+        the audio_id of a recording opened with start_recording to complete it.
+        """
+        try:
+            audio_id = audio_id or str(uuid.uuid4())
+            audio_data = {**audio_data, "created_at": audio_data.get("created_at") or time.time()}
+            updates = {
+                f"pdf_files/{pdf_id}/audio_recordings/{audio_id}": audio_data,
+                f"recording_index/{pdf_id}/{make_index_key(audio_data['created_at'], audio_id)}":
+                    make_recording_summary(audio_id, audio_data)
+            }
+            if idempotency_key:
+                updates[f"idempotency_keys/{pdf_id}/{idempotency_key}"] = audio_id
+            document = self.get_pdf_fields(pdf_id, ["index_key", "user_id"])
+            index_key = document.get("index_key")
+            if index_key:
+                updates[f"pdf_index/{index_key}/recordings_count"] = increment()
+                updates[f"user_pdf_index/{document.get('user_id')}/{index_key}/recordings_count"] = increment()
+            self.root_ref.update(updates)
+            self.listing_cache.clear()
+            return audio_id
+        except Exception as e:
+            logger.error(f"Failed to save audio data: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to save audio data")
+
+    def save_pdf_pages(self, digest: str, pages: List[str]) -> None:
+        """Store the page texts of a PDF under the SHA-256 of the file"""
+        self.pdf_pages_ref.child(digest).set(make_pages_entry(pages))
+
+    def get_pdf_pages(self, digest: str, start: int = 0, end: Optional[int] = None) -> Optional[List[str]]:
+        """Page texts start..end-1 of a stored PDF, or None if it was never extracted"""
+        pages_ref = self.pdf_pages_ref.child(digest)
+        # Page texts never change for a file hash
+        count = self.field_cache.get(("pdf_pages", digest))
+        if count is None:
+            count = pages_ref.child("count").get()
+            if count is None:
+                return None
+            self.field_cache.put(("pdf_pages", digest), count)
+        end = count if end is None else min(end, count)
+        if start >= end:
+            return []
+        query = pages_ref.child("pages").order_by_key().start_at(make_page_key(start)).end_at(make_page_key(end - 1))
+        entries = query.get() or {}
+        if isinstance(entries, list):
+            # Page keys are integers to Firebase, so a range from page 0 comes back as an array
+            entries = {make_page_key(index): text for index, text in enumerate(entries) if text is not None}
+        return [entries.get(make_page_key(index), "") for index in range(start, end)]
+
+    def start_recording(self, pdf_id: str, audio_data: Dict) -> str:
+        """Create a recording that is still being transcribed.
+
+        It is left out of the recording index until save_audio_data
+        completes it; until then chunks are added with append_recording_chunks.
+        """
+        audio_id = str(uuid.uuid4())
+        self.pdf_db_ref.child(pdf_id).child("audio_recordings").child(audio_id).set(
+            {**audio_data, "status": "transcribing"}
+        )
+        return audio_id
+
+    def append_recording_chunks(self, pdf_id: str, audio_id: str, first_index: int, chunks: List[Dict]) -> None:
+        """Write chunks of a recording in progress, starting at list position first_index"""
+        self.pdf_db_ref.child(pdf_id).child("audio_recordings").child(audio_id).child("chunks").update({
+            str(first_index + offset): chunk for offset, chunk in enumerate(chunks)
+        })
+
+    def delete_recording(self, pdf_id: str, audio_id: str) -> None:
+        """Remove a recording that was never completed"""
+        self.pdf_db_ref.child(pdf_id).child("audio_recordings").child(audio_id).delete()
+
+    def get_pdf(self, pdf_id: str) -> Dict:
+        """Retrieve PDF data from database"""
+        try:
+            data = self.pdf_db_ref.child(pdf_id).get()
+            if not data:
+                raise HTTPException(status_code=404, detail="PDF not found")
+            return data
+        except Exception as e:
+            logger.error(f"Failed to get PDF data: {str(e)}")
+            raise
+
+    def get_pdf_fields(self, pdf_id: str, fields: List[str]) -> Dict:
+        """Retrieve only the given fields of a document.
+
+        A field may be a path into the document, e.g. audio_recordings/<id>/chunks.
+        Fields that are not stored are left out. CACHED_FIELDS are read
+        through the field cache.
+        """
+        try:
+            doc_ref = self.pdf_db_ref.child(pdf_id)
+            data = {}
+            for field in fields:
+                cached = field.split("/")[0] in CACHED_FIELDS
+                value = self.field_cache.get((pdf_id, field)) if cached else None
+                if value is None:
+                    value = doc_ref.child(field).get()
+                    if value is not None and cached:
+                        self.field_cache.put((pdf_id, field), value)
+                if value is not None:
+                    data[field] = value
+            # Only an empty result needs the extra round trip to tell a missing document apart
+            if not data and not doc_ref.get(shallow=True):
+                raise HTTPException(status_code=404, detail="PDF not found")
+            return data
+        except Exception as e:
+            logger.error(f"Failed to get PDF data: {str(e)}")
+            raise
+
+    def list_recordings(self, pdf_id: str, page: int, page_size: int) -> Tuple[List[Dict], int]:
+        """List recording summaries of a document newest first.
+
+        Returns (items, total).
+        """
+        ref = self.recording_index_ref.child(pdf_id)
+        keys = sorted((ref.get(shallow=True) or {}).keys(), reverse=True)
+        page_keys = keys[(page - 1) * page_size:page * page_size]
+        if not page_keys:
+            return [], len(keys)
+        entries = ref.order_by_key().start_at(page_keys[-1]).end_at(page_keys[0]).get() or {}
+        return [entries[key] for key in page_keys if key in entries], len(keys)
+
+    def get_idempotent_audio_id(self, pdf_id: str, idempotency_key: str) -> Optional[str]:
+        """audio_id of the recording saved earlier under an idempotency key"""
+        return self.idempotency_ref.child(pdf_id).child(idempotency_key).get()
+
+    def get_reading_position(self, pdf_id: str, uploader_id: str, lookback: int = 20) -> int:
+        """Index of the reference word after the uploader's latest recording.
+
+        Only the newest lookback recording summaries are checked; 0 means the
+        uploader has not read this document recently.
+        """
+        entries = self.recording_index_ref.child(pdf_id).order_by_key().limit_to_last(lookback).get() or {}
+        for summary in reversed(list(entries.values())):
+            if summary.get("uploader_id") == uploader_id and summary.get("ref_end") is not None:
+                return summary["ref_end"]
+        return 0
+
+    def set_pdf_language(self, pdf_id: str, language: str) -> None:
+        """Remember the spoken language detected for a document"""
+        self.pdf_db_ref.child(pdf_id).child("language").set(language)
+        self.field_cache.pop((pdf_id, "language"))
+
+    def get_recording_chunks(self, pdf_id: str, audio_id: str) -> List[Dict]:
+        """Retrieve the word chunks of one recording"""
+        try:
+            recording_ref = self.pdf_db_ref.child(pdf_id).child("audio_recordings").child(audio_id)
+            if not recording_ref.get(shallow=True):
+                raise HTTPException(status_code=404, detail="Recording not found")
+            return recording_ref.child("chunks").get() or []
+        except Exception as e:
+            logger.error(f"Failed to get recording chunks: {str(e)}")
+            raise
+
+    def list_pdf_summaries(
+            self,
+            page_size: int,
+            user_id: Optional[str] = None,
+            page: int = 1,
+            cursor: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str], int]:
+        """List documents newest first from the summary index.
+
+        With a cursor (the index key of the last item already shown) only the
+        next page is fetched. Page numbers are resolved through the cursor
+        ending the previous page when that page was served recently, so
+        paging through in order stays as cheap; otherwise the first
+        page * page_size index entries are read, which is refused beyond
+        LISTING_MAX_PAGE_OFFSET entries. Pages are cached until the next write.
+        Returns (items, next_cursor, total).
+        """
+        cache_key = (user_id, page, page_size, cursor)
+        cached = self.listing_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        ref = self.user_pdf_index_ref.child(user_id) if user_id else self.pdf_index_ref
+        query = ref.order_by_key()
+        start = cursor
+        if start is None and page > 1:
+            start = self.listing_cache.get((user_id, "page_end", page - 1, page_size))
+        if start:
+            query = query.end_at(start)
+            skip = 0
+            limit = page_size + 2  # the cursor itself plus one lookahead item
+        else:
+            skip = (page - 1) * page_size
+            if skip > settings.LISTING_MAX_PAGE_OFFSET:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Pages past the first {settings.LISTING_MAX_PAGE_OFFSET} documents are read with cursor"
+                )
+            limit = page * page_size + 1
+
+        entries = list(reversed(list((query.limit_to_last(limit).get() or {}).items())))
+        if start and entries and entries[0][0] == start:
+            entries = entries[1:]
+        entries = entries[skip:]
+
+        page_entries = entries[:page_size]
+        next_cursor = page_entries[-1][0] if len(entries) > page_size else None
+
+        count_ref = self.pdf_counts_ref.child("users").child(user_id) if user_id else self.pdf_counts_ref.child("total")
+        total = count_ref.get() or 0
+        result = [summary for _, summary in page_entries], next_cursor, total
+        self.listing_cache.put(cache_key, result)
+        if cursor is None and next_cursor:
+            self.listing_cache.put((user_id, "page_end", page, page_size), next_cursor)
+        return result
+
+    def iter_documents(self) -> Iterator[Tuple[str, Dict]]:
+        """Yield (pdf_id, document) for every stored document, one read per document"""
+        for pdf_id in (self.pdf_db_ref.get(shallow=True) or {}):
+            data = self.pdf_db_ref.child(pdf_id).get()
+            if data:
+                yield pdf_id, data
+
+    def import_document(self, pdf_id: str, data: Dict) -> None:
+        """Store a document with its recordings as they are"""
+        self.pdf_db_ref.child(pdf_id).set(data)
+        self.field_cache.clear()
+
+    def rebuild_index(self) -> int:
+        """Recreate listing entries and counters for every stored document"""
+        self.pdf_index_ref.delete()
+        self.user_pdf_index_ref.delete()
+        self.pdf_counts_ref.delete()
+        self.recording_index_ref.delete()
+
+        pdf_ids = list((self.pdf_db_ref.get(shallow=True) or {}).keys())
+        user_counts: Dict[str, int] = {}
+        for pdf_id in pdf_ids:
+            doc_ref = self.pdf_db_ref.child(pdf_id)
+            data = {
+                "user_id": doc_ref.child("user_id").get(),
+                "text": doc_ref.child("text").get(),
+                "created_at": doc_ref.child("created_at").get(),
+                "audio_recordings": doc_ref.child("audio_recordings").get(shallow=True)
+            }
+            index_key = make_index_key(data["created_at"], pdf_id)
+            summary = make_summary(pdf_id, data)
+            self.root_ref.update({
+                f"pdf_files/{pdf_id}/index_key": index_key,
+                f"pdf_index/{index_key}": summary,
+                f"user_pdf_index/{data['user_id']}/{index_key}": summary
+            })
+            user_counts[str(data["user_id"])] = user_counts.get(str(data["user_id"]), 0) + 1
+
+            recordings_ref = doc_ref.child("audio_recordings")
+            for audio_id in (data["audio_recordings"] or {}):
+                recording_ref = recordings_ref.child(audio_id)
+                recording = {
+                    field: recording_ref.child(field).get()
+                    for field in ("uploader_id", "created_at", "audio_blob", "semantic_ok", "accuracy")
+                }
+                recording["chunks"] = recording_ref.child("chunks").get(shallow=True)
+                recording["alignment"] = {"ref_end": recording_ref.child("alignment").child("ref_end").get()}
+                key = make_index_key(recording["created_at"], audio_id)
+                self.recording_index_ref.child(pdf_id).child(key).set(make_recording_summary(audio_id, recording))
+
+        self.pdf_counts_ref.set({"total": len(pdf_ids), "users": user_counts})
+        self.field_cache.clear()
+        self.listing_cache.clear()
+        return len(pdf_ids)
+
+    def cache_stats(self) -> Dict:
+        """Size and hit counters of the read-through caches"""
+        return {"fields": self.field_cache.stats(), "listings": self.listing_cache.stats()}
@@ -0,0 +1,177 @@
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import ipaddress
+import urllib.parse
+import urllib.request
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+TERMINAL_STATUSES = (DONE, FAILED)
+
+
+class CallbackUrlError(ValueError):
+    """Raised for a webhook URL the server must not call"""
+
+
+def check_callback_url(url: str, allowed_hosts: Sequence[str] = ()) -> None:
+    """Make sure a client-supplied webhook URL points to a host the server may call.
+
+    Only http and https are accepted. With allowed_hosts the host must be one
+    of them (an entry starting with a dot also matches its subdomains);
+    without, every address the host resolves to must be public, so a job
+    cannot be used to reach localhost or the internal network. Blocks on DNS.
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise CallbackUrlError("callback_url must be an http or https URL")
+    host = parts.hostname.lower()
+    if allowed_hosts:
+        if not any(host == entry or (entry.startswith(".") and host.endswith(entry)) for entry in allowed_hosts):
+            raise CallbackUrlError("callback_url host is not allowed")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 443, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise CallbackUrlError("callback_url host does not resolve")
+    if not all(ipaddress.ip_address(address.split("%")[0]).is_global for address in addresses):
+        raise CallbackUrlError("callback_url host is not public")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Webhooks are not redirected: the target was checked, where it redirects to was not"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+class JobService:
+    """In-memory registry of background jobs with progress and result push"""
+
+    def __init__(self, ttl_seconds: int = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, Dict] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def create(self, callback_url: Optional[str] = None, **meta) -> Dict:
+        """Register a new queued job"""
+        self._purge_expired()
+        now = time.time()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "status": QUEUED,
+            "progress": {"stage": QUEUED},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            **meta
+        }
+        if callback_url:
+            job["callback_url"] = callback_url
+        self._jobs[job["job_id"]] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job snapshot or None"""
+        return self._jobs.get(job_id)
+
+    def find(self, **meta) -> Optional[Dict]:
+        """Return the newest job with the given metadata that has not failed"""
+        for job in reversed(list(self._jobs.values())):
+            if job["status"] != FAILED and all(job.get(k) == v for k, v in meta.items()):
+                return job
+        return None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of known jobs by status"""
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        for job in self._jobs.values():
+            counts[job["status"]] += 1
+        return counts
+
+    def start(self, job_id: str, work: Callable[[], Awaitable[Dict]]) -> None:
+        """Run work() in the background and record its outcome on the job"""
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id, work))
+
+    async def _run(self, job_id: str, work: Callable[[], Awaitable[Dict]]) -> None:
+        self.update(job_id, status=RUNNING)
+        try:
+            result = await work()
+            self.update(job_id, status=DONE, result=result, progress={"stage": DONE})
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logger.error(f"Job {job_id} failed: {detail}")
+            self.update(job_id, status=FAILED, error=detail)
+        finally:
+            self._tasks.pop(job_id, None)
+
+        job = self._jobs[job_id]
+        if job.get("callback_url"):
+            await asyncio.to_thread(self._post_callback, job)
+
+    def update(self, job_id: str, **fields) -> None:
+        """Change job fields and notify subscribers"""
+        job = self._jobs.get(job_id)
+        if not job:
+            return
+        job.update(fields)
+        job["updated_at"] = time.time()
+        for queue in self._subscribers.get(job_id, []):
+            queue.put_nowait(dict(job))
+
+    def report_progress(self, job_id: str, event: Dict) -> None:
+        """Merge a progress event into the job"""
+        job = self._jobs.get(job_id)
+        if job and job["status"] not in TERMINAL_STATUSES:
+            self.update(job_id, progress={**job["progress"], **event})
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict]:
+        """Yield job snapshots until the job finishes"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        try:
+            job = dict(self._jobs[job_id])
+            while True:
+                yield job
+                if job["status"] in TERMINAL_STATUSES:
+                    return
+                job = await queue.get()
+        finally:
+            self._subscribers[job_id].remove(queue)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    @staticmethod
+    def _post_callback(job: Dict) -> None:
+        """POST the finished job to its webhook"""
+        try:
+            request = urllib.request.Request(
+                job["callback_url"],
+                data=json.dumps(job).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            with _callback_opener.open(request, timeout=10):
+                pass
+        except Exception as e:
+            logger.warning(f"Webhook for job {job['job_id']} failed: {str(e)}")
+
+    def _purge_expired(self) -> None:
+        """Forget finished jobs older than the TTL"""
+        deadline = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in TERMINAL_STATUSES and job["updated_at"] < deadline
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
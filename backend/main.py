@@ -1,170 +1,150 @@
-import os
+import re
+import json
+import time
+import asyncio
 import uuid
-import base64
 import logging
-from io import BytesIO
-from typing import Optional, List, Dict, Any
+import mimetypes
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any, Callable, Tuple
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-import PyPDF2
-from reportlab.pdfgen import canvas
-import whisper
-from pydub import AudioSegment
-import firebase_admin
-from firebase_admin import credentials, db
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse, Response
+
+import metrics
+import settings
+from async_db import AsyncDatabase
+from blob_store import create_blob_store, is_valid_digest
+from repository import create_repository, make_idempotency_key
+from jobs import CallbackUrlError, JobService, check_callback_url
+from alignment import align_transcript
+from audio_decode import AudioFormatError
+from pdf_render import PdfRenderer
+from pdf_text import PdfFormatError, PdfTextExtractor, join_pages, locate_pages, parse_page_range
+from profiler import SamplingProfiler
+from reading_stats import ReadingStats, summarize_recording
+from search_index import SearchIndex
+from transcription_cache import TranscriptionCache
+from transcription import (
+    BatchScheduler, TranscriptionPool, PoolSaturatedError, guided_options, transcribe_job, transcribe_stream_job
+)
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-class FirebaseService:
-    """Service for Firebase Realtime Database operations"""
-
-    def __init__(self):
-        self._initialize_firebase()
-
-    def _initialize_firebase(self):
-        """Initialize Firebase app with credentials"""
-        try:
-            FIREBASE_CRED_PATH = "pdf-audio-creds.json"
-            DATABASE_URL = "https://pdf-audio-25e17-default-rtdb.firebaseio.com"
-
-            if not firebase_admin._apps:
-                cred = credentials.Certificate(FIREBASE_CRED_PATH)
-                firebase_admin.initialize_app(cred, {"databaseURL": DATABASE_URL})
-
-            self.pdf_db_ref = db.reference("pdf_files")
-        except Exception as e:
-            logger.error(f"Firebase initialization failed: {str(e)}")
-            raise
-
-    def save_pdf_data(self, data: Dict, pdf_id: str) -> None:
-        """Save PDF data to database"""
-        try:
-            self.pdf_db_ref.child(pdf_id).set(data)
-        except Exception as e:
-            logger.error(f"Failed to save PDF data: {str(e)}")
-            raise HTTPException(status_code=500, detail="Failed to save PDF data")
-
-    def save_audio_data(self, pdf_id: str, audio_data: Dict) -> str:
-        """Save audio data to database"""
-        try:
-            audio_id = str(uuid.uuid4())
-            self.pdf_db_ref.child(pdf_id).child("audio_recordings").child(audio_id).set(audio_data)
-            return audio_id
-        except Exception as e:
-            logger.error(f"Failed to save audio data: {str(e)}")
-            raise HTTPException(status_code=500, detail="Failed to save audio data")
-
-    def get_pdf(self, pdf_id: str) -> Dict:
-        """Retrieve PDF data from database"""
-        try:
-            data = self.pdf_db_ref.child(pdf_id).get()
-            if not data:
-                raise HTTPException(status_code=404, detail="PDF not found")
-            return data
-        except Exception as e:
-            logger.error(f"Failed to get PDF data: {str(e)}")
-            raise
-
 class FileService:
     """Service for file processing operations"""
 
-    @staticmethod
-    def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-        """Extract text from PDF bytes"""
+    def __init__(self, pdf_extractor: PdfTextExtractor, pdf_renderer: PdfRenderer):
+        self.pdf_extractor = pdf_extractor
+        self.pdf_renderer = pdf_renderer
+
+    async def extract_pages(self, pdf_bytes: bytes) -> List[str]:
+        """Extract the text of every page from PDF bytes"""
         try:
-            text = ""
-            with BytesIO(pdf_bytes) as pdf_stream:
-                reader = PyPDF2.PdfReader(pdf_stream)
-                for page in reader.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        text += extracted + "\n"
-            return text.strip()
-        except PyPDF2.errors.PdfReadError as e:
+            return await self.pdf_extractor.extract_pages(pdf_bytes)
+        except PdfFormatError as e:
             logger.error(f"Invalid PDF file: {str(e)}")
             raise HTTPException(status_code=400, detail="Invalid PDF file format")
         except Exception as e:
             logger.error(f"PDF processing failed: {str(e)}")
             raise HTTPException(status_code=500, detail="PDF processing error")
 
-    @staticmethod
-    def convert_text_to_pdf(text: str) -> bytes:
-        """Convert text to PDF bytes"""
+    async def convert_text_to_pdf(self, text: str) -> Tuple[bytes, List[str]]:
+        """Render text to PDF bytes off the event loop; also returns the page texts"""
         try:
-            buffer = BytesIO()
-            c = canvas.Canvas(buffer)
-            lines = text.splitlines()
-            y = 800
-            for line in lines:
-                c.drawString(50, y, line)
-                y -= 15
-                if y < 50:
-                    c.showPage()
-                    y = 800
-            c.save()
-            return buffer.getvalue()
+            return await asyncio.to_thread(self.pdf_renderer.render, text)
         except Exception as e:
             logger.error(f"PDF generation failed: {str(e)}")
             raise HTTPException(status_code=500, detail="PDF generation error")
 
-    @staticmethod
-    def encode_to_base64(file_bytes: bytes) -> str:
-        """Encode bytes to base64 string"""
-        return base64.b64encode(file_bytes).decode("utf-8")
-
 class AudioService:
     """Service for audio processing operations"""
 
-    def __init__(self):
-        self.model = whisper.load_model("small", device="cpu", in_memory=False)
-
-    async def transcribe_audio(self, audio_bytes: bytes, filename: str) -> Dict:
-        """Transcribe audio using Whisper model"""
-        temp_audio_path = None
-        wav_temp_audio_path = None
-
+    def __init__(self, pool: TranscriptionPool, batcher: Optional[BatchScheduler] = None, align_workers: int = 1):
+        self.pool = pool
+        self.batcher = batcher
+        self.align_workers = max(1, align_workers)
+        self._align_executor: Optional[ProcessPoolExecutor] = None
+
+    async def transcribe_audio(
+            self,
+            audio_bytes: bytes,
+            options: Optional[Dict] = None,
+            progress: Optional[Callable[[Dict], None]] = None,
+            stream: bool = False
+    ) -> Dict:
+        """Transcribe audio with the configured engine in the worker pool.
+
+        With stream the recording is transcribed window by window and every
+        progress event carries the words of the window just finished.
+        """
         try:
-            temp_audio_path = f"temp_{uuid.uuid4().hex}_{filename}"
-            with open(temp_audio_path, "wb") as f:
-                f.write(audio_bytes)
-
-            # Convert OGG to WAV if needed
-            if filename.lower().endswith(".ogg"):
-                wav_temp_audio_path = temp_audio_path.replace(".ogg", ".wav")
-                self._convert_ogg_to_wav(temp_audio_path, wav_temp_audio_path)
-                transcribe_path = wav_temp_audio_path
+            started = time.perf_counter()
+            if stream:
+                result = await self.pool.submit(transcribe_stream_job, audio_bytes, options, progress=progress)
+            elif self.batcher:
+                if progress:
+                    progress({"stage": "transcribing"})
+                result = await self.batcher.transcribe(audio_bytes, options)
             else:
-                transcribe_path = temp_audio_path
-
-            return self.model.transcribe(transcribe_path, word_timestamps=True, fp16=False)
+                result = await self.pool.submit(transcribe_job, audio_bytes, options, progress=progress)
+            metrics.observe_transcription(
+                time.perf_counter() - started, result.pop("timings", None), settings.TRANSCRIBE_ENGINE
+            )
+            return result
+        except PoolSaturatedError as e:
+            logger.warning(f"Transcription rejected: {str(e)}")
+            raise self._queue_full(e.retry_after)
+        except AudioFormatError as e:
+            logger.error(f"Audio conversion failed: {str(e)}")
+            raise HTTPException(status_code=400, detail="Unsupported audio format")
         except Exception as e:
             logger.error(f"Audio processing failed: {str(e)}")
             raise HTTPException(status_code=500, detail="Audio processing error")
-        finally:
-            self._cleanup_temp_files(temp_audio_path, wav_temp_audio_path)
 
-    @staticmethod
-    def _convert_ogg_to_wav(input_path: str, output_path: str) -> None:
-        """Convert OGG audio to WAV format"""
-        try:
-            audio = AudioSegment.from_file(input_path, format="ogg")
-            audio.export(output_path, format="wav")
-        except Exception as e:
-            logger.error(f"Audio conversion failed: {str(e)}")
-            raise HTTPException(status_code=400, detail="Unsupported audio format")
+    def check_capacity(self) -> None:
+        """Reject work meant for a background job while the transcription queue is full.
+
+        A job accepted now would only fail once it reaches the pool, so the
+        client gets the same 503 and Retry-After as a synchronous upload.
+        """
+        if self.pool.pending >= self.pool.capacity:
+            retry_after = self.pool.retry_after()
+            logger.warning(f"Transcription job rejected: queue is full, retry after {retry_after}s")
+            raise self._queue_full(retry_after)
 
     @staticmethod
-    def _cleanup_temp_files(*file_paths) -> None:
-        """Cleanup temporary files"""
-        for path in file_paths:
-            if path and os.path.exists(path):
-                try:
-                    os.remove(path)
-                except Exception as e:
-                    logger.warning(f"Failed to delete temp file {path}: {str(e)}")
+    def _queue_full(retry_after: int) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="Transcription queue is full",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    async def align(self, reference_text: str, chunks: List[Dict], first_word: int = 0) -> Dict:
+        """Align word chunks against the reference text in a worker process.
+
+        Alignment is pure Python: on a thread it would hold the GIL and
+        stall every request for as long as a long reading takes.
+        """
+        if self._align_executor is None:
+            self._align_executor = ProcessPoolExecutor(
+                max_workers=self.align_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._align_executor, align_transcript, reference_text, chunks, first_word
+        )
+
+    def shutdown(self) -> None:
+        if self._align_executor:
+            self._align_executor.shutdown(wait=False, cancel_futures=True)
 
 class ValidationService:
     """Service for data validation"""
@@ -178,18 +158,84 @@ class ValidationService:
         return errors
 
     @staticmethod
-    def check_semantic(corrected_text: str, reference_text: str) -> bool:
-        """Check semantic similarity between texts"""
-        return reference_text.strip().lower() in corrected_text.strip().lower()
-
-# Initialize services
-firebase_service = FirebaseService()
-file_service = FileService()
-audio_service = AudioService()
+    def check_semantic(alignment: Dict) -> bool:
+        """Check that the reading follows the reference text closely enough"""
+        return alignment["accuracy"] >= settings.SEMANTIC_ACCURACY_THRESHOLD
+
+class Services:
+    """Stateful services shared by all requests, built once at startup"""
+
+    def __init__(self):
+        # Every repository call is timed for /metrics
+        self.repository = metrics.TimedRepository(create_repository())
+        # Async endpoints reach the database through this thread pool
+        self.db = AsyncDatabase(self.repository, settings.DATABASE_WORKERS)
+        self.blob_store = create_blob_store()
+        self.search_index = SearchIndex(settings.SEARCH_INDEX_PATH) if settings.SEARCH_INDEX_PATH else None
+        self.reading_stats = ReadingStats(settings.STATS_PATH) if settings.STATS_PATH else None
+        self.file_service = FileService(
+            PdfTextExtractor(settings.PDF_EXTRACT_WORKERS),
+            PdfRenderer(settings.PDF_FONTS, settings.PDF_FONT_SIZE, settings.PDF_LAYOUT_CACHE_SIZE)
+        )
+        self.transcription_cache = TranscriptionCache(
+            settings.TRANSCRIBE_CACHE_PATH,
+            settings.TRANSCRIBE_CACHE_MAX_MB * 1024 * 1024
+        ) if settings.TRANSCRIBE_CACHE_PATH else None
+        self.transcription_pool = TranscriptionPool(
+            model_name=settings.WHISPER_MODEL,
+            workers=settings.TRANSCRIBE_WORKERS,
+            queue_size=settings.TRANSCRIBE_QUEUE_SIZE,
+            torch_threads=settings.TORCH_THREADS,
+            cache_path=settings.TRANSCRIBE_CACHE_PATH,
+            cache_max_bytes=settings.TRANSCRIBE_CACHE_MAX_MB * 1024 * 1024,
+            engine_name=settings.TRANSCRIBE_ENGINE,
+            start_method=settings.TRANSCRIBE_START_METHOD,
+            preload_model=settings.TRANSCRIBE_PRELOAD_MODEL
+        )
+        self.audio_service = AudioService(
+            self.transcription_pool,
+            BatchScheduler(
+                self.transcription_pool,
+                max_batch_size=settings.TRANSCRIBE_BATCH_SIZE,
+                max_wait_ms=settings.TRANSCRIBE_BATCH_WAIT_MS
+            ) if settings.TRANSCRIBE_BATCH_SIZE > 1 else None,
+            settings.ALIGN_WORKERS
+        )
+        self.profiler = SamplingProfiler()
+        metrics.QUEUE_DEPTH.set_function(lambda: self.transcription_pool.pending)
+        metrics.QUEUE_CAPACITY.set(self.transcription_pool.capacity)
+
+    def shutdown(self) -> None:
+        self.profiler.stop()
+        self.transcription_pool.shutdown()
+        self.audio_service.shutdown()
+        self.file_service.pdf_extractor.shutdown()
+        self.db.shutdown()
+
+# Stateless services
 validation_service = ValidationService()
+job_service = JobService()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build services on startup and load the model in the background.
+
+    Requests that do not transcribe are served right away; /readyz turns
+    ready once every transcription worker has loaded its model.
+    """
+    services = Services()
+    app.state.services = services
+    warm_up = asyncio.create_task(services.transcription_pool.warm_up())
+    yield
+    warm_up.cancel()
+    services.shutdown()
+
+def get_services(request: Request) -> Services:
+    """Dependency returning the services built at startup"""
+    return request.app.state.services
 
 # FastAPI app setup
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -199,11 +245,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Observe the latency of every request under its route template"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.labels(
+        request.method, route.path if route else "unmatched", str(response.status_code)
+    ).observe(time.perf_counter() - started)
+    return response
+
+@app.get("/healthz")
+def healthz():
+    """Liveness probe: the API process answers"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz(services: Services = Depends(get_services)):
+    """Readiness probe: transcription workers have loaded the model"""
+    if not services.transcription_pool.ready:
+        return JSONResponse(status_code=503, content={"status": "loading"})
+    return {"status": "ready"}
+
 @app.post("/upload_pdf")
 async def upload_pdf(
         file: Optional[UploadFile] = File(None),
         text: Optional[str] = Form(None),
-        user_id: str = Form(...)
+        user_id: str = Form(...),
+        services: Services = Depends(get_services)
 ):
     """Endpoint for uploading PDF or text"""
     try:
@@ -215,26 +285,50 @@ async def upload_pdf(
 
         # Process input
         if text:
+            metrics.PAYLOAD_BYTES.labels("text").observe(len(text.encode()))
             errors = validation_service.validate_text(text)
-            pdf_bytes = file_service.convert_text_to_pdf(text)
+            with metrics.stage("render_pdf"):
+                pdf_bytes, pages = await services.file_service.convert_text_to_pdf(text)
+            with metrics.stage("store_pdf"):
+                pdf_blob = services.blob_store.put(pdf_bytes, "application/pdf")
+            # The renderer knows what it put on every page, so nothing is extracted
+            new_pages = pages
             extracted_text = text
         else:
-            file_bytes = await file.read()
-            extracted_text = file_service.extract_text_from_pdf(file_bytes)
+            with metrics.stage("read_upload"):
+                pdf_bytes = await file.read()
+            metrics.PAYLOAD_BYTES.labels("pdf").observe(len(pdf_bytes))
+            with metrics.stage("store_pdf"):
+                pdf_blob = services.blob_store.put(pdf_bytes, "application/pdf")
+            # Page texts are stored by file hash, so a re-uploaded PDF is not extracted again
+            pages = await services.db.get_pdf_pages(pdf_blob["sha256"])
+            new_pages = None
+            if pages is None:
+                with metrics.stage("extract_pdf"):
+                    pages = new_pages = await services.file_service.extract_pages(pdf_bytes)
+            extracted_text = join_pages(pages)
             errors = validation_service.validate_text(extracted_text)
-            pdf_bytes = file_bytes
 
         # Prepare data
         data = {
-            "pdf_file_base64": file_service.encode_to_base64(pdf_bytes),
+            "pdf_blob": pdf_blob,
             "text": extracted_text,
             "errors": errors,
             "user_id": user_id,
-            "audio_recordings": {}
+            "audio_recordings": {},
+            "page_count": len(pages)
         }
 
-        # Save to database
-        firebase_service.save_pdf_data(data, pdf_id)
+        # Save to database, with the page texts if they are new
+        with metrics.stage("save_pdf"):
+            await services.db.save_pdf_data(data, pdf_id, new_pages)
+        if services.search_index:
+            try:
+                with metrics.stage("index_pdf"):
+                    await asyncio.to_thread(services.search_index.add, pdf_id, data)
+            except Exception as e:
+                # The document is stored; manage.py rebuild-search-index adds it later
+                logger.error(f"Indexing PDF {pdf_id} for search failed: {str(e)}")
         return {"pdf_id": pdf_id, "errors": errors}
 
     except HTTPException:
@@ -248,47 +342,108 @@ def list_pdfs(
         page: int = 1,
         page_size: int = 10,
         user_id: Optional[str] = None,
-        only_mine: bool = False
+        only_mine: bool = False,
+        cursor: Optional[str] = None,
+        q: Optional[str] = None,
+        services: Services = Depends(get_services)
 ):
-    """Endpoint for listing PDFs"""
+    """Endpoint for listing PDFs.
+
+    Pass next_cursor from the previous response as cursor to fetch the
+    following page without re-reading earlier ones. With q the documents
+    containing every word of q are returned best match first, each with a
+    snippet and the offsets of the matched words in it.
+    """
     try:
-        all_pdfs = firebase_service.pdf_db_ref.get() or {}
-        items = []
-
-        for pdf_id, data in all_pdfs.items():
-            if only_mine and user_id and data.get("user_id") != user_id:
-                continue
-            data["pdf_id"] = pdf_id
-            items.append(data)
-
-        total = len(items)
-        start = (page - 1) * page_size
-        end = start + page_size
+        if q is not None:
+            if not services.search_index:
+                raise HTTPException(status_code=503, detail="Search is disabled")
+            with metrics.stage("search"):
+                items, total = services.search_index.search(
+                    q, page_size=page_size, page=page, user_id=user_id if only_mine and user_id else None
+                )
+            return {
+                "page": page,
+                "page_size": page_size,
+                "total": total,
+                "items": items,
+                "next_cursor": None,
+                "q": q
+            }
+        items, next_cursor, total = services.repository.list_pdf_summaries(
+            page_size=page_size,
+            user_id=user_id if only_mine and user_id else None,
+            page=page,
+            cursor=cursor
+        )
         return {
             "page": page,
             "page_size": page_size,
             "total": total,
-            "items": items[start:end]
+            "items": items,
+            "next_cursor": next_cursor
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"List PDFs failed: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve PDF list")
 
-@app.post("/upload_audio/{pdf_id}")
-async def upload_audio(
+async def analyze_audio(
+        services: Services,
         pdf_id: str,
-        audio: UploadFile = File(...),
-        uploader_id: str = Form(...)
-):
-    """Endpoint for uploading audio"""
-    try:
-        # Validate PDF exists
-        pdf_data = firebase_service.get_pdf(pdf_id)
-        reference_text = pdf_data.get("text", "")
+        reference_text: str,
+        audio_bytes: bytes,
+        content_type: str,
+        uploader_id: str,
+        language: Optional[str] = None,
+        options: Optional[Dict] = None,
+        idempotency_key: Optional[str] = None,
+        progress: Optional[Callable[[Dict], None]] = None,
+        stream: bool = False,
+        page_range: Optional[Tuple[int, int]] = None,
+        first_word: int = 0
+) -> Dict:
+    """Transcribe an audio recording and store the analysis.
+
+    When streaming, the recording is created up front and the words of each
+    transcribed window are appended to its chunks as they arrive. For a
+    reading of some pages, first_word is the number of the first word of
+    reference_text in the whole document.
+    """
+    with metrics.stage("store_audio"):
+        audio_blob = services.blob_store.put(audio_bytes, content_type)
+    audio_id = None
+    chunk_writes: List[asyncio.Future] = []
+    on_progress = progress
+    if stream:
+        audio_id = await services.db.start_recording(
+            pdf_id, {"audio_blob": audio_blob, "uploader_id": uploader_id}
+        )
+        chunks_saved = 0
+
+        def on_progress(event: Dict) -> None:
+            nonlocal chunks_saved
+            if event.get("words"):
+                chunk_writes.append(asyncio.ensure_future(
+                    services.db.append_recording_chunks(pdf_id, audio_id, chunks_saved, event["words"])
+                ))
+                chunks_saved += len(event["words"])
+            if progress:
+                progress({**event, "audio_id": audio_id, "chunks_saved": chunks_saved})
 
-        # Process audio
-        audio_bytes = await audio.read()
-        transcription = await audio_service.transcribe_audio(audio_bytes, audio.filename)
+    try:
+        with metrics.stage("transcribe"):
+            transcription = await services.audio_service.transcribe_audio(
+                audio_bytes, options=options, progress=on_progress, stream=stream
+            )
+        await asyncio.gather(*chunk_writes)
+        if progress:
+            progress({"stage": "saving"})
+
+        if not language and transcription.get("language"):
+            # Later guided uploads of this document can skip language detection
+            await services.db.set_pdf_language(pdf_id, transcription["language"])
 
         # Prepare chunks
         chunks = []
@@ -302,21 +457,154 @@ async def upload_audio(
 
         # Process results
         recognized_text = transcription["text"]
-        semantic_ok = validation_service.check_semantic(recognized_text, reference_text)
+        with metrics.stage("align"):
+            alignment = await services.audio_service.align(reference_text, chunks, first_word)
+        semantic_ok = validation_service.check_semantic(alignment)
 
         # Prepare audio data
         audio_data = {
-            "audio_file_base64": file_service.encode_to_base64(audio_bytes),
+            "audio_blob": audio_blob,
             "uploader_id": uploader_id,
             "recognized_text": recognized_text,
             "corrected_text": recognized_text,  # Placeholder for future correction
             "chunks": chunks,
-            "semantic_ok": semantic_ok
+            "alignment": alignment,
+            "accuracy": alignment["accuracy"],
+            "semantic_ok": semantic_ok,
+            "guided": bool(options)
         }
+        if page_range:
+            audio_data["pages"] = [page_range[0] + 1, page_range[1]]
 
         # Save to database
-        audio_id = firebase_service.save_audio_data(pdf_id, audio_data)
-        return {"pdf_id": pdf_id, "audio_id": audio_id}
+        with metrics.stage("save_audio"):
+            audio_id = await services.db.save_audio_data(pdf_id, audio_data, idempotency_key, audio_id)
+    except Exception:
+        # A streamed recording is stored up front; do not leave it behind half done
+        if stream and audio_id:
+            await asyncio.gather(*chunk_writes, return_exceptions=True)
+            await services.db.delete_recording(pdf_id, audio_id)
+        raise
+
+    if services.reading_stats:
+        try:
+            with metrics.stage("update_stats"):
+                await asyncio.to_thread(
+                    lambda: services.reading_stats.add(pdf_id, audio_id, summarize_recording(audio_data))
+                )
+        except Exception as e:
+            # The recording is stored; manage.py rebuild-stats counts it later
+            logger.error(f"Updating reading stats for {audio_id} failed: {str(e)}")
+    return {"pdf_id": pdf_id, "audio_id": audio_id}
+
+@app.post("/upload_audio/{pdf_id}")
+async def upload_audio(
+        pdf_id: str,
+        audio: UploadFile = File(...),
+        uploader_id: str = Form(...),
+        async_job: bool = Form(False),
+        callback_url: Optional[str] = Form(None),
+        guided: Optional[bool] = Form(None),
+        stream: bool = Form(False),
+        pages: Optional[str] = Form(None),
+        idempotency_key: Optional[str] = Header(None),
+        services: Services = Depends(get_services)
+):
+    """Endpoint for uploading audio.
+
+    With async_job the analysis runs in the background and the response
+    carries a job_id to poll at /jobs/{job_id}. With guided (default
+    GUIDED_DECODING) Whisper is prompted with the document text and its
+    cached language. Repeating an upload with the same Idempotency-Key
+    header returns the first upload's audio_id or job instead of a new
+    recording. stream (always a background job) transcribes long readings
+    window by window and publishes words as they are recognised. pages
+    (e.g. 12-15) checks the reading against those pages only.
+    """
+    try:
+        async_job = async_job or stream
+        if async_job and callback_url:
+            try:
+                await asyncio.to_thread(check_callback_url, callback_url, settings.CALLBACK_ALLOWED_HOSTS)
+            except CallbackUrlError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+
+        # Validate PDF exists, and look up an earlier upload with the same key meanwhile
+        key = make_idempotency_key(uploader_id, idempotency_key) if idempotency_key else None
+        lookups = [services.db.get_pdf_fields(
+            pdf_id, ["language", "text"] + (["pdf_blob/sha256", "page_count"] if pages else [])
+        )]
+        if key:
+            lookups.append(services.db.get_idempotent_audio_id(pdf_id, key))
+        with metrics.stage("lookup_pdf"):
+            pdf_data, *earlier = await asyncio.gather(*lookups)
+        language = pdf_data.get("language")
+        page_range = None
+        first_word = 0
+        if pages:
+            page_range = parse_page_range(pages, pdf_data.get("page_count") or 0)
+            digest = pdf_data.get("pdf_blob/sha256")
+            if not page_range or not digest:
+                raise HTTPException(status_code=400, detail="Invalid page range")
+            # Words are numbered in the document text, so the pages are looked up in it
+            page_texts = await services.db.get_pdf_pages(digest, 0, page_range[1]) or []
+            text = pdf_data.get("text") or ""
+            first_word, begin, end = locate_pages(text, page_texts, page_range[0])
+            reference_text = text[begin:end]
+        else:
+            reference_text = pdf_data.get("text") or ""
+
+        if key:
+            audio_id = earlier[0]
+            if audio_id:
+                return {"pdf_id": pdf_id, "audio_id": audio_id}
+            job = job_service.find(pdf_id=pdf_id, idempotency_key=key) if async_job else None
+            if job:
+                return JSONResponse(status_code=202, content={
+                    "pdf_id": pdf_id,
+                    "job_id": job["job_id"],
+                    "status": job["status"]
+                })
+
+        if guided is None:
+            guided = settings.GUIDED_DECODING
+        options = None
+        if guided:
+            options = guided_options(
+                reference_text,
+                language,
+                start_word=0 if page_range else await services.db.get_reading_position(pdf_id, uploader_id),
+                prompt_words=settings.GUIDED_PROMPT_WORDS
+            )
+
+        if async_job:
+            services.audio_service.check_capacity()
+
+        with metrics.stage("read_upload"):
+            audio_bytes = await audio.read()
+        metrics.PAYLOAD_BYTES.labels("audio").observe(len(audio_bytes))
+        content_type = mimetypes.guess_type(audio.filename)[0] or audio.content_type or "application/octet-stream"
+
+        if not async_job:
+            return await analyze_audio(
+                services, pdf_id, reference_text, audio_bytes, content_type, uploader_id, language, options, key,
+                page_range=page_range, first_word=first_word
+            )
+
+        job = job_service.create(callback_url=callback_url, pdf_id=pdf_id, idempotency_key=key)
+        job_id = job["job_id"]
+        job_service.start(job_id, lambda: analyze_audio(
+            services, pdf_id, reference_text, audio_bytes, content_type, uploader_id, language, options, key,
+            progress=lambda event: job_service.report_progress(job_id, event),
+            stream=stream,
+            page_range=page_range,
+            first_word=first_word
+        ))
+        return JSONResponse(status_code=202, content={
+            "pdf_id": pdf_id,
+            "job_id": job_id,
+            "status": job["status"]
+        })
 
     except HTTPException:
         raise
@@ -324,11 +612,108 @@ async def upload_audio(
         logger.error(f"Upload audio failed: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Endpoint for polling a background job"""
+    job = job_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events stream of job updates, closed when the job finishes"""
+    if not job_service.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for job in job_service.events(job_id):
+            yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/transcription_cache")
+def get_transcription_cache_stats(services: Services = Depends(get_services)):
+    """Hit/miss counters and size of the transcription cache"""
+    if not services.transcription_cache:
+        return {"enabled": False}
+    return {"enabled": True, **services.transcription_cache.stats()}
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics of this API process"""
+    for status, count in job_service.counts().items():
+        metrics.JOBS.labels(status).set(count)
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+def get_profiler(services: Services = Depends(get_services)) -> SamplingProfiler:
+    """Dependency returning the sampling profiler, if PROFILER_ENABLED allows it"""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return services.profiler
+
+@app.get("/debug/profiler")
+def get_profiler_status(profiler: SamplingProfiler = Depends(get_profiler)):
+    """Whether the sampling profiler runs and how many samples it has"""
+    return profiler.status()
+
+@app.post("/debug/profiler/start")
+def start_profiler(interval_ms: float = 10, profiler: SamplingProfiler = Depends(get_profiler)):
+    """Start sampling the API process every interval_ms, discarding the previous profile"""
+    profiler.start(interval_ms)
+    return profiler.status()
+
+@app.post("/debug/profiler/stop")
+def stop_profiler(profiler: SamplingProfiler = Depends(get_profiler)):
+    """Stop sampling and return the profile as collapsed stacks (flamegraph.pl / speedscope input)"""
+    profiler.stop()
+    return PlainTextResponse(profiler.report())
+
+def get_reading_stats(services: Services = Depends(get_services)) -> ReadingStats:
+    """Dependency returning the reading statistics, unless STATS_PATH disables them"""
+    if not services.reading_stats:
+        raise HTTPException(status_code=503, detail="Statistics are disabled")
+    return services.reading_stats
+
+@app.get("/stats/users/{user_id}")
+def get_user_stats(
+        user_id: str,
+        pdf_id: Optional[str] = None,
+        top_words: int = 10,
+        reading_stats: ReadingStats = Depends(get_reading_stats)
+):
+    """Reading statistics of a user over all documents, or over one with pdf_id.
+
+    Counts, accuracy averages, speaking rate, the top_words most misread
+    words and the latest recordings, kept up to date on every upload.
+    """
+    return {"user_id": user_id, "pdf_id": pdf_id, **reading_stats.get(user_id, pdf_id, top_words)}
+
+@app.get("/stats/pdfs/{pdf_id}")
+def get_pdf_stats(pdf_id: str, top_words: int = 10, reading_stats: ReadingStats = Depends(get_reading_stats)):
+    """Reading statistics of a document over all of its readers"""
+    return {"pdf_id": pdf_id, **reading_stats.get(pdf_id=pdf_id, top_words=top_words)}
+
+@app.get("/database_cache")
+def get_database_cache_stats(services: Services = Depends(get_services)):
+    """Size and hit counters of the database read-through caches"""
+    return services.repository.cache_stats()
+
 @app.get("/pdf_data/{pdf_id}")
-def get_pdf_data(pdf_id: str):
-    """Endpoint for retrieving PDF data"""
+def get_pdf_data(pdf_id: str, fields: Optional[str] = None, services: Services = Depends(get_services)):
+    """Endpoint for retrieving PDF data.
+
+    fields is a comma-separated list of fields or field paths to return,
+    e.g. fields=text,user_id. Without it the whole document is returned.
+    """
     try:
-        data = firebase_service.get_pdf(pdf_id)
+        if fields:
+            data = services.repository.get_pdf_fields(
+                pdf_id, [f.strip() for f in fields.split(",") if f.strip()]
+            )
+        else:
+            data = services.repository.get_pdf(pdf_id)
         data["pdf_id"] = pdf_id
         return data
     except HTTPException:
@@ -337,6 +722,149 @@ def get_pdf_data(pdf_id: str):
         logger.error(f"Get PDF data failed: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve PDF data")
 
+@app.get("/pdf_data/{pdf_id}/pages")
+def get_pdf_pages(pdf_id: str, pages: Optional[str] = None, services: Services = Depends(get_services)):
+    """Endpoint for retrieving the text of some pages of an uploaded PDF.
+
+    pages is a 1-based inclusive range such as 12-15 (default: all pages).
+    """
+    try:
+        pdf_data = services.repository.get_pdf_fields(pdf_id, ["pdf_blob/sha256", "page_count"])
+        digest = pdf_data.get("pdf_blob/sha256")
+        page_count = pdf_data.get("page_count")
+        if not digest or page_count is None:
+            raise HTTPException(status_code=404, detail="Page texts not available")
+        page_range = parse_page_range(pages, page_count) if pages else (0, page_count)
+        if not page_range:
+            raise HTTPException(status_code=400, detail="Invalid page range")
+
+        texts = services.repository.get_pdf_pages(digest, *page_range) or []
+        return {
+            "pdf_id": pdf_id,
+            "page_count": page_count,
+            "pages": [{"page": page_range[0] + offset + 1, "text": text} for offset, text in enumerate(texts)],
+            "text": join_pages(texts)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get PDF pages failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve PDF pages")
+
+@app.get("/pdf_data/{pdf_id}/recordings")
+def list_recordings(pdf_id: str, page: int = 1, page_size: int = 10, services: Services = Depends(get_services)):
+    """Endpoint for listing recordings of a PDF without audio and chunks"""
+    try:
+        items, total = services.repository.list_recordings(pdf_id, page, page_size)
+        return {
+            "pdf_id": pdf_id,
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "items": items
+        }
+    except Exception as e:
+        logger.error(f"List recordings failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve recordings")
+
+@app.get("/pdf_data/{pdf_id}/recordings/{audio_id}/chunks")
+def get_recording_chunks(
+        pdf_id: str,
+        audio_id: str,
+        format: str = "columnar",
+        services: Services = Depends(get_services)
+):
+    """Endpoint for retrieving word chunks of one recording.
+
+    The default columnar format returns parallel text/start/end arrays;
+    format=rows returns the stored list of {text, start, end}.
+    """
+    try:
+        chunks = services.repository.get_recording_chunks(pdf_id, audio_id)
+        if format == "rows":
+            return {"pdf_id": pdf_id, "audio_id": audio_id, "chunks": chunks}
+        return {
+            "pdf_id": pdf_id,
+            "audio_id": audio_id,
+            "text": [chunk["text"] for chunk in chunks],
+            "start": [chunk["start"] for chunk in chunks],
+            "end": [chunk["end"] for chunk in chunks]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get recording chunks failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve recording chunks")
+
+@app.get("/pdf_data/{pdf_id}/recordings/{audio_id}/alignment")
+def get_recording_alignment(pdf_id: str, audio_id: str, services: Services = Depends(get_services)):
+    """Endpoint for retrieving the word alignment of one recording"""
+    try:
+        field = f"audio_recordings/{audio_id}/alignment"
+        alignment = services.repository.get_pdf_fields(pdf_id, [field]).get(field)
+        if not alignment:
+            raise HTTPException(status_code=404, detail="Alignment not found")
+        return {"pdf_id": pdf_id, "audio_id": audio_id, **alignment}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get recording alignment failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve recording alignment")
+
+def parse_range(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single-range "bytes=start-end" header into inclusive offsets"""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start_str, end_str = match.groups()
+    if start_str:
+        start = int(start_str)
+        end = min(int(end_str), size - 1) if end_str else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(0, size - int(end_str))
+        end = size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+@app.api_route("/blobs/{digest}", methods=["GET", "HEAD"])
+def get_blob(digest: str, request: Request, services: Services = Depends(get_services)):
+    """Endpoint for streaming stored PDF and audio files with Range support"""
+    info = services.blob_store.info(digest) if is_valid_digest(digest) else None
+    if not info:
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    etag = f'"{digest}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    size = info["size"]
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range(range_header, size)
+        if not byte_range:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    if request.method == "HEAD" or size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=info["content_type"])
+    return StreamingResponse(
+        services.blob_store.iter_range(digest, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=info["content_type"]
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
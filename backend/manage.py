@@ -0,0 +1,185 @@
+"""Maintenance commands for the backend database.
+
+Usage:
+    python manage.py rebuild-index
+    python manage.py rebuild-search-index
+    python manage.py rebuild-stats
+    python manage.py migrate-blobs
+    python manage.py extract-pages
+    python manage.py export-json FILE [--backend sqlite]
+    python manage.py import-json FILE [--backend sqlite]
+
+rebuild-index, rebuild-search-index, rebuild-stats, export-json and
+import-json work on the backend selected by DATABASE_BACKEND (or --backend);
+the other commands are Firebase-specific.
+"""
+import json
+import base64
+import argparse
+import logging
+
+import settings
+from blob_store import create_blob_store
+from firebase_service import FirebaseService, make_pages_entry
+from repository import REPOSITORIES, create_repository
+from pdf_text import PdfFormatError, count_pages, extract_page_range
+from reading_stats import ReadingStats, summarize_recording
+from search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def rebuild_index(args) -> None:
+    """Recreate the /pdfs listing index from stored documents"""
+    count = create_repository(args.backend).rebuild_index()
+    logger.info(f"Indexed {count} documents")
+
+
+def rebuild_search_index(args) -> None:
+    """Recreate the full-text search index (SEARCH_INDEX_PATH) from stored documents"""
+    if not settings.SEARCH_INDEX_PATH:
+        logger.error("SEARCH_INDEX_PATH is empty, search is disabled")
+        return
+    count = SearchIndex(settings.SEARCH_INDEX_PATH).rebuild(create_repository(args.backend).iter_documents())
+    logger.info(f"Indexed {count} documents for search")
+
+
+def rebuild_stats(args) -> None:
+    """Recompute the reading statistics (STATS_PATH) from stored recordings"""
+    if not settings.STATS_PATH:
+        logger.error("STATS_PATH is empty, statistics are disabled")
+        return
+    recordings = []
+    for pdf_id, document in create_repository(args.backend).iter_documents():
+        for audio_id, recording in (document.get("audio_recordings") or {}).items():
+            if recording.get("status"):
+                continue  # still being transcribed
+            # Recordings of a page range were aligned on upload; older ones are aligned against the whole text
+            summary = summarize_recording(recording, None if recording.get("pages") else document.get("text"))
+            recordings.append((pdf_id, audio_id, summary))
+    # Moving averages follow upload order
+    recordings.sort(key=lambda recording: recording[2]["created_at"])
+    count = ReadingStats(settings.STATS_PATH).rebuild(recordings)
+    logger.info(f"Counted {count} recordings")
+
+
+def migrate_blobs(args) -> None:
+    """Move inline base64 PDF and audio files into the blob store"""
+    firebase_service = FirebaseService()
+    blob_store = create_blob_store()
+    moved = 0
+
+    for pdf_id in (firebase_service.pdf_db_ref.get(shallow=True) or {}):
+        doc_ref = firebase_service.pdf_db_ref.child(pdf_id)
+        pdf_base64 = doc_ref.child("pdf_file_base64").get()
+        if pdf_base64:
+            blob = blob_store.put(base64.b64decode(pdf_base64), "application/pdf")
+            doc_ref.update({"pdf_blob": blob, "pdf_file_base64": None})
+            moved += 1
+
+        recordings_ref = doc_ref.child("audio_recordings")
+        for audio_id in (recordings_ref.get(shallow=True) or {}):
+            audio_base64 = recordings_ref.child(audio_id).child("audio_file_base64").get()
+            if audio_base64:
+                # The bot has always uploaded Telegram voice notes (OGG/Opus)
+                blob = blob_store.put(base64.b64decode(audio_base64), "audio/ogg")
+                recordings_ref.child(audio_id).update({"audio_blob": blob, "audio_file_base64": None})
+                moved += 1
+
+    logger.info(f"Moved {moved} inline files to the blob store")
+
+
+def extract_pages(args) -> None:
+    """Store page texts of uploaded PDFs that were extracted as one string"""
+    firebase_service = FirebaseService()
+    blob_store = create_blob_store()
+    extracted = 0
+
+    for pdf_id in (firebase_service.pdf_db_ref.get(shallow=True) or {}):
+        blob = firebase_service.get_pdf_fields(pdf_id, ["pdf_blob"]).get("pdf_blob")
+        if not blob:
+            continue
+        page_count = firebase_service.pdf_pages_ref.child(blob["sha256"]).child("count").get()
+        if page_count is None:
+            pdf_bytes = blob_store.read(blob["sha256"])
+            try:
+                pages = extract_page_range(pdf_bytes, 0, count_pages(pdf_bytes))
+            except PdfFormatError as e:
+                logger.warning(f"Skipping {pdf_id}: {e}")
+                continue
+            firebase_service.save_pdf_pages(blob["sha256"], pages)
+            page_count = len(pages)
+            extracted += 1
+        firebase_service.pdf_db_ref.child(pdf_id).update({"page_count": page_count})
+
+    logger.info(f"Extracted pages of {extracted} PDFs")
+
+
+def export_json(args) -> None:
+    """Write all documents and page texts as a Firebase-shaped JSON export"""
+    repository = create_repository(args.backend)
+    export = {"pdf_files": {}, "pdf_pages": {}}
+
+    for pdf_id, document in repository.iter_documents():
+        export["pdf_files"][pdf_id] = document
+        digest = (document.get("pdf_blob") or {}).get("sha256")
+        if digest and digest not in export["pdf_pages"]:
+            pages = repository.get_pdf_pages(digest)
+            if pages is not None:
+                export["pdf_pages"][digest] = make_pages_entry(pages)
+
+    with open(args.file, "w", encoding="utf-8") as f:
+        json.dump(export, f, ensure_ascii=False)
+    logger.info(f"Exported {len(export['pdf_files'])} documents")
+
+
+def import_json(args) -> None:
+    """Load documents and page texts from a JSON export (of Firebase or export-json)
+
+    Idempotency keys are not carried over; they only matter for a few
+    minutes after an upload.
+    """
+    repository = create_repository(args.backend)
+    with open(args.file, encoding="utf-8") as f:
+        export = json.load(f)
+
+    for pdf_id, document in (export.get("pdf_files") or {}).items():
+        repository.import_document(pdf_id, document)
+    for digest, entry in (export.get("pdf_pages") or {}).items():
+        pages = entry.get("pages") or {}
+        # Page keys look like integers, so Firebase may have exported them as an array
+        texts = pages if isinstance(pages, list) else [pages[key] for key in sorted(pages, key=int)]
+        repository.save_pdf_pages(digest, [text or "" for text in texts][:entry.get("count", len(texts))])
+
+    count = repository.rebuild_index()
+    logger.info(f"Imported {count} documents")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-index", help=rebuild_index.__doc__)
+    rebuild.add_argument("--backend", choices=REPOSITORIES)
+    rebuild.set_defaults(func=rebuild_index)
+    rebuild_search = commands.add_parser("rebuild-search-index", help=rebuild_search_index.__doc__)
+    rebuild_search.add_argument("--backend", choices=REPOSITORIES)
+    rebuild_search.set_defaults(func=rebuild_search_index)
+    stats = commands.add_parser("rebuild-stats", help=rebuild_stats.__doc__)
+    stats.add_argument("--backend", choices=REPOSITORIES)
+    stats.set_defaults(func=rebuild_stats)
+    commands.add_parser("migrate-blobs", help=migrate_blobs.__doc__).set_defaults(func=migrate_blobs)
+    commands.add_parser("extract-pages", help=extract_pages.__doc__).set_defaults(func=extract_pages)
+    for name, func in (("export-json", export_json), ("import-json", import_json)):
+        command = commands.add_parser(name, help=func.__doc__.splitlines()[0])
+        command.add_argument("file")
+        command.add_argument("--backend", choices=REPOSITORIES)
+        command.set_defaults(func=func)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
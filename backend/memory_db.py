@@ -0,0 +1,247 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class MemoryDatabase:
+    """In-process stand-in for the Firebase Realtime Database.
+
+    reference() returns objects with the subset of firebase_admin.db
+    Reference and Query methods the backend uses, following the same rules:
+    lists are stored as objects with integer keys and read back as lists,
+    writing None deletes, empty objects disappear, updates are multi-path
+    and {".sv": {"increment": n}} / {".sv": "timestamp"} are resolved on
+    write. latency_ms delays every call like a network round trip would.
+    Data lives only as long as the process.
+    """
+
+    def __init__(self, latency_ms: float = 0, data: Optional[Dict] = None):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self._root: Dict = _normalize(data) or {}
+        self._lock = threading.RLock()
+
+    def reference(self, path: str = "/") -> "MemoryReference":
+        return MemoryReference(self, _split(path))
+
+    def _round_trip(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read(self, segments: Tuple[str, ...]) -> Any:
+        node = self._root
+        for segment in segments:
+            if not isinstance(node, dict) or segment not in node:
+                return None
+            node = node[segment]
+        return node
+
+    def _write(self, segments: Tuple[str, ...], value: Any) -> None:
+        value = _normalize(_resolve_server_values(value, self._read(segments)))
+        if not segments:
+            self._root = value if isinstance(value, dict) else {}
+            return
+        parents = [self._root]
+        for segment in segments[:-1]:
+            node = parents[-1].get(segment)
+            if not isinstance(node, dict):
+                if value is None:
+                    return
+                node = parents[-1][segment] = {}
+            parents.append(node)
+        if value is None:
+            parents[-1].pop(segments[-1], None)
+            # Firebase does not keep empty objects
+            for depth in range(len(parents) - 1, 0, -1):
+                if parents[depth]:
+                    break
+                parents[depth - 1].pop(segments[depth - 1], None)
+        else:
+            parents[-1][segments[-1]] = value
+
+
+class MemoryReference:
+    def __init__(self, database: MemoryDatabase, segments: Tuple[str, ...]):
+        self._database = database
+        self._segments = segments
+
+    @property
+    def key(self) -> Optional[str]:
+        return self._segments[-1] if self._segments else None
+
+    @property
+    def path(self) -> str:
+        return "/" + "/".join(self._segments)
+
+    def child(self, path: str) -> "MemoryReference":
+        return MemoryReference(self._database, self._segments + _split(path))
+
+    def get(self, shallow: bool = False) -> Any:
+        self._database._round_trip()
+        with self._database._lock:
+            value = self._database._read(self._segments)
+            if shallow and isinstance(value, dict):
+                return {key: True for key in value}
+            return _to_json(value)
+
+    def set(self, value: Any) -> None:
+        self._database._round_trip()
+        with self._database._lock:
+            self._database._write(self._segments, value)
+
+    def update(self, value: Dict) -> None:
+        self._database._round_trip()
+        with self._database._lock:
+            for path, child_value in value.items():
+                self._database._write(self._segments + _split(path), child_value)
+
+    def delete(self) -> None:
+        self.set(None)
+
+    def transaction(self, transaction_update: Callable[[Any], Any]) -> Any:
+        self._database._round_trip()
+        with self._database._lock:
+            value = transaction_update(_to_json(self._database._read(self._segments)))
+            self._database._write(self._segments, value)
+            return value
+
+    def order_by_key(self) -> "MemoryQuery":
+        return MemoryQuery(self, None)
+
+    def order_by_child(self, path: str) -> "MemoryQuery":
+        return MemoryQuery(self, _split(path))
+
+    def order_by_value(self) -> "MemoryQuery":
+        return MemoryQuery(self, ())
+
+
+class MemoryQuery:
+    """Query ordered by key (child_path None), by a child value or by value (child_path ())"""
+
+    def __init__(self, reference: MemoryReference, child_path: Optional[Tuple[str, ...]]):
+        self._reference = reference
+        self._child_path = child_path
+        self._start: Optional[tuple] = None
+        self._end: Optional[tuple] = None
+        self._first: Optional[int] = None
+        self._last: Optional[int] = None
+
+    def _rank(self, key: str, value: Any) -> tuple:
+        """Position of an entry; only its first element is compared with bounds"""
+        if self._child_path is None:
+            return (_key_rank(key),)
+        for segment in self._child_path:
+            value = value.get(segment) if isinstance(value, dict) else None
+        return _value_rank(value), _key_rank(key)
+
+    def _bound(self, value: Any) -> tuple:
+        return _key_rank(value) if self._child_path is None else _value_rank(value)
+
+    def start_at(self, start: Any) -> "MemoryQuery":
+        self._start = self._bound(start)
+        return self
+
+    def end_at(self, end: Any) -> "MemoryQuery":
+        self._end = self._bound(end)
+        return self
+
+    def equal_to(self, value: Any) -> "MemoryQuery":
+        return self.start_at(value).end_at(value)
+
+    def limit_to_first(self, limit: int) -> "MemoryQuery":
+        self._first = limit
+        return self
+
+    def limit_to_last(self, limit: int) -> "MemoryQuery":
+        self._last = limit
+        return self
+
+    def get(self) -> "OrderedDict[str, Any]":
+        database = self._reference._database
+        database._round_trip()
+        with database._lock:
+            node = database._read(self._reference._segments)
+            ranked = sorted(
+                (self._rank(key, value), key, value)
+                for key, value in (node.items() if isinstance(node, dict) else ())
+            )
+            selected = [
+                (key, value) for rank, key, value in ranked
+                if (self._start is None or rank[0] >= self._start) and (self._end is None or rank[0] <= self._end)
+            ]
+            if self._first is not None:
+                selected = selected[:self._first]
+            if self._last is not None:
+                selected = selected[-self._last:] if self._last else []
+            # Like the REST API, results with mostly consecutive integer keys are arrays
+            result = _to_json(dict(selected)) if selected else {}
+            return result if isinstance(result, list) else OrderedDict(result)
+
+
+def _split(path: str) -> Tuple[str, ...]:
+    return tuple(segment for segment in path.split("/") if segment)
+
+
+def _key_rank(key: str) -> tuple:
+    """Firebase key order: integer keys numerically, then the rest as strings"""
+    if key.isdigit() or (key.startswith("-") and key[1:].isdigit()):
+        return (0, int(key), "")
+    return (1, 0, key)
+
+
+def _value_rank(value: Any) -> tuple:
+    """Firebase value order: null, false, true, numbers, strings, objects"""
+    if value is None:
+        return (0, 0, "")
+    if isinstance(value, bool):
+        return (1, int(value), "")
+    if isinstance(value, (int, float)):
+        return (2, value, "")
+    if isinstance(value, str):
+        return (3, 0, value)
+    return (4, 0, "")
+
+
+def _normalize(value: Any) -> Any:
+    """Copy a value into storage form: lists become objects, empty objects None"""
+    if isinstance(value, (list, tuple)):
+        value = {str(index): item for index, item in enumerate(value)}
+    if isinstance(value, dict):
+        value = {str(key): _normalize(item) for key, item in value.items()}
+        value = {key: item for key, item in value.items() if item is not None}
+        return value or None
+    return value
+
+
+def _to_json(value: Any) -> Any:
+    """Copy a stored value the way the REST API returns it"""
+    if not isinstance(value, dict):
+        return copy.copy(value)
+    converted = {key: _to_json(item) for key, item in value.items()}
+    # Objects whose keys are mostly consecutive integers come back as arrays
+    if all(key.isdigit() for key in converted):
+        indices = [int(key) for key in converted]
+        if max(indices) < 2 * len(indices):
+            array = [None] * (max(indices) + 1)
+            for index, item in zip(indices, converted.values()):
+                array[index] = item
+            return array
+    return converted
+
+
+def _resolve_server_values(value: Any, current: Any) -> Any:
+    if isinstance(value, dict):
+        server_value = value.get(".sv")
+        if server_value == "timestamp":
+            return int(time.time() * 1000)
+        if isinstance(server_value, dict) and "increment" in server_value:
+            base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+            return base + server_value["increment"]
+        return {
+            key: _resolve_server_values(item, current.get(key) if isinstance(current, dict) else None)
+            for key, item in value.items()
+        }
+    return value
@@ -0,0 +1,108 @@
+import time
+import functools
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+try:
+    # Spans are no-ops until an OpenTelemetry SDK is configured (e.g. with opentelemetry-instrument)
+    from opentelemetry import trace
+    tracer = trace.get_tracer("follow_my_reading")
+except ImportError:
+    tracer = None
+
+# Buckets from a few milliseconds (database calls) to several minutes (long recordings)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+SIZE_BUCKETS = tuple(2 ** power for power in range(10, 28, 2))  # 1 KiB .. 128 MiB
+RTF_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+
+REQUEST_SECONDS = Histogram(
+    "fmr_http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    "fmr_stage_seconds", "Time spent in each stage of the upload pipelines", ["stage"], buckets=LATENCY_BUCKETS
+)
+DATABASE_SECONDS = Histogram(
+    "fmr_database_seconds", "Latency of repository calls", ["operation"], buckets=LATENCY_BUCKETS
+)
+DATABASE_ERRORS = Counter("fmr_database_errors_total", "Repository calls that raised", ["operation"])
+PAYLOAD_BYTES = Histogram("fmr_payload_bytes", "Size of uploaded files", ["kind"], buckets=SIZE_BUCKETS)
+AUDIO_SECONDS = Counter("fmr_audio_seconds_total", "Seconds of audio transcribed")
+REAL_TIME_FACTOR = Histogram(
+    "fmr_real_time_factor", "Inference time divided by audio duration", ["engine"], buckets=RTF_BUCKETS
+)
+TRANSCRIPTIONS = Counter("fmr_transcriptions_total", "Finished transcriptions", ["cached"])
+QUEUE_DEPTH = Gauge("fmr_transcription_queue_depth", "Transcription jobs queued or running")
+QUEUE_CAPACITY = Gauge("fmr_transcription_queue_capacity", "Transcription jobs accepted before rejecting")
+JOBS = Gauge("fmr_background_jobs", "Background jobs by status", ["status"])
+
+
+def render() -> tuple:
+    """Body and content type of the /metrics response"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage, inside a trace span when tracing is set up"""
+    span = tracer.start_as_current_span(name) if tracer else None
+    started = time.perf_counter()
+    try:
+        if span:
+            with span:
+                yield
+        else:
+            yield
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+def observe_transcription(total_seconds: float, timings: Optional[Dict], engine: str) -> None:
+    """Record the worker-side timings a transcription job returned.
+
+    Decoding and inference run in worker processes, so they are measured
+    there and reported with the result; the rest of the call is time spent
+    waiting for a free worker.
+    """
+    if not timings:
+        return
+    worker_seconds = timings["decode"] + timings["inference"]
+    STAGE_SECONDS.labels("transcription_queue").observe(max(0.0, total_seconds - worker_seconds))
+    STAGE_SECONDS.labels("decode_audio").observe(timings["decode"])
+    TRANSCRIPTIONS.labels(str(timings["cached"]).lower()).inc()
+    if timings["cached"]:
+        return
+    STAGE_SECONDS.labels("inference").observe(timings["inference"])
+    AUDIO_SECONDS.inc(timings["audio_seconds"])
+    if timings["audio_seconds"] > 0:
+        REAL_TIME_FACTOR.labels(engine).observe(timings["inference"] / timings["audio_seconds"])
+
+
+class TimedRepository:
+    """Repository wrapper recording the latency of every call"""
+
+    def __init__(self, repository: Any):
+        self.repository = repository
+
+    def __getattr__(self, name: str):
+        method = getattr(self.repository, name)
+        if not callable(method):
+            return method
+
+        histogram = DATABASE_SECONDS.labels(name)
+
+        @functools.wraps(method)
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                # Lookups of missing documents raise 404s; only count failures
+                if getattr(e, "status_code", 500) >= 500:
+                    DATABASE_ERRORS.labels(name).inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started)
+
+        return call
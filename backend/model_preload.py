@@ -0,0 +1,14 @@
+"""Load the transcription model in the fork server.
+
+TranscriptionPool lists this module as forkserver preload, so the server
+process imports it once and every worker it forks shares the weights
+copy-on-write instead of reading its own copy from disk.
+"""
+import gc
+
+import settings
+from engines import preload_engine
+
+preload_engine(settings.TRANSCRIBE_ENGINE, settings.WHISPER_MODEL)
+# Keep the collector from touching (and so copying) pages of the preloaded objects
+gc.freeze()
@@ -0,0 +1,193 @@
+import os
+import re
+import logging
+import threading
+from io import BytesIO
+from functools import lru_cache
+from itertools import groupby
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A4 in points
+PAGE_WIDTH, PAGE_HEIGHT = 595.27, 841.89
+MARGIN = 50
+
+# Used when none of the configured TrueType fonts exists (Latin-1 only)
+FALLBACK_FONT = "Helvetica"
+
+# Adobe CID fonts for East Asian scripts without an embeddable TrueType
+# font: (first, last codepoint, font). PDF viewers supply these fonts.
+CID_FONTS = [
+    (0x1100, 0x11FF, "HYSMyeongJo-Medium"),
+    (0x3040, 0x30FF, "HeiseiMin-W3"),
+    (0x3130, 0x318F, "HYSMyeongJo-Medium"),
+    (0xAC00, 0xD7AF, "HYSMyeongJo-Medium"),
+    (0x2E80, 0x9FFF, "STSong-Light"),
+    (0xF900, 0xFAFF, "STSong-Light"),
+    (0xFF00, 0xFFEF, "STSong-Light"),
+]
+
+# Cached word widths per renderer before the cache is reset
+MAX_CACHED_WORDS = 200_000
+
+_TOKEN = re.compile(r"\S+|\s+")
+
+
+class PdfRenderer:
+    """Lays out plain text on A4 pages with embedded Unicode fonts.
+
+    Every character is drawn with the first configured TrueType font that
+    has a glyph for it (fonts are embedded as subsets), falling back to CID
+    fonts for CJK text. Lines are wrapped at spaces, or between characters
+    when a word is wider than the page. Glyph widths and wrapped paragraphs
+    are cached and reused by later documents; fonts load on first use.
+    """
+
+    def __init__(self, font_paths: Sequence[str], font_size: float = 11, layout_cache_size: int = 4096):
+        self.font_paths = list(font_paths)
+        self.font_size = font_size
+        self.leading = round(font_size * 1.35, 1)
+        self.line_width = PAGE_WIDTH - 2 * MARGIN
+        self.lines_per_page = int((PAGE_HEIGHT - 2 * MARGIN) // self.leading)
+        self.wrap = lru_cache(maxsize=layout_cache_size)(self._wrap)
+
+        self._fonts: Optional[List[Tuple[str, frozenset]]] = None
+        self._font_lock = threading.Lock()
+        self._font_of: Dict[str, str] = {}
+        self._char_widths: Dict[str, float] = {}
+        self._word_widths: Dict[str, float] = {}
+
+    def _load_fonts(self) -> List[Tuple[str, frozenset]]:
+        """Register the configured fonts with their character coverage"""
+        with self._font_lock:
+            if self._fonts is not None:
+                return self._fonts
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+            from reportlab.pdfbase.ttfonts import TTFont, TTFError
+
+            fonts, missing = [], []
+            for path in self.font_paths:
+                name = os.path.splitext(os.path.basename(path))[0]
+                try:
+                    if name not in pdfmetrics.getRegisteredFontNames():
+                        pdfmetrics.registerFont(TTFont(name, path))
+                except (OSError, TTFError):
+                    missing.append(path)
+                    continue
+                fonts.append((name, frozenset(pdfmetrics.getFont(name).face.charToGlyph)))
+            if missing:
+                logger.warning(f"PDF fonts not found: {', '.join(missing)}")
+            if not fonts:
+                logger.warning("No PDF fonts found, text outside Latin-1 will not render")
+            for cid_font in {font for _, _, font in CID_FONTS}:
+                pdfmetrics.registerFont(UnicodeCIDFont(cid_font))
+
+            self._fonts = fonts
+            return fonts
+
+    def font_of(self, char: str) -> str:
+        """Name of the font that draws a character"""
+        font = self._font_of.get(char)
+        if font:
+            return font
+
+        code = ord(char)
+        fonts = self._fonts if self._fonts is not None else self._load_fonts()
+        font = next((name for name, covered in fonts if code in covered), None)
+        if font is None:
+            font = next((cid for first, last, cid in CID_FONTS if first <= code <= last), None)
+        if font is None:
+            font = fonts[0][0] if fonts else FALLBACK_FONT
+        self._font_of[char] = font
+        return font
+
+    def runs(self, line: str) -> List[Tuple[str, str]]:
+        """Split a line into (font, text) runs"""
+        fonts = {self.font_of(char) for char in set(line)}
+        if len(fonts) == 1:
+            return [(fonts.pop(), line)]
+        return [(font, "".join(chars)) for font, chars in groupby(line, key=self.font_of)]
+
+    def char_width(self, char: str) -> float:
+        width = self._char_widths.get(char)
+        if width is None:
+            from reportlab.pdfbase.pdfmetrics import stringWidth
+
+            width = self._char_widths[char] = stringWidth(char, self.font_of(char), self.font_size)
+        return width
+
+    def text_width(self, text: str) -> float:
+        width = self._word_widths.get(text)
+        if width is None:
+            if len(self._word_widths) >= MAX_CACHED_WORDS:
+                self._word_widths.clear()
+            width = self._word_widths[text] = sum(self.char_width(char) for char in text)
+        return width
+
+    def _wrap(self, paragraph: str) -> Tuple[str, ...]:
+        """Break one line of input text into lines that fit the page width"""
+        lines = []
+        line, width = "", 0.0
+        for token in _TOKEN.findall(paragraph.replace("\t", "    ")):
+            token_width = self.text_width(token)
+            if width + token_width <= self.line_width:
+                line, width = line + token, width + token_width
+            elif token.isspace():
+                # Spaces at a line break are dropped
+                lines.append(line)
+                line, width = "", 0.0
+            else:
+                if line:
+                    lines.append(line.rstrip())
+                    line, width = "", 0.0
+                if token_width <= self.line_width:
+                    line, width = token, token_width
+                    continue
+                # A word wider than the page (or a run of CJK text) is split between characters
+                for char in token:
+                    char_width = self.char_width(char)
+                    if width + char_width > self.line_width and line:
+                        lines.append(line)
+                        line, width = "", 0.0
+                    line, width = line + char, width + char_width
+        lines.append(line.rstrip())
+        return tuple(lines)
+
+    def layout(self, text: str) -> List[List[str]]:
+        """Split text into pages of wrapped lines"""
+        pages, page = [], []
+        for paragraph in text.splitlines() or [""]:
+            for line in self.wrap(paragraph) if paragraph.strip() else ("",):
+                if len(page) == self.lines_per_page:
+                    pages.append(page)
+                    page = []
+                page.append(line)
+        pages.append(page)
+        return pages
+
+    def render(self, text: str) -> Tuple[bytes, List[str]]:
+        """Render text to PDF bytes; also returns the text of every page"""
+        from reportlab.pdfgen import canvas
+
+        pages = self.layout(text)
+        buffer = BytesIO()
+        # invariant leaves out the creation date, so the same text always gives the same file
+        pdf = canvas.Canvas(buffer, pagesize=(PAGE_WIDTH, PAGE_HEIGHT), invariant=1)
+        top = PAGE_HEIGHT - MARGIN - self.font_size
+        for lines in pages:
+            text_object = pdf.beginText(MARGIN, top)
+            current_font = self.font_of(" ")
+            text_object.setFont(current_font, self.font_size, self.leading)
+            for line in lines:
+                for font, run in self.runs(line) if line else ():
+                    if font != current_font:
+                        text_object.setFont(font, self.font_size, self.leading)
+                        current_font = font
+                    text_object.textOut(run)
+                text_object.textLine()
+            pdf.drawText(text_object)
+            pdf.showPage()
+        pdf.save()
+        return buffer.getvalue(), ["\n".join(lines) for lines in pages]
@@ -0,0 +1,126 @@
+import re
+import math
+import asyncio
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+# Below this many pages a PDF is extracted on one thread
+MIN_PAGES_PER_TASK = 8
+
+_WORD_RE = re.compile(r"\S+")
+
+
+class PdfFormatError(Exception):
+    """Raised when an uploaded PDF cannot be parsed"""
+
+
+def _open(pdf_bytes: bytes):
+    import PyPDF2
+
+    try:
+        return PyPDF2.PdfReader(BytesIO(pdf_bytes))
+    except PyPDF2.errors.PdfReadError as e:
+        raise PdfFormatError(str(e)) from e
+
+
+def count_pages(pdf_bytes: bytes) -> int:
+    """Number of pages of a PDF"""
+    return len(_open(pdf_bytes).pages)
+
+
+def extract_page_range(pdf_bytes: bytes, start: int, end: int) -> List[str]:
+    """Text of pages start..end-1, one string per page"""
+    import PyPDF2
+
+    reader = _open(pdf_bytes)
+    try:
+        return [reader.pages[index].extract_text() or "" for index in range(start, end)]
+    except PyPDF2.errors.PdfReadError as e:
+        raise PdfFormatError(str(e)) from e
+
+
+def join_pages(pages: List[str]) -> str:
+    """Document text from page texts, skipping pages without text"""
+    return "\n".join(page.strip() for page in pages if page.strip())
+
+
+def locate_pages(text: str, page_texts: List[str], start: int) -> Tuple[int, int, int]:
+    """Find pages start.. of page_texts (a document's pages from the first) in its text.
+
+    Page texts can split words that the text keeps whole (the renderer
+    breaks over-long words and CJK runs between characters), so pages are
+    matched by the number of non-space characters before and on them.
+    Returns the number of words of text before the pages and the character
+    range of the words on them; a word split by the page break belongs to
+    the page it starts on.
+    """
+    def characters(pages: List[str]) -> int:
+        return sum(len(word) for page in pages for word in _WORD_RE.findall(page))
+
+    before = characters(page_texts[:start])
+    stop = before + characters(page_texts[start:])
+    words = seen = 0
+    begin = end = None
+    for match in _WORD_RE.finditer(text):
+        if seen >= stop:
+            break
+        if seen >= before:
+            if begin is None:
+                first_word, begin = words, match.start()
+            end = match.end()
+        words += 1
+        seen += len(match.group())
+    if begin is None:
+        return words, len(text), len(text)
+    return first_word, begin, end
+
+
+def parse_page_range(value: str, page_count: int) -> Optional[Tuple[int, int]]:
+    """Parse a 1-based inclusive "first-last" (or single page) range into 0-based start, end"""
+    first, dash, last = value.strip().partition("-")
+    try:
+        start = int(first) - 1 if first else 0
+        end = int(last) if last else (page_count if dash else start + 1)
+    except ValueError:
+        return None
+    start, end = max(0, start), min(page_count, end)
+    return (start, end) if start < end else None
+
+
+class PdfTextExtractor:
+    """Extracts page texts on a pool of worker processes.
+
+    PyPDF2 is pure Python, so pages are split into contiguous ranges that
+    are extracted in parallel processes and concatenated in page order.
+    The pool is started on first use.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def extract_pages(self, pdf_bytes: bytes) -> List[str]:
+        """Text of every page of a PDF"""
+        page_count = await asyncio.to_thread(count_pages, pdf_bytes)
+        tasks = min(self.workers * 2, page_count // MIN_PAGES_PER_TASK)
+        if self.workers == 1 or tasks < 2:
+            return await asyncio.to_thread(extract_page_range, pdf_bytes, 0, page_count)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        loop = asyncio.get_running_loop()
+        step = math.ceil(page_count / tasks)
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, extract_page_range, pdf_bytes, start, min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ))
+        return [page for part in parts for page in part]
+
+    def shutdown(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
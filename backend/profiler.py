@@ -0,0 +1,82 @@
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+
+class SamplingProfiler:
+    """Statistical profiler of the API process that can be started and stopped at runtime.
+
+    A background thread records the stack of every other thread each
+    interval; report() returns the samples in collapsed-stack format
+    ("frame;frame;frame count" per line), which flamegraph.pl and
+    speedscope read directly. Sampling only pauses the interpreter for the
+    stack walk, so it is cheap enough to run for a while in production.
+    Transcription workers are separate processes and are not sampled.
+    """
+
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self.interval = 0.01
+        self.samples: Counter = Counter()
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval_ms: float = 10) -> None:
+        """Start sampling, discarding the previous profile"""
+        with self._lock:
+            if self._thread:
+                return
+            self.interval = max(1.0, interval_ms) / 1000
+            self.samples = Counter()
+            self.started_at, self.stopped_at = time.time(), None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self._thread:
+                return
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.stopped_at = time.time()
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "samples": sum(self.samples.values())
+        }
+
+    def report(self) -> str:
+        """Samples in collapsed-stack format, most frequent stacks first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
@@ -0,0 +1,260 @@
+import json
+import time
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+
+from alignment import MATCH, SUBSTITUTION, OMISSION, INSERTION, align_transcript, normalize_word
+
+# Recordings kept per user / document for trends and the recent moving average
+RECENT_RECORDINGS = 20
+# Weight of the newest recording in the exponential moving average of accuracy
+ACCURACY_EMA_ALPHA = 0.3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recorded (
+    audio_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS totals (
+    user_id TEXT NOT NULL,
+    pdf_id TEXT NOT NULL,
+    recordings INTEGER NOT NULL,
+    aligned_recordings INTEGER NOT NULL,
+    reference_words INTEGER NOT NULL,
+    matched INTEGER NOT NULL,
+    substitutions INTEGER NOT NULL,
+    omissions INTEGER NOT NULL,
+    insertions INTEGER NOT NULL,
+    accuracy_sum REAL NOT NULL,
+    accuracy_ema REAL,
+    spoken_words INTEGER NOT NULL,
+    speaking_seconds REAL NOT NULL,
+    rate_count INTEGER NOT NULL,
+    rate_mean REAL NOT NULL,
+    rate_m2 REAL NOT NULL,
+    first_at REAL,
+    last_at REAL,
+    recent TEXT NOT NULL,
+    PRIMARY KEY (user_id, pdf_id)
+);
+CREATE TABLE IF NOT EXISTS words (
+    user_id TEXT NOT NULL,
+    pdf_id TEXT NOT NULL,
+    word TEXT NOT NULL,
+    read INTEGER NOT NULL,
+    substitutions INTEGER NOT NULL,
+    omissions INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    PRIMARY KEY (user_id, pdf_id, word)
+);
+CREATE INDEX IF NOT EXISTS words_errors ON words (user_id, pdf_id, errors);
+"""
+
+_COUNTERS = ("reference_words", "matched", "substitutions", "omissions", "insertions", "spoken_words")
+
+
+def summarize_recording(recording: Dict, reference_text: Optional[str] = None) -> Dict:
+    """What a stored recording adds to the statistics.
+
+    Recordings stored before alignment existed are aligned against
+    reference_text if it is given; otherwise they only count towards the
+    number of recordings and the speaking rate.
+    """
+    chunks = recording.get("chunks") or []
+    alignment = recording.get("alignment")
+    if not alignment and reference_text and chunks:
+        alignment = align_transcript(reference_text, chunks)
+    if alignment and alignment.get("aligned") is False:
+        alignment = None  # the reading did not follow the text, so it says nothing about accuracy
+
+    summary = {
+        "user_id": recording.get("uploader_id") or "",
+        "created_at": recording.get("created_at") or time.time(),
+        "accuracy": alignment["accuracy"] if alignment else None,
+        "spoken_words": len(chunks),
+        # Speaking time runs from the first to the last recognised word, so silence around the reading is left out
+        "speaking_seconds": max(0.0, chunks[-1]["end"] - chunks[0]["start"]) if chunks else 0.0,
+        "words": {}
+    }
+    ops = defaultdict(int)
+    words: Dict[str, list] = defaultdict(lambda: [0, 0, 0])  # read, substitutions, omissions
+    for word in (alignment or {}).get("words") or []:
+        ops[word["op"]] += 1
+        if word["op"] == INSERTION:
+            continue
+        counts = words[normalize_word(word.get("word") or "")]
+        counts[0] += 1
+        counts[1] += word["op"] == SUBSTITUTION
+        counts[2] += word["op"] == OMISSION
+    summary.update({
+        "reference_words": ops[MATCH] + ops[SUBSTITUTION] + ops[OMISSION],
+        "matched": ops[MATCH],
+        "substitutions": ops[SUBSTITUTION],
+        "omissions": ops[OMISSION],
+        "insertions": ops[INSERTION],
+        "words": {word: counts for word, counts in words.items() if word}
+    })
+    return summary
+
+
+def words_per_minute(words: int, seconds: float) -> Optional[float]:
+    return round(words / seconds * 60, 1) if seconds > 0 and words else None
+
+
+class ReadingStats:
+    """Reading progress aggregates per user, per document and per user and document.
+
+    Every finished recording updates a row of counters for each of the three
+    keys, so a statistics request reads one row and the most misread words
+    from an index, however long the history is. Accuracy is kept as an
+    all-time mean, an exponential moving average and a window of the last
+    RECENT_RECORDINGS recordings; speaking rate as total words over total
+    speaking time plus the mean and spread of the per-recording rates.
+    Recordings are counted once by audio_id. The SQLite file can be rebuilt
+    from the database (manage.py rebuild-stats).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._columns = [column[0] for column in self._db.execute("SELECT * FROM totals LIMIT 0").description]
+
+    def add(self, pdf_id: str, audio_id: str, summary: Dict) -> None:
+        """Count a recording (see summarize_recording) unless it was counted before"""
+        self._write([(pdf_id, audio_id, summary)])
+
+    def rebuild(self, recordings: Iterable[Tuple[str, str, Dict]]) -> int:
+        """Replace all statistics with the given (pdf_id, audio_id, summary) triples; returns their number.
+
+        Moving averages depend on order, so pass recordings oldest first.
+        """
+        return self._write(recordings, clear=True)
+
+    def _write(self, recordings: Iterable[Tuple[str, str, Dict]], clear: bool = False) -> int:
+        count = 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if clear:
+                    for table in ("recorded", "totals", "words"):
+                        self._db.execute(f"DELETE FROM {table}")
+                for pdf_id, audio_id, summary in recordings:
+                    if self._db.execute("INSERT OR IGNORE INTO recorded VALUES (?)", (audio_id,)).rowcount:
+                        # The user's totals, the document's, and the user's on this document; a recording
+                        # without an uploader counts for the document only, as ("", pdf_id) is the document's key
+                        user_id = summary["user_id"]
+                        keys = [(user_id, ""), ("", pdf_id), (user_id, pdf_id)] if user_id else [("", pdf_id)]
+                        for key in keys:
+                            self._add(key, pdf_id, audio_id, summary)
+                        count += 1
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return count
+
+    def _add(self, key: Tuple[str, str], pdf_id: str, audio_id: str, summary: Dict) -> None:
+        row = self._db.execute("SELECT * FROM totals WHERE user_id = ? AND pdf_id = ?", key).fetchone()
+        totals = dict(zip(self._columns, row)) if row else {
+            "user_id": key[0], "pdf_id": key[1], "recordings": 0, "aligned_recordings": 0,
+            **dict.fromkeys(_COUNTERS, 0), "accuracy_sum": 0.0, "accuracy_ema": None, "speaking_seconds": 0.0,
+            "rate_count": 0, "rate_mean": 0.0, "rate_m2": 0.0, "first_at": None, "last_at": None, "recent": "[]"
+        }
+
+        totals["recordings"] += 1
+        for name in _COUNTERS:
+            totals[name] += summary[name]
+        totals["speaking_seconds"] += summary["speaking_seconds"]
+        accuracy = summary["accuracy"]
+        if accuracy is not None:
+            totals["aligned_recordings"] += 1
+            totals["accuracy_sum"] += accuracy
+            ema = totals["accuracy_ema"]
+            totals["accuracy_ema"] = accuracy if ema is None else (
+                ACCURACY_EMA_ALPHA * accuracy + (1 - ACCURACY_EMA_ALPHA) * ema
+            )
+        rate = words_per_minute(summary["spoken_words"], summary["speaking_seconds"])
+        if rate is not None:
+            # Welford's update keeps the mean and variance of per-recording rates in one pass
+            totals["rate_count"] += 1
+            delta = rate - totals["rate_mean"]
+            totals["rate_mean"] += delta / totals["rate_count"]
+            totals["rate_m2"] += delta * (rate - totals["rate_mean"])
+        created_at = summary["created_at"]
+        totals["first_at"] = min(created_at, totals["first_at"] or created_at)
+        totals["last_at"] = max(created_at, totals["last_at"] or created_at)
+        recent = json.loads(totals["recent"]) + [{
+            "audio_id": audio_id,
+            "pdf_id": pdf_id,
+            "user_id": summary["user_id"],
+            "created_at": created_at,
+            "accuracy": accuracy,
+            "words_per_minute": rate
+        }]
+        totals["recent"] = json.dumps(recent[-RECENT_RECORDINGS:])
+
+        self._db.execute(
+            f"INSERT OR REPLACE INTO totals ({', '.join(self._columns)}) "
+            f"VALUES ({', '.join('?' * len(self._columns))})",
+            [totals[name] for name in self._columns]
+        )
+        self._db.executemany(
+            "INSERT INTO words (user_id, pdf_id, word, read, substitutions, omissions, errors) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, pdf_id, word) DO UPDATE SET "
+            "read = read + excluded.read, substitutions = substitutions + excluded.substitutions, "
+            "omissions = omissions + excluded.omissions, errors = errors + excluded.errors",
+            [
+                (*key, word, read, substitutions, omissions, substitutions + omissions)
+                for word, (read, substitutions, omissions) in summary["words"].items()
+            ]
+        )
+
+    def get(self, user_id: Optional[str] = None, pdf_id: Optional[str] = None, top_words: int = 10) -> Dict:
+        """Statistics of a user, a document, or a user reading one document"""
+        key = (user_id or "", pdf_id or "")
+        with self._lock:
+            row = self._db.execute("SELECT * FROM totals WHERE user_id = ? AND pdf_id = ?", key).fetchone()
+            words = self._db.execute(
+                "SELECT word, errors, read, substitutions, omissions FROM words "
+                "WHERE user_id = ? AND pdf_id = ? AND errors > 0 ORDER BY errors DESC, read DESC LIMIT ?",
+                (*key, top_words)
+            ).fetchall()
+        if not row:
+            return {"recordings": 0, "first_at": None, "last_at": None, "accuracy": None, "words": None,
+                    "speaking_rate": None, "misread_words": [], "recent": []}
+
+        totals = dict(zip(self._columns, row))
+        recent = json.loads(totals["recent"])
+        recent_accuracies = [entry["accuracy"] for entry in recent if entry["accuracy"] is not None]
+        recent_mean = sum(recent_accuracies) / len(recent_accuracies) if recent_accuracies else None
+        aligned = totals["aligned_recordings"]
+        return {
+            "recordings": totals["recordings"],
+            "first_at": totals["first_at"],
+            "last_at": totals["last_at"],
+            "accuracy": {
+                "mean": round(totals["accuracy_sum"] / aligned, 4),
+                "moving_average": round(totals["accuracy_ema"], 4),
+                "recent_mean": round(recent_mean, 4) if recent_mean is not None else None,
+                "last": recent_accuracies[-1] if recent_accuracies else None,
+                "recordings": aligned
+            } if aligned else None,
+            "words": {name: totals[name] for name in _COUNTERS if name != "spoken_words"},
+            "speaking_rate": {
+                "words_per_minute": words_per_minute(totals["spoken_words"], totals["speaking_seconds"]),
+                "mean": round(totals["rate_mean"], 1),
+                "stddev": round((totals["rate_m2"] / totals["rate_count"]) ** 0.5, 1),
+                "spoken_words": totals["spoken_words"],
+                "speaking_seconds": round(totals["speaking_seconds"], 1)
+            } if totals["rate_count"] else None,
+            "misread_words": [
+                {"word": word, "errors": errors, "read": read, "substitutions": substitutions,
+                 "omissions": omissions, "error_rate": round(errors / read, 4)}
+                for word, errors, read, substitutions, omissions in words
+            ],
+            "recent": recent
+        }
@@ -0,0 +1,191 @@
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import settings
+
+# Length of the text preview kept in the listing index
+PREVIEW_LENGTH = 200
+
+
+def make_index_key(created_at: Optional[float], pdf_id: str) -> str:
+    """Index key that sorts documents by creation time"""
+    return f"{int((created_at or 0) * 1000):013d}_{pdf_id}"
+
+
+def make_idempotency_key(uploader_id: str, key: str) -> str:
+    """Database-safe form of a client Idempotency-Key, scoped to the uploader"""
+    return hashlib.sha256(f"{uploader_id}\n{key}".encode()).hexdigest()
+
+
+def make_summary(pdf_id: str, data: Dict) -> Dict:
+    """Lightweight listing entry for a document"""
+    return {
+        "pdf_id": pdf_id,
+        "user_id": data.get("user_id"),
+        "text": (data.get("text") or "")[:PREVIEW_LENGTH],  # preview, named "text" for old clients
+        "created_at": data.get("created_at"),
+        "recordings_count": len(data.get("audio_recordings") or {})
+    }
+
+
+def make_recording_summary(audio_id: str, data: Dict) -> Dict:
+    """Listing entry for a recording, without audio and word chunks"""
+    return {
+        "audio_id": audio_id,
+        "uploader_id": data.get("uploader_id"),
+        "created_at": data.get("created_at"),
+        "audio_blob": data.get("audio_blob"),
+        "semantic_ok": data.get("semantic_ok"),
+        "accuracy": data.get("accuracy"),
+        "ref_end": (data.get("alignment") or {}).get("ref_end"),
+        "words_count": len(data.get("chunks") or [])
+    }
+
+
+class Repository(ABC):
+    """Storage of documents, their recordings and word chunks.
+
+    Documents are dicts shaped like the Firebase tree
+    pdf_files/{pdf_id}: text, user_id, created_at, pdf_blob, ... and
+    audio_recordings/{audio_id} with a "chunks" list of {text, start, end}.
+    Methods block; async code calls them through AsyncDatabase. Lookups of
+    a missing document or recording raise HTTPException(404).
+    """
+
+    @abstractmethod
+    def save_pdf_data(self, data: Dict, pdf_id: str, pages: Optional[List[str]] = None) -> None:
+        """Store a new document; pages, if given, are stored like save_pdf_pages"""
+
+    @abstractmethod
+    def save_audio_data(
+            self,
+            pdf_id: str,
+            audio_data: Dict,
+            idempotency_key: Optional[str] = None,
+            audio_id: Optional[str] = None
+    ) -> str:
+        """Store a finished recording and return its audio_id.
+
+        An idempotency key (see make_idempotency_key) is recorded with it, so
+        a retried upload can be answered with this audio_id. Pass the audio_id
+        of a recording opened with start_recording to complete it.
+        """
+
+    @abstractmethod
+    def save_pdf_pages(self, digest: str, pages: List[str]) -> None:
+        """Store the page texts of a PDF under the SHA-256 of the file"""
+
+    @abstractmethod
+    def get_pdf_pages(self, digest: str, start: int = 0, end: Optional[int] = None) -> Optional[List[str]]:
+        """Page texts start..end-1 of a stored PDF, or None if it was never extracted"""
+
+    @abstractmethod
+    def start_recording(self, pdf_id: str, audio_data: Dict) -> str:
+        """Create a recording that is still being transcribed and return its audio_id.
+
+        It is left out of recording listings until save_audio_data completes
+        it; until then chunks are added with append_recording_chunks.
+        """
+
+    @abstractmethod
+    def append_recording_chunks(self, pdf_id: str, audio_id: str, first_index: int, chunks: List[Dict]) -> None:
+        """Write chunks of a recording in progress, starting at list position first_index"""
+
+    @abstractmethod
+    def delete_recording(self, pdf_id: str, audio_id: str) -> None:
+        """Remove a recording that was never completed"""
+
+    @abstractmethod
+    def get_pdf(self, pdf_id: str) -> Dict:
+        """Whole document with its recordings"""
+
+    @abstractmethod
+    def get_pdf_fields(self, pdf_id: str, fields: List[str]) -> Dict:
+        """Only the given fields of a document; fields that are not stored are left out.
+
+        A field may be a path into the document, e.g. audio_recordings/<id>/chunks.
+        """
+
+    @abstractmethod
+    def list_recordings(self, pdf_id: str, page: int, page_size: int) -> Tuple[List[Dict], int]:
+        """Recording summaries of a document newest first; returns (items, total)"""
+
+    @abstractmethod
+    def get_idempotent_audio_id(self, pdf_id: str, idempotency_key: str) -> Optional[str]:
+        """audio_id of the recording saved earlier under an idempotency key"""
+
+    @abstractmethod
+    def get_reading_position(self, pdf_id: str, uploader_id: str) -> int:
+        """Index of the reference word after the uploader's latest recording, 0 if none"""
+
+    @abstractmethod
+    def set_pdf_language(self, pdf_id: str, language: str) -> None:
+        """Remember the spoken language detected for a document"""
+
+    @abstractmethod
+    def get_recording_chunks(self, pdf_id: str, audio_id: str) -> List[Dict]:
+        """Word chunks of one recording"""
+
+    @abstractmethod
+    def list_pdf_summaries(
+            self,
+            page_size: int,
+            user_id: Optional[str] = None,
+            page: int = 1,
+            cursor: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str], int]:
+        """Document summaries newest first; returns (items, next_cursor, total).
+
+        cursor is the next_cursor of the previous page; page is used without one.
+        """
+
+    @abstractmethod
+    def iter_documents(self) -> Iterator[Tuple[str, Dict]]:
+        """Yield (pdf_id, document) for every stored document"""
+
+    @abstractmethod
+    def import_document(self, pdf_id: str, data: Dict) -> None:
+        """Store a document with its recordings as they are (ids and timestamps kept).
+
+        Listing entries and counters are brought up to date by rebuild_index().
+        """
+
+    @abstractmethod
+    def rebuild_index(self) -> int:
+        """Recreate listing entries and counters from the stored documents; returns their number"""
+
+    def cache_stats(self) -> Dict:
+        """Size and hit counters of read caches, if the repository has any"""
+        return {}
+
+
+def _firebase() -> Repository:
+    from firebase_service import FirebaseService
+
+    return FirebaseService()
+
+
+def _memory() -> Repository:
+    from firebase_service import FirebaseService
+    from memory_db import MemoryDatabase
+
+    return FirebaseService(MemoryDatabase(settings.MEMORY_DB_LATENCY_MS).reference)
+
+
+def _sqlite() -> Repository:
+    from sqlite_repository import SqliteRepository
+
+    return SqliteRepository(settings.SQLITE_PATH)
+
+
+REPOSITORIES = {
+    "firebase": _firebase,
+    "memory": _memory,
+    "sqlite": _sqlite,
+}
+
+
+def create_repository(backend: Optional[str] = None) -> Repository:
+    """Build the repository selected by DATABASE_BACKEND (or the given backend)"""
+    return REPOSITORIES[backend or settings.DATABASE_BACKEND]()
@@ -0,0 +1,195 @@
+import re
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from repository import PREVIEW_LENGTH
+
+# Scripts written without spaces between words: every character is indexed as a word
+_UNSPACED = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"  # kana and CJK ideographs
+_UNSPACED_PAIR = re.compile(f"(?<=[{_UNSPACED}])(?=[{_UNSPACED}])")
+# Invisible separator put between those characters; the tokenizer splits on it
+_SEPARATOR = "\u2063"
+# Private-use characters marking matches in snippets
+_MATCH_START, _MATCH_END = "\ue000", "\ue001"
+_MARKERS = re.compile(f"[{_SEPARATOR}{_MATCH_START}{_MATCH_END}]")
+
+SNIPPET_TOKENS = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    pdf_id TEXT NOT NULL UNIQUE,
+    user_id TEXT,
+    created_at REAL,
+    preview TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_text USING fts5(
+    text,
+    owner,
+    tokenize = "unicode61 remove_diacritics 2 categories 'L* N* Co M*'",
+    prefix = '2 3'
+);
+"""
+
+
+def _segment(text: str) -> str:
+    """Text as indexed: markers removed, unspaced scripts split into characters"""
+    return _UNSPACED_PAIR.sub(_SEPARATOR, _MARKERS.sub("", text))
+
+
+def _quote(value: str) -> str:
+    """FTS5 string literal"""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def make_match_query(query: str) -> Optional[str]:
+    """FTS5 query matching documents that contain every word of a search box query.
+
+    Words are quoted, so FTS5 operators typed by users are searched as text,
+    and words of three letters or more also match as prefixes (inflected
+    forms: "маяк" finds "маяка"). A run of CJK characters is a phrase of
+    consecutive characters. None if the query has no words.
+    """
+    terms = []
+    for word in _segment(query).split():
+        if not re.search(r"\w", word):
+            continue
+        term = _quote(word)
+        if len(word) >= 3 and not re.search(f"[{_UNSPACED}]$", word):
+            term += "*"
+        terms.append(term)
+    return " ".join(terms) or None
+
+
+def parse_snippet(snippet: str) -> Tuple[str, List[List[int]]]:
+    """Snippet text without markers and the [start, end) offsets of the matches in it"""
+    text, highlights, start = "", [], None
+    for part in re.split(f"([{_MATCH_START}{_MATCH_END}])", snippet.replace(_SEPARATOR, "")):
+        if part == _MATCH_START:
+            start = len(text)
+        elif part == _MATCH_END:
+            highlights.append([start, len(text)])
+        else:
+            text += part
+    return text, highlights
+
+
+class SearchIndex:
+    """Full-text index of document texts in a SQLite FTS5 file.
+
+    Documents are added as they are uploaded, so a search never reads the
+    database of documents. The unicode61 tokenizer folds case and
+    diacritics for every alphabet; Chinese and Japanese characters are
+    indexed one by one and searched as phrases. Results are ranked by BM25
+    and carry a snippet around the best match. The file can be rebuilt from
+    the database at any time (manage.py rebuild-search-index).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        # owner only narrows searches to one user's documents; it does not count in the score
+        self._db.execute("INSERT INTO documents_text (documents_text, rank) VALUES ('rank', 'bm25(1.0, 0.0)')")
+
+    def add(self, pdf_id: str, data: Dict) -> None:
+        """Index a document, replacing an earlier version of it"""
+        self._write([(pdf_id, data)])
+
+    def rebuild(self, documents: Iterable[Tuple[str, Dict]]) -> int:
+        """Replace the whole index with the given (pdf_id, document) pairs; returns their number.
+
+        Runs in one transaction, so searches see the old index until it commits.
+        """
+        return self._write(documents, clear=True)
+
+    def _write(self, documents: Iterable[Tuple[str, Dict]], clear: bool = False) -> int:
+        count = 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if clear:
+                    self._db.execute("DELETE FROM documents_text")
+                    self._db.execute("DELETE FROM documents")
+                for pdf_id, data in documents:
+                    self._add(pdf_id, data)
+                    count += 1
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return count
+
+    def _add(self, pdf_id: str, data: Dict) -> None:
+        text = data.get("text") or ""
+        row = self._db.execute("SELECT id FROM documents WHERE pdf_id = ?", (pdf_id,)).fetchone()
+        if row:
+            self._db.execute("DELETE FROM documents_text WHERE rowid = ?", row)
+            self._db.execute("DELETE FROM documents WHERE id = ?", row)
+        rowid = self._db.execute(
+            "INSERT INTO documents (pdf_id, user_id, created_at, preview) VALUES (?, ?, ?, ?)",
+            (pdf_id, data.get("user_id"), data.get("created_at") or time.time(), text[:PREVIEW_LENGTH])
+        ).lastrowid
+        self._db.execute(
+            "INSERT INTO documents_text (rowid, text, owner) VALUES (?, ?, ?)",
+            (rowid, _segment(text), data.get("user_id") or "")
+        )
+
+    def search(
+            self,
+            query: str,
+            page_size: int,
+            page: int = 1,
+            user_id: Optional[str] = None
+    ) -> Tuple[List[Dict], int]:
+        """Documents matching a query, best first; returns (items, total).
+
+        Items are listing summaries (without recordings_count) with the
+        snippet text, the offsets of the matches in it and the BM25 score.
+        """
+        match = make_match_query(query)
+        if match is None:
+            return [], 0
+        # Query words are looked up in the text column only, not in owner
+        match = f"text : ({match})"
+        user_filter = ""
+        parameters: tuple = (match,)
+        if user_id is not None:
+            # The owner column finds the user's matches in the full-text index and the
+            # documents table makes the comparison exact; the unary + keeps SQLite
+            # from scanning the user's documents and re-running the match for each
+            user_filter = "AND +documents.user_id = ?"
+            parameters = (f"{match} AND owner : {_quote(user_id)}", user_id)
+        with self._lock:
+            total = self._db.execute(
+                f"SELECT count(*) FROM documents_text JOIN documents ON documents.id = documents_text.rowid "
+                f"WHERE documents_text MATCH ? {user_filter}",
+                parameters
+            ).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT documents.pdf_id, documents.user_id, documents.created_at, documents.preview, "
+                f"snippet(documents_text, 0, ?, ?, '…', {SNIPPET_TOKENS}), rank "
+                f"FROM documents_text JOIN documents ON documents.id = documents_text.rowid "
+                f"WHERE documents_text MATCH ? {user_filter} "
+                f"ORDER BY rank, documents.created_at DESC LIMIT ? OFFSET ?",
+                (_MATCH_START, _MATCH_END, *parameters, page_size, (max(page, 1) - 1) * page_size)
+            ).fetchall() if total else []
+
+        items = []
+        for pdf_id, owner, created_at, preview, snippet, rank in rows:
+            snippet_text, highlights = parse_snippet(snippet)
+            items.append({
+                "pdf_id": pdf_id,
+                "user_id": owner,
+                "text": preview,
+                "created_at": created_at,
+                "snippet": snippet_text,
+                "highlights": highlights,
+                "score": round(-rank, 4)  # bm25() is negative, lower is better
+            })
+        return items, total
+
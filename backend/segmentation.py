@@ -0,0 +1,97 @@
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from audio_decode import SAMPLE_RATE
+
+# Length of the frames the voice activity detector looks at
+FRAME_MS = 30
+# Frames quieter than this RMS level (about -40 dBFS) count as silence
+SILENCE_THRESHOLD = 0.01
+
+
+def split_on_silence(
+        blocks: Iterable[np.ndarray],
+        sample_rate: int = SAMPLE_RATE,
+        max_seconds: float = 30.0,
+        min_seconds: float = 10.0,
+        min_silence_ms: int = 300,
+        threshold: float = SILENCE_THRESHOLD
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Cut a stream of waveform blocks into windows at pauses.
+
+    A window ends in the middle of the first pause of at least
+    min_silence_ms after min_seconds of audio, or at the quietest frame of
+    its last third when max_seconds pass without a pause. Yields
+    (offset in samples, window); windows without speech are skipped. At most
+    one window plus one block is buffered.
+    """
+    frame = sample_rate * FRAME_MS // 1000
+    min_length = int(min_seconds * sample_rate)
+    max_length = int(max_seconds * sample_rate)
+    min_silent_frames = max(1, min_silence_ms // FRAME_MS)
+
+    buffer = np.zeros(0, np.float32)
+    offset = 0
+    for block in blocks:
+        buffer = np.concatenate([buffer, block])
+        while True:
+            cut = _find_cut(buffer, frame, min_length, max_length, min_silent_frames, threshold)
+            if cut is None:
+                break
+            if _has_speech(buffer[:cut], frame, threshold):
+                yield offset, buffer[:cut]
+            buffer = buffer[cut:]
+            offset += cut
+
+    while len(buffer) > max_length:
+        cut = _find_cut(buffer, frame, min_length, max_length, min_silent_frames, threshold)
+        if _has_speech(buffer[:cut], frame, threshold):
+            yield offset, buffer[:cut]
+        buffer = buffer[cut:]
+        offset += cut
+    if len(buffer) and _has_speech(buffer, frame, threshold):
+        yield offset, buffer
+
+
+def _frame_energy(audio: np.ndarray, frame: int) -> np.ndarray:
+    """RMS level of every whole frame"""
+    frames = audio[:len(audio) // frame * frame].reshape(-1, frame)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def _has_speech(audio: np.ndarray, frame: int, threshold: float) -> bool:
+    energy = _frame_energy(audio, frame)
+    if not len(energy):
+        return bool(len(audio)) and float(np.sqrt(np.mean(audio ** 2))) >= threshold
+    return bool((energy >= threshold).any())
+
+
+def _find_cut(
+        buffer: np.ndarray,
+        frame: int,
+        min_length: int,
+        max_length: int,
+        min_silent_frames: int,
+        threshold: float
+) -> Optional[int]:
+    """Sample index to end the next window at, or None to wait for more audio"""
+    if len(buffer) < min_length:
+        return None
+
+    energy = _frame_energy(buffer[:max_length], frame)
+    run_start = None
+    for index, silent in enumerate(np.append(energy < threshold, False)):
+        if silent and run_start is None:
+            run_start = index
+        elif not silent and run_start is not None:
+            middle = (run_start + index) // 2 * frame
+            if index - run_start >= min_silent_frames and middle >= min_length:
+                return middle
+            run_start = None
+
+    if len(buffer) < max_length:
+        return None
+    # No pause long enough: cut at the quietest moment near the end
+    search_from = len(energy) * 2 // 3
+    return (search_from + int(np.argmin(energy[search_from:]))) * frame
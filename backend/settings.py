@@ -0,0 +1,89 @@
+import os
+import multiprocessing
+
+# Firebase
+FIREBASE_CRED_PATH = os.getenv("FIREBASE_CRED_PATH", "pdf-audio-creds.json")
+DATABASE_URL = os.getenv("DATABASE_URL", "https://pdf-audio-25e17-default-rtdb.firebaseio.com")
+# Database (see REPOSITORIES in repository.py): firebase, sqlite (a local indexed file),
+# or memory (an in-process database for local runs and offline benchmarks)
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "firebase")
+# Database file of the sqlite backend
+SQLITE_PATH = os.getenv("SQLITE_PATH", "follow_my_reading.sqlite3")
+# Simulated round trip of every memory database call
+MEMORY_DB_LATENCY_MS = float(os.getenv("MEMORY_DB_LATENCY_MS", "0"))
+# Threads running database calls for async endpoints
+DATABASE_WORKERS = int(os.getenv("DATABASE_WORKERS", "16"))
+# Kept-alive HTTPS connections to Firebase: the database threads plus FastAPI's 40 sync endpoint threads
+FIREBASE_HTTP_POOL_SIZE = int(os.getenv("FIREBASE_HTTP_POOL_SIZE", str(DATABASE_WORKERS + 40)))
+FIREBASE_TIMEOUT_SECONDS = float(os.getenv("FIREBASE_TIMEOUT_SECONDS", "30"))
+# Read-through cache of document fields and listing pages (0 entries disables it)
+DATABASE_CACHE_SIZE = int(os.getenv("DATABASE_CACHE_SIZE", "10000"))
+DATABASE_CACHE_TTL = float(os.getenv("DATABASE_CACHE_TTL", "30"))
+# Index entries a Firebase listing may skip to reach a page number; deeper pages are read with next_cursor
+LISTING_MAX_PAGE_OFFSET = int(os.getenv("LISTING_MAX_PAGE_OFFSET", "1000"))
+# SQLite full-text index behind GET /pdfs?q= (empty path disables search)
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "search_index.sqlite3")
+# SQLite file of reading statistics behind /stats (empty path disables them)
+STATS_PATH = os.getenv("STATS_PATH", "reading_stats.sqlite3")
+
+# Transcription worker pool
+# Inference backend (see ENGINES in engines.py) and the Whisper model size it loads
+TRANSCRIBE_ENGINE = os.getenv("TRANSCRIBE_ENGINE", "whisper")
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")
+# Weight type of the faster-whisper engine (int8, int8_float32, float32)
+FASTER_WHISPER_COMPUTE_TYPE = os.getenv("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+# CPU time of the model-free "fake" engine (benchmarks only) per second of audio
+FAKE_ENGINE_REAL_TIME_FACTOR = float(os.getenv("FAKE_ENGINE_REAL_TIME_FACTOR", "0.1"))
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+TRANSCRIBE_QUEUE_SIZE = int(os.getenv("TRANSCRIBE_QUEUE_SIZE", "8"))
+# forkserver with preloading shares one copy of the model weights between workers
+TRANSCRIBE_START_METHOD = os.getenv(
+    "TRANSCRIBE_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+TRANSCRIBE_PRELOAD_MODEL = os.getenv("TRANSCRIBE_PRELOAD_MODEL", "true").lower() in ("1", "true", "yes")
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", str(max(1, (os.cpu_count() or 1) // TRANSCRIBE_WORKERS))))
+# Batch concurrent short recordings into one model call (1 disables batching)
+TRANSCRIBE_BATCH_SIZE = int(os.getenv("TRANSCRIBE_BATCH_SIZE", "1"))
+TRANSCRIBE_BATCH_WAIT_MS = int(os.getenv("TRANSCRIBE_BATCH_WAIT_MS", "50"))
+# On-disk cache of finished transcriptions shared by the workers (empty path disables it)
+TRANSCRIBE_CACHE_PATH = os.getenv("TRANSCRIBE_CACHE_PATH", "transcription_cache.sqlite3")
+TRANSCRIBE_CACHE_MAX_MB = int(os.getenv("TRANSCRIBE_CACHE_MAX_MB", "256"))
+# Condition decoding on the document text and language unless the upload says otherwise
+GUIDED_DECODING = os.getenv("GUIDED_DECODING", "false").lower() in ("1", "true", "yes")
+# Reference words passed as the initial prompt (Whisper keeps at most 223 prompt tokens)
+GUIDED_PROMPT_WORDS = int(os.getenv("GUIDED_PROMPT_WORDS", "50"))
+
+# Processes extracting PDF page texts in parallel
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Processes aligning transcripts against the reference text
+ALIGN_WORKERS = int(os.getenv("ALIGN_WORKERS", "1"))
+
+# Fonts for PDFs rendered from text, tried in order for every character
+# (TrueType only; the Docker image installs DejaVu and Noto)
+PDF_FONTS = [path for path in os.getenv("PDF_FONTS", ",".join([
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    *(f"/usr/share/fonts/truetype/noto/NotoSans{script}-Regular.ttf" for script in (
+        "", "Arabic", "Hebrew", "Armenian", "Georgian", "Devanagari", "Bengali", "Gurmukhi", "Gujarati",
+        "Tamil", "Telugu", "Kannada", "Malayalam", "Sinhala", "Thai", "Lao", "Khmer", "Myanmar", "Ethiopic"
+    ))
+])).split(",") if path]
+PDF_FONT_SIZE = float(os.getenv("PDF_FONT_SIZE", "11"))
+# Wrapped paragraphs kept for reuse by later renders
+PDF_LAYOUT_CACHE_SIZE = int(os.getenv("PDF_LAYOUT_CACHE_SIZE", "4096"))
+
+# Blob storage for PDF and audio files
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "local")
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "blobs")
+
+# Hosts that job webhooks may be sent to, comma-separated (".example.com" also matches subdomains);
+# when empty, any host that resolves to public addresses only
+CALLBACK_ALLOWED_HOSTS = [
+    host.strip().lower() for host in os.getenv("CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()
+]
+
+# Allow starting the sampling profiler through /debug/profiler
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Share of reference words that must be read correctly for semantic_ok
+SEMANTIC_ACCURACY_THRESHOLD = float(os.getenv("SEMANTIC_ACCURACY_THRESHOLD", "0.8"))
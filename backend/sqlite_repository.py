@@ -0,0 +1,494 @@
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from repository import PREVIEW_LENGTH, Repository, make_index_key
+
+logger = logging.getLogger(__name__)
+
+# index_key sorts by created_at, then pdf_id (see make_index_key), so it
+# serves as the created_at index and as the listing cursor
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    pdf_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    created_at REAL,
+    index_key TEXT NOT NULL,
+    text TEXT,
+    preview TEXT,
+    language TEXT,
+    page_count INTEGER,
+    recordings_count INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_index_key ON documents (index_key);
+CREATE INDEX IF NOT EXISTS documents_user_index_key ON documents (user_id, index_key);
+CREATE TABLE IF NOT EXISTS recordings (
+    audio_id TEXT PRIMARY KEY,
+    pdf_id TEXT NOT NULL REFERENCES documents (pdf_id) ON DELETE CASCADE,
+    uploader_id TEXT,
+    created_at REAL,
+    status TEXT,
+    audio_blob TEXT,
+    accuracy REAL,
+    semantic_ok INTEGER,
+    ref_end INTEGER,
+    words_count INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_pdf_created_at ON recordings (pdf_id, created_at);
+CREATE INDEX IF NOT EXISTS recordings_pdf_uploader ON recordings (pdf_id, uploader_id, created_at);
+CREATE TABLE IF NOT EXISTS words (
+    audio_id TEXT NOT NULL REFERENCES recordings (audio_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    text TEXT,
+    start_time REAL,
+    end_time REAL,
+    PRIMARY KEY (audio_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pdf_pages (
+    digest TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (digest, page)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pdf_page_counts (
+    digest TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS document_counts (
+    scope TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (scope, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    pdf_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    audio_id TEXT NOT NULL,
+    PRIMARY KEY (pdf_id, key)
+) WITHOUT ROWID;
+"""
+
+# Listing totals are kept in document_counts, one row for all documents and one per user,
+# and updated in the transaction that adds or removes a document
+_ALL_DOCUMENTS = ("all", "")
+
+# Document and recording fields kept in their own columns; the rest is stored as JSON in data
+DOCUMENT_COLUMNS = ("user_id", "created_at", "index_key", "text", "language", "page_count")
+RECORDING_COLUMNS = ("uploader_id", "created_at", "status", "audio_blob", "accuracy", "semantic_ok")
+
+
+def _walk(value: Any, path: List[str]) -> Any:
+    """Value at a path of keys (or list positions) inside a document"""
+    for key in path:
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return None
+    return value
+
+
+def _as_list(chunks: Any) -> List[Dict]:
+    """Chunks as a list; sparse arrays come out of Firebase exports as objects"""
+    if isinstance(chunks, dict):
+        return [chunks[key] for key in sorted(chunks, key=int)]
+    return [chunk for chunk in chunks or [] if chunk is not None]
+
+
+class SqliteRepository(Repository):
+    """Documents, recordings and words in a local SQLite file.
+
+    Listings and lookups are index range scans with predictable latency and
+    no network. Each thread gets its own connection; the file is in WAL
+    mode, so reads run in parallel with a single writer.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+        with self._transaction() as db:
+            counted = db.execute("SELECT 1 FROM document_counts WHERE scope = ? AND user_id = ?", _ALL_DOCUMENTS)
+            if not counted.fetchone():
+                self._recount_documents(db)  # a file created before the counters existed
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _insert_document(db: sqlite3.Connection, pdf_id: str, data: Dict) -> None:
+        recordings = data.get("audio_recordings") or {}
+        extra = {key: value for key, value in data.items() if key not in DOCUMENT_COLUMNS and key != "audio_recordings"}
+        db.execute(
+            "INSERT INTO documents (pdf_id, user_id, created_at, index_key, text, preview, language, page_count,"
+            " recordings_count, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                pdf_id, data.get("user_id"), data.get("created_at"), data["index_key"], data.get("text"),
+                (data.get("text") or "")[:PREVIEW_LENGTH], data.get("language"), data.get("page_count"),
+                sum(1 for recording in recordings.values() if not recording.get("status")),
+                json.dumps(extra, ensure_ascii=False)
+            )
+        )
+        for audio_id, recording in recordings.items():
+            SqliteRepository._insert_recording(db, pdf_id, audio_id, recording)
+        SqliteRepository._count_document(db, data.get("user_id"), 1)
+
+    @staticmethod
+    def _count_document(db: sqlite3.Connection, user_id: Optional[str], delta: int) -> None:
+        keys = [_ALL_DOCUMENTS] + ([("user", user_id)] if user_id is not None else [])
+        db.executemany(
+            "INSERT INTO document_counts (scope, user_id, count) VALUES (?, ?, ?)"
+            " ON CONFLICT (scope, user_id) DO UPDATE SET count = count + excluded.count",
+            [(*key, delta) for key in keys]
+        )
+
+    @staticmethod
+    def _recount_documents(db: sqlite3.Connection) -> None:
+        db.execute("DELETE FROM document_counts")
+        db.execute(
+            "INSERT INTO document_counts (scope, user_id, count) SELECT ?, ?, COUNT(*) FROM documents", _ALL_DOCUMENTS
+        )
+        db.execute(
+            "INSERT INTO document_counts (scope, user_id, count) SELECT 'user', user_id, COUNT(*) FROM documents"
+            " WHERE user_id IS NOT NULL GROUP BY user_id"
+        )
+
+    @staticmethod
+    def _insert_recording(db: sqlite3.Connection, pdf_id: str, audio_id: str, data: Dict) -> None:
+        chunks = _as_list(data.get("chunks"))
+        extra = {key: value for key, value in data.items() if key not in RECORDING_COLUMNS and key != "chunks"}
+        db.execute(
+            "INSERT OR REPLACE INTO recordings (audio_id, pdf_id, uploader_id, created_at, status, audio_blob,"
+            " accuracy, semantic_ok, ref_end, words_count, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                audio_id, pdf_id, data.get("uploader_id"), data.get("created_at"), data.get("status"),
+                json.dumps(data["audio_blob"]) if data.get("audio_blob") else None,
+                data.get("accuracy"), data.get("semantic_ok"), (data.get("alignment") or {}).get("ref_end"),
+                len(chunks), json.dumps(extra, ensure_ascii=False)
+            )
+        )
+        db.execute("DELETE FROM words WHERE audio_id = ?", (audio_id,))
+        SqliteRepository._insert_words(db, audio_id, 0, chunks)
+
+    @staticmethod
+    def _insert_words(db: sqlite3.Connection, audio_id: str, first_index: int, chunks: List[Dict]) -> None:
+        db.executemany(
+            "INSERT OR REPLACE INTO words (audio_id, position, text, start_time, end_time) VALUES (?, ?, ?, ?, ?)",
+            [
+                (audio_id, first_index + offset, chunk.get("text"), chunk.get("start"), chunk.get("end"))
+                for offset, chunk in enumerate(chunks)
+            ]
+        )
+
+    @staticmethod
+    def _insert_pages(db: sqlite3.Connection, digest: str, pages: List[str]) -> None:
+        db.execute("DELETE FROM pdf_pages WHERE digest = ?", (digest,))
+        db.executemany(
+            "INSERT INTO pdf_pages (digest, page, text) VALUES (?, ?, ?)",
+            [(digest, index, text) for index, text in enumerate(pages)]
+        )
+        db.execute("INSERT OR REPLACE INTO pdf_page_counts (digest, count) VALUES (?, ?)", (digest, len(pages)))
+
+    @staticmethod
+    def _document(row: sqlite3.Row) -> Dict:
+        document = {column: row[column] for column in DOCUMENT_COLUMNS if column in row.keys()}
+        if "data" in row.keys():
+            document.update(json.loads(row["data"]))
+        # Like Firebase, leave out empty values
+        return {key: value for key, value in document.items() if value is not None and value != [] and value != {}}
+
+    @staticmethod
+    def _recording(row: sqlite3.Row, chunks: Optional[List[Dict]] = None) -> Dict:
+        recording = {column: row[column] for column in RECORDING_COLUMNS}
+        recording["audio_blob"] = json.loads(row["audio_blob"]) if row["audio_blob"] else None
+        if recording["semantic_ok"] is not None:
+            recording["semantic_ok"] = bool(recording["semantic_ok"])
+        recording.update(json.loads(row["data"]))
+        if chunks:
+            recording["chunks"] = chunks
+        return {key: value for key, value in recording.items() if value is not None}
+
+    @staticmethod
+    def _chunks(rows: List[sqlite3.Row]) -> List[Dict]:
+        return [{"text": row["text"], "start": row["start_time"], "end": row["end_time"]} for row in rows]
+
+    def _recordings(self, db: sqlite3.Connection, pdf_id: str, audio_id: Optional[str] = None) -> Dict[str, Dict]:
+        """Recordings of a document (or just one of them) with their chunks"""
+        condition, params = ("pdf_id = ?", (pdf_id,)) if audio_id is None else \
+            ("pdf_id = ? AND audio_id = ?", (pdf_id, audio_id))
+        rows = db.execute(f"SELECT * FROM recordings WHERE {condition} ORDER BY created_at", params).fetchall()
+        words: Dict[str, List[sqlite3.Row]] = {}
+        for word in db.execute(
+                f"SELECT words.* FROM words JOIN recordings USING (audio_id) WHERE {condition}"
+                " ORDER BY audio_id, position", params
+        ):
+            words.setdefault(word["audio_id"], []).append(word)
+        return {row["audio_id"]: self._recording(row, self._chunks(words.get(row["audio_id"], []))) for row in rows}
+
+    def save_pdf_data(self, data: Dict, pdf_id: str, pages: Optional[List[str]] = None) -> None:
+        """Save PDF data to database"""
+        try:
+            data = {**data, "created_at": data.get("created_at") or time.time()}
+            data["index_key"] = make_index_key(data["created_at"], pdf_id)
+            with self._transaction() as db:
+                self._insert_document(db, pdf_id, data)
+                if pages is not None:
+                    self._insert_pages(db, data["pdf_blob"]["sha256"], pages)
+        except Exception as e:
+            logger.error(f"Failed to save PDF data: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to save PDF data")
+
+    def save_audio_data(
+            self,
+            pdf_id: str,
+            audio_data: Dict,
+            idempotency_key: Optional[str] = None,
+            audio_id: Optional[str] = None
+    ) -> str:
+        """Save audio data to database and bump the document's recording count"""
+        try:
+            audio_id = audio_id or str(uuid.uuid4())
+            audio_data = {**audio_data, "created_at": audio_data.get("created_at") or time.time()}
+            with self._transaction() as db:
+                self._insert_recording(db, pdf_id, audio_id, audio_data)
+                if idempotency_key:
+                    db.execute(
+                        "INSERT OR REPLACE INTO idempotency_keys (pdf_id, key, audio_id) VALUES (?, ?, ?)",
+                        (pdf_id, idempotency_key, audio_id)
+                    )
+                db.execute("UPDATE documents SET recordings_count = recordings_count + 1 WHERE pdf_id = ?", (pdf_id,))
+            return audio_id
+        except Exception as e:
+            logger.error(f"Failed to save audio data: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to save audio data")
+
+    def save_pdf_pages(self, digest: str, pages: List[str]) -> None:
+        with self._transaction() as db:
+            self._insert_pages(db, digest, pages)
+
+    def get_pdf_pages(self, digest: str, start: int = 0, end: Optional[int] = None) -> Optional[List[str]]:
+        db = self._connection()
+        row = db.execute("SELECT count FROM pdf_page_counts WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        end = row["count"] if end is None else min(end, row["count"])
+        texts = dict(db.execute(
+            "SELECT page, text FROM pdf_pages WHERE digest = ? AND page >= ? AND page < ?", (digest, start, end)
+        ).fetchall())
+        return [texts.get(index, "") for index in range(start, end)]
+
+    def start_recording(self, pdf_id: str, audio_data: Dict) -> str:
+        audio_id = str(uuid.uuid4())
+        with self._transaction() as db:
+            self._insert_recording(db, pdf_id, audio_id, {
+                **audio_data, "created_at": time.time(), "status": "transcribing"
+            })
+        return audio_id
+
+    def append_recording_chunks(self, pdf_id: str, audio_id: str, first_index: int, chunks: List[Dict]) -> None:
+        with self._transaction() as db:
+            self._insert_words(db, audio_id, first_index, chunks)
+
+    def delete_recording(self, pdf_id: str, audio_id: str) -> None:
+        with self._transaction() as db:
+            db.execute("DELETE FROM words WHERE audio_id = ?", (audio_id,))
+            db.execute("DELETE FROM recordings WHERE pdf_id = ? AND audio_id = ?", (pdf_id, audio_id))
+
+    def get_pdf(self, pdf_id: str) -> Dict:
+        """Retrieve PDF data from database"""
+        try:
+            db = self._connection()
+            row = db.execute("SELECT * FROM documents WHERE pdf_id = ?", (pdf_id,)).fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="PDF not found")
+            document = self._document(row)
+            recordings = self._recordings(db, pdf_id)
+            if recordings:
+                document["audio_recordings"] = recordings
+            return document
+        except Exception as e:
+            logger.error(f"Failed to get PDF data: {str(e)}")
+            raise
+
+    def get_pdf_fields(self, pdf_id: str, fields: List[str]) -> Dict:
+        """Retrieve only the given fields of a document, reading only the columns they need"""
+        try:
+            db = self._connection()
+            paths = [field.split("/") for field in fields]
+            columns = {
+                path[0] if path[0] in DOCUMENT_COLUMNS else "data"
+                for path in paths if path[0] != "audio_recordings"
+            }
+            row = db.execute(
+                f"SELECT {', '.join(['pdf_id', *sorted(columns)])} FROM documents WHERE pdf_id = ?", (pdf_id,)
+            ).fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="PDF not found")
+            document = self._document(row)
+
+            data = {}
+            for field, path in zip(fields, paths):
+                if path[0] == "audio_recordings":
+                    recordings = self._recordings(db, pdf_id, path[1] if len(path) > 1 else None)
+                    value = _walk(recordings, path[1:])
+                else:
+                    value = _walk(document, path)
+                if value is not None and value != {}:
+                    data[field] = value
+            return data
+        except Exception as e:
+            logger.error(f"Failed to get PDF data: {str(e)}")
+            raise
+
+    def list_recordings(self, pdf_id: str, page: int, page_size: int) -> Tuple[List[Dict], int]:
+        db = self._connection()
+        rows = db.execute(
+            "SELECT audio_id, uploader_id, created_at, audio_blob, semantic_ok, accuracy, ref_end, words_count"
+            " FROM recordings WHERE pdf_id = ? AND status IS NULL"
+            " ORDER BY created_at DESC, audio_id DESC LIMIT ? OFFSET ?",
+            (pdf_id, page_size, (page - 1) * page_size)
+        ).fetchall()
+        total = db.execute(
+            "SELECT COUNT(*) FROM recordings WHERE pdf_id = ? AND status IS NULL", (pdf_id,)
+        ).fetchone()[0]
+        items = [{
+            "audio_id": row["audio_id"],
+            "uploader_id": row["uploader_id"],
+            "created_at": row["created_at"],
+            "audio_blob": json.loads(row["audio_blob"]) if row["audio_blob"] else None,
+            "semantic_ok": None if row["semantic_ok"] is None else bool(row["semantic_ok"]),
+            "accuracy": row["accuracy"],
+            "ref_end": row["ref_end"],
+            "words_count": row["words_count"]
+        } for row in rows]
+        return items, total
+
+    def get_idempotent_audio_id(self, pdf_id: str, idempotency_key: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT audio_id FROM idempotency_keys WHERE pdf_id = ? AND key = ?", (pdf_id, idempotency_key)
+        ).fetchone()
+        return row["audio_id"] if row else None
+
+    def get_reading_position(self, pdf_id: str, uploader_id: str) -> int:
+        row = self._connection().execute(
+            "SELECT ref_end FROM recordings WHERE pdf_id = ? AND uploader_id = ? AND status IS NULL"
+            " AND ref_end IS NOT NULL ORDER BY created_at DESC LIMIT 1",
+            (pdf_id, uploader_id)
+        ).fetchone()
+        return row["ref_end"] if row else 0
+
+    def set_pdf_language(self, pdf_id: str, language: str) -> None:
+        with self._transaction() as db:
+            db.execute("UPDATE documents SET language = ? WHERE pdf_id = ?", (language, pdf_id))
+
+    def get_recording_chunks(self, pdf_id: str, audio_id: str) -> List[Dict]:
+        """Retrieve the word chunks of one recording"""
+        try:
+            db = self._connection()
+            if not db.execute(
+                    "SELECT 1 FROM recordings WHERE pdf_id = ? AND audio_id = ?", (pdf_id, audio_id)
+            ).fetchone():
+                raise HTTPException(status_code=404, detail="Recording not found")
+            return self._chunks(db.execute(
+                "SELECT text, start_time, end_time FROM words WHERE audio_id = ? ORDER BY position", (audio_id,)
+            ).fetchall())
+        except Exception as e:
+            logger.error(f"Failed to get recording chunks: {str(e)}")
+            raise
+
+    def list_pdf_summaries(
+            self,
+            page_size: int,
+            user_id: Optional[str] = None,
+            page: int = 1,
+            cursor: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str], int]:
+        """List documents newest first with an index range scan; the total is a counter row"""
+        db = self._connection()
+        conditions, params = [], []
+        if user_id:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        row = db.execute(
+            "SELECT count FROM document_counts WHERE scope = ? AND user_id = ?",
+            ("user", user_id) if user_id else _ALL_DOCUMENTS
+        ).fetchone()
+        total = row["count"] if row else 0
+        if cursor:
+            conditions.append("index_key < ?")
+            params.append(cursor)
+        offset = 0 if cursor else (page - 1) * page_size
+
+        rows = db.execute(
+            "SELECT pdf_id, user_id, preview, created_at, recordings_count, index_key FROM documents"
+            f" {'WHERE ' + ' AND '.join(conditions) if conditions else ''}"
+            " ORDER BY index_key DESC LIMIT ? OFFSET ?",
+            (*params, page_size + 1, offset)
+        ).fetchall()
+        items = [{
+            "pdf_id": row["pdf_id"],
+            "user_id": row["user_id"],
+            "text": row["preview"] or "",
+            "created_at": row["created_at"],
+            "recordings_count": row["recordings_count"]
+        } for row in rows[:page_size]]
+        next_cursor = rows[page_size - 1]["index_key"] if len(rows) > page_size else None
+        return items, next_cursor, total
+
+    def iter_documents(self) -> Iterator[Tuple[str, Dict]]:
+        pdf_ids = [row[0] for row in self._connection().execute("SELECT pdf_id FROM documents ORDER BY index_key")]
+        for pdf_id in pdf_ids:
+            yield pdf_id, self.get_pdf(pdf_id)
+
+    def import_document(self, pdf_id: str, data: Dict) -> None:
+        data = {**data, "index_key": make_index_key(data.get("created_at"), pdf_id)}
+        with self._transaction() as db:
+            row = db.execute("SELECT user_id FROM documents WHERE pdf_id = ?", (pdf_id,)).fetchone()
+            if row:
+                db.execute("DELETE FROM documents WHERE pdf_id = ?", (pdf_id,))
+                self._count_document(db, row["user_id"], -1)
+            self._insert_document(db, pdf_id, data)
+
+    def rebuild_index(self) -> int:
+        """Recompute listing keys, recording counts and document counts"""
+        with self._transaction() as db:
+            rows = db.execute("SELECT pdf_id, created_at FROM documents").fetchall()
+            db.executemany(
+                "UPDATE documents SET index_key = ? WHERE pdf_id = ?",
+                [(make_index_key(row["created_at"], row["pdf_id"]), row["pdf_id"]) for row in rows]
+            )
+            db.execute(
+                "UPDATE documents SET recordings_count = (SELECT COUNT(*) FROM recordings"
+                " WHERE recordings.pdf_id = documents.pdf_id AND recordings.status IS NULL)"
+            )
+            self._recount_documents(db)
+        return len(rows)
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# The app reads its settings on import: an in-memory database, the fake engine and no side files
+_TMP = tempfile.mkdtemp(prefix="follow_my_reading_tests_")
+os.environ.update({
+    "DATABASE_BACKEND": "memory",
+    "TRANSCRIBE_ENGINE": "fake",
+    "FAKE_ENGINE_REAL_TIME_FACTOR": "0",
+    "TRANSCRIBE_CACHE_PATH": "",
+    "SEARCH_INDEX_PATH": "",
+    "STATS_PATH": "",
+    "BLOB_STORE_PATH": os.path.join(_TMP, "blobs"),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,137 @@
+import random
+
+import pytest
+
+from alignment import (
+    INSERTION, MATCH, MAX_CELLS, OMISSION, SUBSTITUTION, align_transcript, normalize_word, reference_slice,
+    word_error_rate
+)
+from benchmarks import corpus
+
+
+def levenshtein(reference, heard):
+    previous = list(range(len(heard) + 1))
+    for i, word in enumerate(reference, 1):
+        current = [i] + [0] * len(heard)
+        for j, heard_word in enumerate(heard, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != heard_word))
+        previous = current
+    return previous[-1]
+
+
+def misread(rng, reference, error_rate):
+    """A reading of the words with omissions, substitutions and insertions from the same vocabulary"""
+    heard = []
+    for word in reference:
+        roll = rng.random()
+        if roll < error_rate:
+            continue
+        heard.append(rng.choice(reference) if roll < 2 * error_rate else word)
+        if rng.random() < error_rate:
+            heard.append(rng.choice(reference))
+    return heard
+
+
+@pytest.mark.parametrize("vocabulary", [10, 30, 1000])
+def test_alignment_cost_is_the_edit_distance(vocabulary):
+    # Small vocabularies repeat trigrams by chance, so some unique ones pair words far apart
+    rng = random.Random(vocabulary)
+    words = [f"w{index}" for index in range(vocabulary)]
+    for _ in range(150):
+        reference = [rng.choice(words) for _ in range(rng.randint(20, 200))]
+        heard = misread(rng, reference, rng.choice([0.02, 0.05, 0.1, 0.2]))
+        expected = levenshtein(reference, heard) / len(reference)
+        assert word_error_rate(" ".join(reference), " ".join(heard)) == round(expected, 4)
+
+
+
+def chunks_of(words):
+    return [{"text": f" {word}", "start": index * 0.4, "end": index * 0.4 + 0.3} for index, word in enumerate(words)]
+
+
+def test_unread_rest_of_a_short_text_is_not_omitted():
+    words = [f"word{index}" for index in range(40)]
+    alignment = align_transcript(" ".join(words), chunks_of(words[:10]))
+    assert alignment["accuracy"] == 1.0
+    assert (alignment["ref_start"], alignment["ref_end"]) == (0, 10)
+    assert not any(word["op"] == OMISSION for word in alignment["words"])
+
+
+def test_reading_without_anchors_counts_only_the_words_it_reached():
+    # Every other word: no trigram is shared, so the whole text is aligned in one table
+    words = [f"word{index}" for index in range(500)]
+    alignment = align_transcript(" ".join(words), chunks_of(words[0:20:2]))
+    assert (alignment["ref_start"], alignment["ref_end"]) == (0, 19)
+    assert sum(word["op"] == MATCH for word in alignment["words"]) == 10
+    assert sum(word["op"] == OMISSION for word in alignment["words"]) == 9
+    assert alignment["accuracy"] == round(10 / 19, 4)
+
+
+def test_errors_are_classified_with_their_times():
+    alignment = align_transcript(
+        "One two three four five six seven.", chunks_of(["one", "too", "three", "five", "six", "extra", "seven"])
+    )
+    ops = [(word["op"], word.get("ref"), word.get("heard")) for word in alignment["words"]]
+    assert ops == [
+        (MATCH, 0, "one"), (SUBSTITUTION, 1, "too"), (MATCH, 2, "three"), (OMISSION, 3, None),
+        (MATCH, 4, "five"), (MATCH, 5, "six"), (INSERTION, None, "extra"), (MATCH, 6, "seven")
+    ]
+    assert alignment["accuracy"] == round(5 / 7, 4)
+    omitted = alignment["words"][3]
+    # An omitted word gets the gap between the words heard around it
+    assert (omitted["start"], omitted["end"]) == (alignment["words"][2]["end"], alignment["words"][4]["start"])
+
+
+def test_punctuation_tokens_keep_their_number_but_are_not_aligned():
+    alignment = align_transcript("Stop — look , listen", chunks_of(["stop", "look", "listen"]))
+    assert [word["ref"] for word in alignment["words"]] == [0, 2, 4]
+    assert alignment["accuracy"] == 1.0
+
+
+def test_reading_of_a_passage_is_located_in_a_long_text():
+    words = corpus.make_text("en", 400).split()
+    read = words[2000:2150]
+    alignment = align_transcript(" ".join(words), chunks_of(read))
+    assert alignment["aligned"] is True
+    assert (alignment["ref_start"], alignment["ref_end"]) == (2000, 2150)
+    assert alignment["accuracy"] == 1.0
+
+
+def test_first_word_numbers_an_excerpt_like_the_whole_text():
+    words = [f"word{index}" for index in range(30)]
+    alignment = align_transcript(" ".join(words[10:]), chunks_of(words[10:15]), first_word=10)
+    assert (alignment["ref_start"], alignment["ref_end"]) == (10, 15)
+    assert [word["ref"] for word in alignment["words"]] == list(range(10, 15))
+
+
+def test_repeated_sentences_still_align_within_the_cell_budget():
+    # A refrain leaves no unique trigrams to anchor on
+    text = corpus.make_text("en", 100, shuffle_words=False)
+    words = text.split()
+    alignment = align_transcript(text, chunks_of(words[300:600]))
+    assert alignment["aligned"] is True
+    assert sum(word["op"] == MATCH for word in alignment["words"]) == 300
+
+
+def test_reading_of_another_text_is_left_unaligned():
+    reference = corpus.make_text("en", 400)
+    other = corpus.make_text("de", 200).split()
+    assert len(reference.split()) * len(other) > MAX_CELLS
+    alignment = align_transcript(reference, chunks_of(other))
+    assert alignment == {"aligned": False, "accuracy": 0.0, "ref_start": 0, "ref_end": 0, "words": []}
+
+
+def test_normalize_word_folds_case_and_drops_punctuation_in_any_script():
+    assert normalize_word("«Привет!»") == "привет"
+    assert normalize_word("Straße,") == "strasse"
+    assert normalize_word("—") == ""
+
+
+def test_reference_slice_counts_whitespace_tokens():
+    assert reference_slice("a b\nc  d e", 1, 3) == "b c d"
+    assert reference_slice("a b", 5, 3) == ""
+
+
+def test_word_error_rate_of_an_empty_reference():
+    assert word_error_rate("", "") == 0.0
+    assert word_error_rate("", "something") == 1.0
@@ -0,0 +1,37 @@
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+import audio_decode
+from audio_decode import AudioFormatError, decode_audio, decode_audio_stream
+from benchmarks import corpus
+
+
+def test_stream_yields_the_same_waveform_as_decode_audio():
+    audio = corpus.encode(corpus.make_waveform(3), "ogg")
+    blocks = list(decode_audio_stream(audio, block_seconds=0.5))
+    assert len(blocks) >= 6
+    np.testing.assert_array_equal(np.concatenate(blocks), decode_audio(audio))
+
+
+def test_stream_reports_ffmpeg_errors():
+    with pytest.raises(AudioFormatError) as error:
+        list(decode_audio_stream(b"not audio at all"))
+    assert str(error.value)
+
+
+def test_stream_does_not_block_on_chatty_stderr(monkeypatch):
+    # A decoder that writes more to stderr than a pipe holds before producing any audio
+    script = (
+        "import sys; sys.stderr.write('warning ' * 200000); sys.stderr.flush(); "
+        "sys.stdout.buffer.write(bytes(64000))"
+    )
+    monkeypatch.setattr(audio_decode, "_ffmpeg_command", lambda sample_rate: [sys.executable, "-c", script])
+    blocks = []
+    reader = threading.Thread(target=lambda: blocks.extend(decode_audio_stream(b"audio")), daemon=True)
+    reader.start()
+    reader.join(timeout=30)
+    assert not reader.is_alive()
+    assert sum(len(block) for block in blocks) == 32000
@@ -0,0 +1,161 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+import memory_db
+import settings
+from firebase_service import FirebaseService
+from memory_db import MemoryDatabase
+
+
+@pytest.fixture
+def service():
+    service = FirebaseService(MemoryDatabase().reference)
+    # Two users; created_at ties on purpose, pdf_id breaks them
+    for index in range(7):
+        service.save_pdf_data(
+            {"text": f"document {index}", "user_id": "alice" if index % 2 else "bob", "created_at": 100 + index // 2},
+            f"pdf{index}"
+        )
+    return service
+
+
+def ids(items):
+    return [item["pdf_id"] for item in items]
+
+
+def test_summary_index_is_newest_first_with_a_total(service):
+    items, next_cursor, total = service.list_pdf_summaries(10)
+    assert ids(items) == ["pdf6", "pdf5", "pdf4", "pdf3", "pdf2", "pdf1", "pdf0"]
+    assert (next_cursor, total) == (None, 7)
+    assert items[0] == {
+        "pdf_id": "pdf6", "user_id": "bob", "text": "document 6", "created_at": 103, "recordings_count": 0
+    }
+
+
+@pytest.mark.parametrize("user_id, expected", [
+    (None, ["pdf6", "pdf5", "pdf4", "pdf3", "pdf2", "pdf1", "pdf0"]),
+    ("alice", ["pdf5", "pdf3", "pdf1"]),
+    ("nobody", []),
+])
+def test_cursor_pages_cover_the_summary_index_once(service, user_id, expected):
+    seen, cursor = [], None
+    while True:
+        items, cursor, total = service.list_pdf_summaries(2, user_id=user_id, cursor=cursor)
+        seen += ids(items)
+        assert total == len(expected)
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_page_numbers_match_cursor_pages(service):
+    _, cursor, _ = service.list_pdf_summaries(3)
+    second, next_cursor, _ = service.list_pdf_summaries(3, cursor=cursor)
+    assert service.list_pdf_summaries(3, page=2) == (second, next_cursor, 7)
+    last, next_cursor, _ = service.list_pdf_summaries(3, page=3)
+    assert (ids(last), next_cursor) == (["pdf0"], None)
+    assert service.list_pdf_summaries(3, page=4)[:2] == ([], None)
+
+
+@pytest.fixture
+def read_limits(monkeypatch):
+    limits = []
+    limit_to_last = memory_db.MemoryQuery.limit_to_last
+
+    def record(query, limit):
+        limits.append(limit)
+        return limit_to_last(query, limit)
+
+    monkeypatch.setattr(memory_db.MemoryQuery, "limit_to_last", record)
+    return limits
+
+
+def test_pages_listed_in_order_are_read_through_the_cursor(service, read_limits):
+    pages = [ids(service.list_pdf_summaries(2, page=page)[0]) for page in range(1, 5)]
+    assert pages == [["pdf6", "pdf5"], ["pdf4", "pdf3"], ["pdf2", "pdf1"], ["pdf0"]]
+    assert read_limits == [3, 4, 4, 4]  # one page plus the cursor and a lookahead entry
+
+
+def test_deep_page_numbers_without_a_cursor_are_refused(service, monkeypatch):
+    monkeypatch.setattr(settings, "LISTING_MAX_PAGE_OFFSET", 4)
+    with pytest.raises(HTTPException) as error:
+        service.list_pdf_summaries(2, page=4)
+    assert error.value.status_code == 400
+    # Reached from the page before it, the same page is served
+    assert ids(service.list_pdf_summaries(2, page=3)[0]) == ["pdf2", "pdf1"]
+    assert ids(service.list_pdf_summaries(2, page=4)[0]) == ["pdf0"]
+
+
+def test_listing_follows_writes(service):
+    service.list_pdf_summaries(10)
+    service.save_pdf_data({"text": "newest", "user_id": "alice", "created_at": 200}, "pdf7")
+    service.save_audio_data("pdf7", {"uploader_id": "alice", "chunks": []})
+    items, _, total = service.list_pdf_summaries(10, user_id="alice")
+    assert ids(items) == ["pdf7", "pdf5", "pdf3", "pdf1"]
+    assert items[0]["recordings_count"] == 1
+    assert total == 4
+    assert service.list_pdf_summaries(10)[2] == 8
+
+
+def test_rebuild_index_restores_listing_and_totals(service):
+    service.save_audio_data("pdf3", {"uploader_id": "bob", "chunks": []})
+    expected = service.list_pdf_summaries(10)[0]
+    for ref in (service.pdf_index_ref, service.user_pdf_index_ref, service.pdf_counts_ref):
+        ref.delete()
+    service.listing_cache.clear()
+    assert service.list_pdf_summaries(10) == ([], None, 0)
+
+    assert service.rebuild_index() == 7
+    assert service.list_pdf_summaries(10) == (expected, None, 7)
+    assert service.list_pdf_summaries(10, user_id="alice")[2] == 3
+    assert service.list_pdf_summaries(10, user_id="bob")[2] == 4
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        while client.get("/readyz").status_code != 200:
+            time.sleep(0.1)
+        for index in range(5):
+            response = client.post("/upload_pdf", data={"text": f"Listed document {index}.", "user_id": "lister"})
+            assert response.status_code == 200
+        client.post("/upload_pdf", data={"text": "Someone else's document.", "user_id": "other"})
+        yield client
+
+
+def listing(client, **params):
+    response = client.get("/pdfs", params={"user_id": "lister", "only_mine": True, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_api_cursor_pages_cover_the_listing_once(client):
+    first = listing(client, page_size=2)
+    assert first["total"] == 5 and first["next_cursor"]
+    texts = [item["text"] for item in first["items"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        body = listing(client, page_size=2, cursor=cursor)
+        assert body["total"] == 5
+        texts += [item["text"] for item in body["items"]]
+        cursor = body["next_cursor"]
+    assert texts == [f"Listed document {index}." for index in reversed(range(5))]
+
+
+def test_api_page_numbers_match_cursor_pages(client):
+    first = listing(client, page_size=2)
+    by_cursor = listing(client, page_size=2, cursor=first["next_cursor"])
+    by_page = listing(client, page_size=2, page=2)
+    assert by_page["items"] == by_cursor["items"]
+    assert by_page["next_cursor"] == by_cursor["next_cursor"]
+    assert by_page["page"] == 2 and by_page["page_size"] == 2
+
+
+def test_api_lists_every_owner_without_only_mine(client):
+    body = client.get("/pdfs", params={"user_id": "lister", "page_size": 100}).json()
+    assert body["total"] >= 6
+    assert {"lister", "other"} <= {item["user_id"] for item in body["items"]}
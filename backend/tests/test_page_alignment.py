@@ -0,0 +1,77 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from alignment import MATCH, normalize_word
+from benchmarks import corpus
+from pdf_text import locate_pages
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        while client.get("/readyz").status_code != 200:
+            time.sleep(0.1)
+        yield client
+
+
+def first_word_of_page(text, pages, page):
+    """Index of the first word of text that starts on a page (1-based), counting non-space characters"""
+    before = sum(len(word) for entry in pages[:page - 1] for word in entry["text"].split())
+    seen = 0
+    for index, word in enumerate(text.split()):
+        if seen >= before:
+            return index
+        seen += len(word)
+
+
+def long_words_text():
+    # Words wider than a line are split between characters on the page
+    return "\n".join(
+        " ".join(("longword" * 12 + str(index) if index % 7 == 0 else f"word{index}") for index in range(line, line + 9))
+        for line in range(0, 1800, 9)
+    )
+
+
+def cjk_text():
+    # No spaces inside a paragraph: the renderer breaks the runs between characters
+    return "\n".join(corpus.make_text("zh", 40, seed=seed).replace("\n", "") for seed in range(12))
+
+
+@pytest.mark.parametrize("text", [corpus.make_text("en", 250), long_words_text(), cjk_text()],
+                         ids=["english", "long words", "cjk"])
+def test_page_range_reading_highlights_words_of_those_pages(client, text):
+    pdf_id = client.post("/upload_pdf", data={"text": text, "user_id": "reader"}).json()["pdf_id"]
+    pages = client.get(f"/pdf_data/{pdf_id}/pages").json()["pages"]
+    assert len(pages) >= 3
+
+    audio = corpus.encode(corpus.make_waveform(5), "ogg")
+    # Guided decoding makes the fake engine read out the start of page 2
+    response = client.post(
+        f"/upload_audio/{pdf_id}",
+        files={"audio": ("reading.ogg", audio, "audio/ogg")},
+        data={"uploader_id": "reader", "guided": "true", "pages": "2-2"}
+    )
+    assert response.status_code == 200
+    audio_id = response.json()["audio_id"]
+    alignment = client.get(f"/pdf_data/{pdf_id}/recordings/{audio_id}/alignment").json()
+
+    # The mini app highlights tokens[ref] of the whole document text
+    tokens = text.split()
+    matched = [word for word in alignment["words"] if word["op"] == MATCH]
+    assert matched
+    for word in matched:
+        assert normalize_word(tokens[word["ref"]]) == normalize_word(word["heard"])
+    first = first_word_of_page(text, pages, 2)
+    assert alignment["ref_start"] == first
+    assert [word["ref"] for word in matched] == list(range(first, first + len(matched)))
+
+
+def test_word_split_by_a_page_break_belongs_to_the_page_it_starts_on():
+    text = "one two threefour five\nsix"
+    pages = ["one two three", "four five", "six"]
+    assert locate_pages(text, pages[:2], 1) == (3, 18, 22)  # "five"
+    assert locate_pages(text, pages[:2], 0) == (0, 0, 22)
+    assert locate_pages(text, pages, 3) == (5, len(text), len(text))
@@ -0,0 +1,119 @@
+import pytest
+
+from alignment import align_transcript
+from reading_stats import ReadingStats, summarize_recording
+
+TEXT = "the cat sat on the mat"
+
+
+def chunks(words, seconds_per_word=0.5):
+    return [
+        {"text": word, "start": number * seconds_per_word, "end": (number + 1) * seconds_per_word}
+        for number, word in enumerate(words.split())
+    ]
+
+
+def recording(words, uploader_id="", created_at=1.0, seconds_per_word=0.5):
+    heard = chunks(words, seconds_per_word)
+    return {
+        "uploader_id": uploader_id,
+        "created_at": created_at,
+        "chunks": heard,
+        "alignment": align_transcript(TEXT, heard)
+    }
+
+
+@pytest.fixture
+def stats(tmp_path):
+    return ReadingStats(str(tmp_path / "stats.sqlite3"))
+
+
+def test_summary_counts_the_alignment():
+    summary = summarize_recording(recording("the cat sat on a mat", "alice"))
+    assert summary["user_id"] == "alice"
+    assert summary["accuracy"] == pytest.approx(5 / 6, abs=1e-4)
+    assert (summary["reference_words"], summary["matched"], summary["substitutions"]) == (6, 5, 1)
+    assert summary["spoken_words"] == 6
+    assert summary["speaking_seconds"] == 3.0
+    assert summary["words"]["the"] == [2, 1, 0]  # read twice, substituted once
+
+
+def test_recordings_without_alignment_are_aligned_against_the_text():
+    stored = recording("the cat sat on the mat")
+    del stored["alignment"]
+    assert summarize_recording(stored)["accuracy"] is None
+    assert summarize_recording(stored, TEXT)["accuracy"] == 1.0
+
+
+def test_unaligned_readings_count_without_accuracy(stats):
+    stored = recording("the cat sat on the mat", "alice")
+    stored["alignment"] = {"aligned": False, "accuracy": 0.0, "words": []}
+    stats.add("pdf", "a1", summarize_recording(stored))
+    result = stats.get(user_id="alice")
+    assert result["recordings"] == 1
+    assert result["accuracy"] is None
+    assert result["words"]["reference_words"] == 0
+    assert result["speaking_rate"]["words_per_minute"] == 120.0
+
+
+def test_counts_per_user_per_document_and_per_user_on_a_document(stats):
+    stats.add("pdf1", "a1", summarize_recording(recording("the cat sat on the mat", "alice", 1)))
+    stats.add("pdf1", "a2", summarize_recording(recording("the cat sat on a mat", "bob", 2)))
+    stats.add("pdf2", "a3", summarize_recording(recording("the cat sat on a mat", "alice", 3)))
+
+    assert stats.get(user_id="alice")["recordings"] == 2
+    assert stats.get(user_id="bob")["recordings"] == 1
+    assert stats.get(pdf_id="pdf1")["recordings"] == 2
+    assert stats.get(pdf_id="pdf2")["recordings"] == 1
+    assert stats.get(user_id="alice", pdf_id="pdf1")["recordings"] == 1
+    assert stats.get(user_id="bob", pdf_id="pdf2")["recordings"] == 0
+
+    alice = stats.get(user_id="alice")
+    assert alice["first_at"] == 1 and alice["last_at"] == 3
+    assert alice["accuracy"]["mean"] == pytest.approx((1 + 5 / 6) / 2, abs=1e-4)
+    assert alice["accuracy"]["last"] == pytest.approx(5 / 6, abs=1e-4)
+    assert alice["words"] == {"reference_words": 12, "matched": 11, "substitutions": 1, "omissions": 0,
+                              "insertions": 0}
+    assert [entry["audio_id"] for entry in alice["recent"]] == ["a1", "a3"]
+
+
+def test_a_recording_is_counted_once(stats):
+    summary = summarize_recording(recording("the cat sat on the mat", "alice"))
+    stats.add("pdf", "a1", summary)
+    stats.add("pdf", "a1", summary)
+    assert stats.get(user_id="alice")["recordings"] == 1
+    assert stats.get(pdf_id="pdf")["recordings"] == 1
+
+
+def test_a_recording_without_an_uploader_counts_once_for_the_document(stats):
+    stats.add("pdf", "a1", summarize_recording(recording("the cat sat on a mat")))
+    document = stats.get(pdf_id="pdf")
+    assert document["recordings"] == 1
+    assert document["words"]["reference_words"] == 6
+    assert document["misread_words"][0]["errors"] == 1
+
+
+def test_misread_words_are_ranked_by_errors(stats):
+    stats.add("pdf", "a1", summarize_recording(recording("the dog sat on a mat", "alice")))
+    stats.add("pdf", "a2", summarize_recording(recording("the dog sat on the mat", "alice")))
+    misread = stats.get(user_id="alice", pdf_id="pdf")["misread_words"]
+    assert [(word["word"], word["errors"], word["read"]) for word in misread] == [("cat", 2, 2), ("the", 1, 4)]
+    assert misread[0]["substitutions"] == 2 and misread[0]["error_rate"] == 1.0
+
+
+def test_speaking_rate_keeps_the_spread_of_recordings(stats):
+    stats.add("pdf", "a1", summarize_recording(recording("the cat sat on the mat", "alice", seconds_per_word=0.5)))
+    stats.add("pdf", "a2", summarize_recording(recording("the cat sat on the mat", "alice", seconds_per_word=1.0)))
+    rate = stats.get(user_id="alice")["speaking_rate"]
+    assert rate["words_per_minute"] == 80.0  # 12 words in 9 seconds
+    assert rate["mean"] == 90.0 and rate["stddev"] == 30.0
+
+
+def test_rebuild_replaces_the_statistics(stats):
+    stats.add("pdf", "a1", summarize_recording(recording("the cat sat on the mat", "alice")))
+    assert stats.rebuild([
+        ("pdf", "a2", summarize_recording(recording("the cat sat on a mat", "bob"))),
+        ("pdf", "a2", summarize_recording(recording("the cat sat on a mat", "bob")))
+    ]) == 1
+    assert stats.get(user_id="alice")["recordings"] == 0
+    assert stats.get(pdf_id="pdf")["recordings"] == 1
@@ -0,0 +1,93 @@
+import pytest
+
+from search_index import SearchIndex, make_match_query, parse_snippet
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"))
+    index.rebuild([
+        ("lighthouse", {"text": "The keeper of the lighthouse watched the storm.", "user_id": "alice", "created_at": 1}),
+        ("mayak", {"text": "Смотритель маяка видел шторм над морем.", "user_id": "bob", "created_at": 2}),
+        ("cafe", {"text": "Un café près de la mer, où la tempête passe.", "user_id": "alice", "created_at": 3}),
+        ("tokyo", {"text": "東京の灯台は嵐の夜も光っていた。", "user_id": "bob", "created_at": 4}),
+    ])
+    return index
+
+
+def found(index, query, **kwargs):
+    return [item["pdf_id"] for item in index.search(query, 10, **kwargs)[0]]
+
+
+def test_words_match_regardless_of_case_and_diacritics(index):
+    assert found(index, "LIGHTHOUSE") == ["lighthouse"]
+    assert found(index, "cafe pres") == ["cafe"]
+    assert found(index, "Café") == ["cafe"]
+
+
+def test_longer_words_match_as_prefixes(index):
+    assert found(index, "маяк") == ["mayak"]  # "маяка" in the text
+    assert found(index, "light") == ["lighthouse"]
+    assert found(index, "th") == []  # too short to be a prefix; "the" is not "th"
+
+
+def test_every_word_must_match(index):
+    assert found(index, "storm keeper") == ["lighthouse"]
+    assert found(index, "storm sea") == []
+
+
+def test_cjk_is_searched_as_a_phrase_of_characters(index):
+    assert found(index, "灯台") == ["tokyo"]
+    assert found(index, "台灯") == []  # the same characters in another order
+
+
+def test_operators_are_searched_as_text(index):
+    assert found(index, 'storm OR "sea" NEAR(x') == []
+    assert found(index, "keeper -storm") == ["lighthouse"]
+    assert make_match_query("!!! —") is None
+    assert index.search("!!!", 10) == ([], 0)
+
+
+def test_owner_filter(index):
+    assert found(index, "шторм", user_id="alice") == []
+    assert found(index, "шторм", user_id="bob") == ["mayak"]
+    assert found(index, "lighthouse", user_id="alice") == ["lighthouse"]
+    assert found(index, "lighthouse", user_id="bob") == []
+    # The owner column is not searched as text
+    assert found(index, "alice") == []
+
+
+def test_snippet_highlights_point_at_the_matches(index):
+    items, total = index.search("watched storm", 10)
+    assert total == 1
+    item = items[0]
+    assert [item["snippet"][start:end] for start, end in item["highlights"]] == ["watched", "storm"]
+    assert item["user_id"] == "alice" and item["text"].startswith("The keeper")
+    assert item["score"] > 0
+
+
+def test_parse_snippet_removes_markers():
+    assert parse_snippet("a \ue000bc\ue001 d\u2063e") == ("a bc de", [[2, 4]])
+
+
+def test_adding_a_document_again_replaces_its_text(index):
+    index.add("lighthouse", {"text": "A quiet harbour.", "user_id": "alice", "created_at": 1})
+    assert found(index, "lighthouse") == []
+    assert found(index, "harbour") == ["lighthouse"]
+    assert index.search("harbour", 10)[1] == 1
+
+
+def test_rebuild_drops_documents_that_are_gone(index):
+    assert index.rebuild([("cafe", {"text": "Un café près de la mer.", "user_id": "alice"})]) == 1
+    assert found(index, "lighthouse") == []
+    assert found(index, "mer") == ["cafe"]
+
+
+def test_results_are_paged_with_a_total(index):
+    for number in range(5):
+        index.add(f"storm{number}", {"text": f"storm number {number}", "created_at": 10 + number})
+    first, total = index.search("storm", 4)
+    second, _ = index.search("storm", 4, page=2)
+    assert total == 6
+    assert len(first) == 4 and len(second) == 2
+    assert not {item["pdf_id"] for item in first} & {item["pdf_id"] for item in second}
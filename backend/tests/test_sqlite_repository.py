@@ -0,0 +1,133 @@
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+from sqlite_repository import SqliteRepository
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "documents.sqlite3")
+
+
+@pytest.fixture
+def repository(path):
+    repository = SqliteRepository(path)
+    # Two users; created_at ties on purpose, pdf_id breaks them
+    for index in range(7):
+        repository.save_pdf_data(
+            {"text": f"document {index}", "user_id": "alice" if index % 2 else "bob", "created_at": 100 + index // 2},
+            f"pdf{index}"
+        )
+    return repository
+
+
+def ids(items):
+    return [item["pdf_id"] for item in items]
+
+
+def totals(repository):
+    return [repository.list_pdf_summaries(1, user_id=user_id)[2] for user_id in (None, "alice", "bob", "nobody")]
+
+
+def test_listing_is_newest_first_with_ties_broken_by_pdf_id(repository):
+    items, _, total = repository.list_pdf_summaries(10)
+    assert ids(items) == ["pdf6", "pdf5", "pdf4", "pdf3", "pdf2", "pdf1", "pdf0"]
+    assert total == 7
+    assert items[0] == {
+        "pdf_id": "pdf6", "user_id": "bob", "text": "document 6", "created_at": 103, "recordings_count": 0
+    }
+
+
+@pytest.mark.parametrize("user_id, expected", [
+    (None, ["pdf6", "pdf5", "pdf4", "pdf3", "pdf2", "pdf1", "pdf0"]),
+    ("alice", ["pdf5", "pdf3", "pdf1"]),
+])
+def test_cursor_pages_cover_the_listing_once(repository, user_id, expected):
+    seen, cursor = [], None
+    while True:
+        items, cursor, total = repository.list_pdf_summaries(2, user_id=user_id, cursor=cursor)
+        seen += ids(items)
+        assert total == len(expected)
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_page_numbers_match_cursor_pages(repository):
+    first, cursor, _ = repository.list_pdf_summaries(3)
+    second, _, _ = repository.list_pdf_summaries(3, cursor=cursor)
+    assert ids(repository.list_pdf_summaries(3, page=2)[0]) == ids(second)
+    assert ids(repository.list_pdf_summaries(3, page=3)[0]) == ["pdf0"]
+    assert repository.list_pdf_summaries(3, page=4)[0] == []
+
+
+def test_document_counts_follow_inserts_and_replacements(repository):
+    assert totals(repository) == [7, 3, 4, 0]
+    repository.save_pdf_data({"text": "anonymous"}, "anonymous")
+    assert totals(repository) == [8, 3, 4, 0]
+    # A re-imported document moves from bob to alice; a new one is added
+    repository.import_document("pdf0", {"text": "moved", "user_id": "alice", "created_at": 50})
+    repository.import_document("imported", {"text": "new", "user_id": "bob", "created_at": 60})
+    assert totals(repository) == [9, 4, 4, 0]
+
+
+def test_document_counts_are_rebuilt_for_older_files_and_by_rebuild_index(repository, path):
+    db = sqlite3.connect(path)
+    db.execute("DELETE FROM document_counts")
+    db.commit()
+    assert totals(SqliteRepository(path)) == [7, 3, 4, 0]
+
+    db.execute("UPDATE document_counts SET count = 99")
+    db.commit()
+    assert repository.rebuild_index() == 7
+    assert totals(repository) == [7, 3, 4, 0]
+    db.close()
+
+
+def test_recordings_count_towards_listing_once_saved(repository):
+    repository.save_audio_data("pdf6", {"uploader_id": "carol", "chunks": [{"text": "a", "start": 0, "end": 1}]})
+    assert repository.list_pdf_summaries(1)[0][0]["recordings_count"] == 1
+
+
+def test_streamed_recording_is_hidden_until_saved_and_deleted_on_failure(repository):
+    audio_id = repository.start_recording("pdf6", {"uploader_id": "carol"})
+    repository.append_recording_chunks("pdf6", audio_id, 0, [{"text": "one", "start": 0, "end": 1}])
+    repository.append_recording_chunks("pdf6", audio_id, 1, [{"text": "two", "start": 1, "end": 2}])
+    assert [chunk["text"] for chunk in repository.get_recording_chunks("pdf6", audio_id)] == ["one", "two"]
+    # Still transcribing: not listed, not counted, no reading position
+    assert repository.list_recordings("pdf6", 1, 10) == ([], 0)
+    assert repository.list_pdf_summaries(1)[0][0]["recordings_count"] == 0
+
+    repository.delete_recording("pdf6", audio_id)
+    assert "audio_recordings" not in repository.get_pdf("pdf6")
+    with pytest.raises(HTTPException):
+        repository.get_recording_chunks("pdf6", audio_id)
+    assert sqlite3.connect(repository.path).execute("SELECT COUNT(*) FROM words").fetchone()[0] == 0
+
+
+def test_streamed_recording_saved_in_place(repository):
+    audio_id = repository.start_recording("pdf6", {"uploader_id": "carol"})
+    repository.append_recording_chunks("pdf6", audio_id, 0, [{"text": "partial", "start": 0, "end": 1}])
+    chunks = [{"text": "one", "start": 0, "end": 1}, {"text": "two", "start": 1, "end": 2}]
+    saved = repository.save_audio_data(
+        "pdf6", {"uploader_id": "carol", "chunks": chunks, "alignment": {"ref_end": 2}}, "key", audio_id
+    )
+    assert saved == audio_id
+    items, total = repository.list_recordings("pdf6", 1, 10)
+    assert total == 1 and items[0]["audio_id"] == audio_id and items[0]["words_count"] == 2
+    assert repository.get_recording_chunks("pdf6", audio_id) == chunks
+    assert repository.get_idempotent_audio_id("pdf6", "key") == audio_id
+    assert repository.get_reading_position("pdf6", "carol") == 2
+
+
+def test_document_replacement_deletes_its_recordings_and_words(repository):
+    chunks = [{"text": "a", "start": 0, "end": 1}]
+    audio_id = repository.save_audio_data("pdf6", {"uploader_id": "carol", "chunks": chunks})
+    repository.import_document("pdf6", {"text": "replaced", "user_id": "bob", "created_at": 103})
+    assert "audio_recordings" not in repository.get_pdf("pdf6")
+    assert repository.list_pdf_summaries(1)[0][0]["recordings_count"] == 0
+    db = sqlite3.connect(repository.path)
+    assert db.execute("SELECT COUNT(*) FROM words WHERE audio_id = ?", (audio_id,)).fetchone()[0] == 0
+    db.close()
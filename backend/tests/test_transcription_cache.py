@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import transcription
+from transcription import guided_options
+from transcription_cache import TranscriptionCache
+
+TEXT = " ".join(f"word{index}" for index in range(200))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TranscriptionCache(str(tmp_path / "cache.sqlite3"), 10_000)
+
+
+@pytest.fixture
+def worker(cache, monkeypatch):
+    monkeypatch.setattr(transcription, "_cache", cache)
+    monkeypatch.setattr(transcription, "_engine", SimpleNamespace(name="fake", model_name="tiny"))
+
+
+def test_guided_recordings_share_a_key_wherever_the_reader_is(worker):
+    audio = np.zeros(1600, dtype=np.float32)
+    key = transcription._cache_key(audio, guided_options(TEXT, "en", start_word=0))
+    assert transcription._cache_key(audio, guided_options(TEXT, "en", start_word=120)) == key
+    # Options that change the transcription still do
+    assert transcription._cache_key(audio, guided_options(TEXT, "ru", start_word=0)) != key
+    assert transcription._cache_key(audio, {}) != key
+    assert transcription._cache_key(np.ones(1600, dtype=np.float32), guided_options(TEXT, "en")) != key
+
+
+def entry(words):
+    return {"text": " ".join(["word"] * words), "chunks": []}
+
+
+def stored_size(cache):
+    return cache._db.execute("SELECT COALESCE(SUM(size), 0) FROM transcriptions").fetchone()[0]
+
+
+def test_size_counter_follows_inserts_replacements_and_evictions(cache):
+    cache.put("a", entry(100))
+    cache.put("b", entry(100))
+    assert cache.stats()["size_bytes"] == stored_size(cache)
+    cache.put("a", entry(300))  # replaced, not added
+    assert cache.stats()["size_bytes"] == stored_size(cache)
+    assert cache.stats()["entries"] == 2
+
+    for index in range(20):
+        cache.put(f"key{index}", entry(200))
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert stats["size_bytes"] == stored_size(cache) <= cache.max_bytes
+    assert cache.get("a") is None and cache.get("key19") == entry(200)
+
+
+def test_size_counter_is_summed_for_older_files(cache):
+    cache.put("a", entry(100))
+    cache._db.execute("DELETE FROM counters")
+    reopened = TranscriptionCache(cache.path, cache.max_bytes)
+    assert reopened.stats()["size_bytes"] == stored_size(cache) > 0
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks import corpus
+from jobs import CallbackUrlError, check_callback_url
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        while client.get("/readyz").status_code != 200:
+            time.sleep(0.1)
+        yield client
+
+
+@pytest.fixture(scope="module")
+def pdf_id(client):
+    return client.post("/upload_pdf", data={"text": corpus.make_text("en", 20), "user_id": "reader"}).json()["pdf_id"]
+
+
+@pytest.fixture(scope="module")
+def audio():
+    return corpus.encode(corpus.make_waveform(3), "ogg")
+
+
+def upload(client, pdf_id, audio, **data):
+    return client.post(
+        f"/upload_audio/{pdf_id}",
+        files={"audio": ("reading.ogg", audio, "audio/ogg")},
+        data={"uploader_id": "reader", **data}
+    )
+
+
+def wait(client, job_id):
+    while (job := client.get(f"/jobs/{job_id}").json())["status"] not in ("done", "failed"):
+        time.sleep(0.05)
+    return job
+
+
+@pytest.mark.parametrize("mode", [{"async_job": "true"}, {"stream": "true"}])
+def test_full_queue_rejects_jobs_with_retry_after(client, pdf_id, audio, mode):
+    pool = main.app.state.services.transcription_pool
+    jobs_before = main.job_service.counts()
+    pool.pending = pool.capacity
+    try:
+        response = upload(client, pdf_id, audio, **mode)
+    finally:
+        pool.pending = 0
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert main.job_service.counts() == jobs_before
+
+
+def test_job_runs_when_the_queue_has_room(client, pdf_id, audio):
+    response = upload(client, pdf_id, audio, async_job="true")
+    assert response.status_code == 202
+    job = wait(client, response.json()["job_id"])
+    assert job["status"] == "done"
+    assert job["result"]["pdf_id"] == pdf_id
+
+
+@pytest.mark.parametrize("callback_url", [
+    "file:///etc/passwd",
+    "ftp://example.com/hook",
+    "http://localhost:8000/pdfs",
+    "http://127.0.0.1/hook",
+    "http://[::1]/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://10.0.0.5/hook",
+    "https:///no-host",
+])
+def test_callback_url_to_internal_or_odd_targets_is_rejected(client, pdf_id, audio, callback_url):
+    jobs_before = main.job_service.counts()
+    response = upload(client, pdf_id, audio, async_job="true", callback_url=callback_url)
+    assert response.status_code == 422
+    assert main.job_service.counts() == jobs_before
+
+
+def test_callback_allowlist():
+    check_callback_url("https://hooks.example.com/x", ["hooks.example.com"])
+    check_callback_url("https://a.example.com/x", [".example.com"])
+    for url in ("https://example.org/x", "https://evil-example.com/x", "http://127.0.0.1/x"):
+        with pytest.raises(CallbackUrlError):
+            check_callback_url(url, [".example.com", "hooks.example.com"])
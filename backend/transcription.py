@@ -0,0 +1,429 @@
+import os
+import math
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from alignment import reference_slice
+from audio_decode import SAMPLE_RATE, AudioFormatError, decode_audio, decode_audio_stream
+from engines import TranscriptionEngine, create_engine
+from segmentation import split_on_silence
+from transcription_cache import TranscriptionCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the last progress events of a finished job
+PROGRESS_FLUSH_TIMEOUT = 5.0
+
+# Speech recognition engine owned by the current worker process
+_engine: Optional[TranscriptionEngine] = None
+# Cache of finished transcriptions shared by the workers, if enabled
+_cache: Optional[TranscriptionCache] = None
+# Queue for progress events sent back to the API process
+_progress_queue = None
+# Key of the job currently running in this worker
+_progress_key = None
+# Decoding options that change with the reader's position in the text; cached results are shared across them
+_POSITIONAL_OPTIONS = ("initial_prompt",)
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the transcription queue has no free slots"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Transcription queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def guided_options(reference_text: str, language: Optional[str], start_word: int = 0, prompt_words: int = 50) -> Dict:
+    """Decoding options that condition Whisper on the text being read.
+
+    The prompt is the reference passage the speaker is expected to start
+    at, a known language skips detection, and a single temperature turns
+    off the fallback re-decodes.
+    """
+    options: Dict[str, Any] = {"temperature": 0.0}
+    prompt = reference_slice(reference_text, start_word, prompt_words)
+    if not prompt and start_word:
+        prompt = reference_slice(reference_text, 0, prompt_words)  # read past the end, start over
+    if prompt:
+        options["initial_prompt"] = prompt
+    if language:
+        options["language"] = language
+    return options
+
+
+def _init_worker(
+        model_name: str,
+        torch_threads: int,
+        progress_queue,
+        cache_path: Optional[str] = None,
+        cache_max_bytes: int = 0,
+        engine_name: str = "whisper"
+) -> None:
+    """Load the model once per worker process"""
+    global _engine, _progress_queue, _cache
+
+    _engine = create_engine(engine_name, model_name, torch_threads)
+    _progress_queue = progress_queue
+    _cache = TranscriptionCache(cache_path, cache_max_bytes) if cache_path else None
+    logger.info(f"Transcription worker {os.getpid()} loaded {engine_name} model '{model_name}'")
+
+
+def _worker_ready() -> int:
+    """No-op job; it only runs once the worker initializer has finished"""
+    return os.getpid()
+
+
+def _report_progress(**event) -> None:
+    """Send a progress event for the current job, if anyone listens"""
+    if _progress_key and _progress_queue is not None:
+        _progress_queue.put((_progress_key, event))
+
+
+def _end_progress() -> None:
+    """Mark the end of the current job's progress events.
+
+    Events and results travel on different pipes, so the API process waits
+    for this marker to know every event of the job has been delivered.
+    """
+    global _progress_key
+    if _progress_key and _progress_queue is not None:
+        _progress_queue.put((_progress_key, None))
+    _progress_key = None
+
+
+def transcribe_job(
+        audio_bytes: bytes,
+        options: Optional[Dict] = None,
+        progress_key: Optional[str] = None
+) -> Dict:
+    """Transcribe audio bytes inside a worker process.
+
+    options are extra whisper transcribe() arguments such as language,
+    initial_prompt or temperature.
+    """
+    def report_windows(done: int, total: int) -> None:
+        _report_progress(stage="transcribing", segments_done=done, segments_total=total)
+
+    global _progress_key
+
+    try:
+        _progress_key = progress_key
+        _report_progress(stage="decoding")
+        started = time.perf_counter()
+        audio = decode_audio(audio_bytes)
+        decoded = time.perf_counter()
+        key = _cache_key(audio, options)
+        result = _cache.get(key) if key else None
+        cached = result is not None
+        if not cached:
+            result = _engine.transcribe(audio, options or {}, progress=report_windows)
+            if key:
+                _cache.put(key, result)
+        return {**result, "timings": _timings(decoded - started, time.perf_counter() - decoded, len(audio), cached)}
+    finally:
+        _end_progress()
+
+
+def transcribe_stream_job(
+        audio_bytes: bytes,
+        options: Optional[Dict] = None,
+        progress_key: Optional[str] = None
+) -> Dict:
+    """Transcribe a long recording window by window inside a worker process.
+
+    The waveform is decoded in blocks and cut at pauses into windows of at
+    most 30 seconds, so memory does not grow with the recording length.
+    The words of each window are sent as a progress event as soon as the
+    window is done. Each window is prompted with the text of the previous
+    one, and the language detected in the first window is kept for the rest.
+    """
+    global _progress_key
+
+    options = dict(options or {})
+    segments: List[Dict] = []
+    texts: List[str] = []
+    started = time.perf_counter()
+    inference = 0.0
+    audio_seconds = 0.0
+    try:
+        _progress_key = progress_key
+        windows = split_on_silence(decode_audio_stream(audio_bytes))
+        for index, (offset, window) in enumerate(windows):
+            window_started = time.perf_counter()
+            result = _engine.transcribe(window, options)
+            inference += time.perf_counter() - window_started
+            shift = offset / SAMPLE_RATE
+            audio_seconds = shift + len(window) / SAMPLE_RATE
+            words = []
+            for segment in result["segments"]:
+                segment["id"] = len(segments) + segment["id"]
+                segment["start"] += shift
+                segment["end"] += shift
+                for word in segment.get("words", []):
+                    word["start"] += shift
+                    word["end"] += shift
+                    words.append({"text": word["word"], "start": word["start"], "end": word["end"]})
+            segments += result["segments"]
+            texts.append(result["text"])
+
+            options.setdefault("language", result["language"])
+            if result["text"].strip():
+                options["initial_prompt"] = result["text"]
+            _report_progress(
+                stage="transcribing",
+                segments_done=index + 1,
+                audio_seconds_done=round(audio_seconds, 2),
+                words=words
+            )
+    finally:
+        _end_progress()
+    # Decoding is interleaved with the windows; everything but inference counts as decoding
+    return {
+        "text": "".join(texts),
+        "segments": segments,
+        "language": options.get("language"),
+        "timings": {
+            "decode": time.perf_counter() - started - inference,
+            "inference": inference,
+            "audio_seconds": audio_seconds,
+            "cached": False
+        }
+    }
+
+
+def _timings(decode: float, inference: float, samples: int, cached: bool) -> Dict:
+    """Worker-side timings returned with a transcription for the API's metrics"""
+    return {"decode": decode, "inference": inference, "audio_seconds": samples / SAMPLE_RATE, "cached": cached}
+
+
+def _cache_key(audio, options: Optional[Dict]) -> Optional[str]:
+    """Cache key of a decoded recording, or None when the cache is disabled.
+
+    The guided prompt is left out: it is the passage at the reader's last
+    position, so a re-sent recording would otherwise miss once the position
+    moves. The prompt only steers decoding, and alignment places the words.
+    """
+    if not _cache:
+        return None
+    options = {name: value for name, value in (options or {}).items() if name not in _POSITIONAL_OPTIONS}
+    return TranscriptionCache.make_key(audio, f"{_engine.name}:{_engine.model_name}", options)
+
+
+def transcribe_batch_job(batch: List[Tuple[bytes, Optional[Dict]]]) -> List[Union[Dict, Exception]]:
+    """Transcribe several (audio bytes, options) recordings inside a worker process.
+
+    Recordings missing from the cache go to the engine in one batch per
+    distinct set of options. Each entry of the result is a transcription or
+    the exception that recording raised.
+    """
+    results: List[Union[Dict, Exception, None]] = [None] * len(batch)
+    keys: List[Optional[str]] = [None] * len(batch)
+    decode_seconds = [0.0] * len(batch)
+    pending: Dict[Tuple, List[Tuple[int, Any]]] = {}
+    for index, (audio_bytes, options) in enumerate(batch):
+        options = options or {}
+        started = time.perf_counter()
+        try:
+            audio = decode_audio(audio_bytes)
+        except AudioFormatError as e:
+            results[index] = e
+            continue
+        decode_seconds[index] = time.perf_counter() - started
+        keys[index] = _cache_key(audio, options)
+        cached = _cache.get(keys[index]) if keys[index] else None
+        if cached is not None:
+            results[index] = {**cached, "timings": _timings(decode_seconds[index], 0.0, len(audio), True)}
+        else:
+            pending.setdefault(tuple(sorted(options.items())), []).append((index, audio))
+
+    for options, items in pending.items():
+        started = time.perf_counter()
+        transcriptions = _engine.transcribe_batch([audio for _, audio in items], dict(options))
+        # The batch's inference time is split between its recordings by length
+        inference = time.perf_counter() - started
+        total_samples = sum(len(audio) for _, audio in items) or 1
+        for (index, audio), result in zip(items, transcriptions):
+            if keys[index]:
+                _cache.put(keys[index], result)
+            results[index] = {**result, "timings": _timings(
+                decode_seconds[index], inference * len(audio) / total_samples, len(audio), False
+            )}
+    return results
+
+
+class TranscriptionPool:
+    """Bounded pool of worker processes, each holding its own model"""
+
+    def __init__(
+            self,
+            model_name: str,
+            workers: int,
+            queue_size: int,
+            torch_threads: int,
+            cache_path: Optional[str] = None,
+            cache_max_bytes: int = 0,
+            engine_name: str = "whisper",
+            start_method: str = "spawn",
+            preload_model: bool = False
+    ):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self.pending = 0
+        self.ready = False
+        self._avg_job_seconds = 10.0
+        self._listeners: Dict[str, Callable[[Dict], None]] = {}
+
+        context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver" and preload_model:
+            # The fork server loads the model once; workers forked from it share the weights
+            context.set_forkserver_preload(["model_preload"])
+        self._progress_queue = context.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_name, torch_threads, self._progress_queue, cache_path, cache_max_bytes, engine_name),
+        )
+        threading.Thread(target=self._drain_progress, daemon=True).start()
+
+    async def submit(self, fn: Callable, *args, progress: Optional[Callable[[Dict], None]] = None) -> Any:
+        """Run fn(*args) in a worker, rejecting the job when the queue is full.
+
+        When progress is given, fn must accept a progress_key keyword and the
+        callback receives its progress events on the event loop.
+        """
+        if self.pending >= self.capacity:
+            raise PoolSaturatedError(self.retry_after())
+
+        self.pending += 1
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        progress_key = None
+        delivered = asyncio.Event()
+        if progress:
+            progress_key = uuid.uuid4().hex
+
+            def listener(event: Optional[Dict]) -> None:
+                # Callbacks run in order, so once the end marker is handled so is every event before it
+                if event is None:
+                    loop.call_soon_threadsafe(delivered.set)
+                else:
+                    loop.call_soon_threadsafe(progress, event)
+
+            self._listeners[progress_key] = listener
+            fn = partial(fn, progress_key=progress_key)
+        try:
+            result = await loop.run_in_executor(self._executor, fn, *args)
+            if progress_key:
+                try:
+                    await asyncio.wait_for(delivered.wait(), PROGRESS_FLUSH_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.warning("Progress events of a finished transcription did not arrive in time")
+            return result
+        finally:
+            self.pending -= 1
+            self._listeners.pop(progress_key, None)
+            # Exponential moving average of job duration, used for Retry-After
+            self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * (time.monotonic() - started)
+
+    async def warm_up(self) -> None:
+        """Start every worker and wait until each has loaded its model"""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            await asyncio.gather(*(
+                loop.run_in_executor(self._executor, _worker_ready) for _ in range(self.workers)
+            ))
+        except Exception as e:
+            logger.error(f"Transcription workers failed to start: {str(e)}")
+            return
+        self.ready = True
+        logger.info(f"Transcription workers ready in {time.monotonic() - started:.1f}s")
+
+    def worker_pids(self) -> List[int]:
+        """Process ids of the running workers"""
+        return list(self._executor._processes or {})
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a queue slot frees up"""
+        waves = (self.pending - self.capacity) / self.workers + 1
+        return max(1, math.ceil(self._avg_job_seconds * waves))
+
+    def _drain_progress(self) -> None:
+        """Forward worker progress events to their listeners"""
+        while True:
+            try:
+                key, event = self._progress_queue.get()
+            except (EOFError, OSError, ValueError):
+                return  # the queue was closed at shutdown
+            listener = self._listeners.get(key)
+            if listener:
+                listener(event)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._progress_queue.close()
+
+
+class BatchScheduler:
+    """Groups concurrent transcription requests into batches for the pool.
+
+    A batch is sent to a worker as soon as max_batch_size recordings are
+    waiting or the oldest one has waited max_wait_ms, whichever comes first.
+    """
+
+    def __init__(self, pool: TranscriptionPool, max_batch_size: int, max_wait_ms: int):
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._waiting: List[Tuple[bytes, Optional[Dict], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def transcribe(self, audio_bytes: bytes, options: Optional[Dict] = None) -> Dict:
+        """Queue a recording for the next batch and wait for its result"""
+        if self.pool.pending >= self.pool.capacity:
+            raise PoolSaturatedError(self.pool.retry_after())
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((audio_bytes, options, future))
+        if len(self._waiting) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._waiting = self._waiting[:self.max_batch_size], self._waiting[self.max_batch_size:]
+        if batch:
+            asyncio.create_task(self._run(batch))
+        if self._waiting:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+    async def _run(self, batch: List[Tuple[bytes, Optional[Dict], asyncio.Future]]) -> None:
+        try:
+            results = await self.pool.submit(
+                transcribe_batch_job,
+                [(audio_bytes, options) for audio_bytes, options, _ in batch]
+            )
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,108 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcriptions (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcriptions_last_used ON transcriptions (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class TranscriptionCache:
+    """Whisper results on local disk, least recently used evicted first.
+
+    Entries are keyed by the decoded waveform rather than the uploaded file,
+    so the same voice note re-encoded by a client still hits. The SQLite file
+    is shared by all transcription workers and survives restarts; hit and
+    miss counters and the total size of the entries live in the same file so
+    every process sees the totals.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        with self._lock, self._db:
+            # Files written before the size counter existed are summed once
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute(
+                "INSERT OR IGNORE INTO counters (name, value) "
+                "SELECT 'size_bytes', COALESCE(SUM(size), 0) FROM transcriptions"
+            )
+
+    @staticmethod
+    def make_key(audio: np.ndarray, model_name: str, options: Optional[Dict] = None) -> str:
+        """Cache key of a decoded waveform transcribed with the given model and options"""
+        digest = hashlib.sha256(np.ascontiguousarray(audio).tobytes())
+        digest.update(json.dumps([model_name, options or {}], sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a cached transcription and count the lookup"""
+        with self._lock:
+            row = self._db.execute("SELECT result FROM transcriptions WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute("UPDATE transcriptions SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._increment("hits" if row else "misses", 1)
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, result: Dict) -> None:
+        """Store a transcription and evict old entries beyond max_bytes"""
+        payload = json.dumps(result, ensure_ascii=False, default=float)
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            replaced = self._db.execute("SELECT size FROM transcriptions WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcriptions (key, result, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time())
+            )
+            self._increment("size_bytes", len(payload) - (replaced[0] if replaced else 0))
+            total = self._db.execute("SELECT value FROM counters WHERE name = 'size_bytes'").fetchone()[0]
+            if total > self.max_bytes:
+                evicted, freed = [], 0
+                for old_key, size in self._db.execute("SELECT key, size FROM transcriptions ORDER BY last_used"):
+                    if total - freed <= self.max_bytes:
+                        break
+                    evicted.append((old_key,))
+                    freed += size
+                self._db.executemany("DELETE FROM transcriptions WHERE key = ?", evicted)
+                self._increment("evictions", len(evicted))
+                self._increment("size_bytes", -freed)
+
+    def stats(self) -> Dict:
+        """Hit/miss/eviction counters plus the current size of the cache"""
+        with self._lock:
+            counters = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+            entries = self._db.execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "size_bytes": counters.get("size_bytes", 0),
+            "max_bytes": self.max_bytes
+        }
+
+    def _increment(self, name: str, amount: int) -> None:
+        self._db.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
@@ -0,0 +1,103 @@
+import asyncio
+import random
+
+import aiohttp
+
+# --- Соединения с бэкендом ---
+CONNECTION_LIMIT = 100           # всего соединений в пуле
+CONNECTION_LIMIT_PER_HOST = 32   # к одному хосту (бэкенд, api.telegram.org)
+CONNECT_TIMEOUT = 10             # секунды на установку соединения
+READ_TIMEOUT = 120               # секунды ожидания очередной порции ответа
+
+# --- Повторы ---
+RETRY_ATTEMPTS = 4
+RETRY_BACKOFF = 0.5              # секунды, удваивается с каждой попыткой
+RETRY_AFTER_LIMIT = 30           # больше не ждём, даже если сервер просит
+# Ответы, после которых запрос точно не выполнялся: повторяем любой запрос
+REJECTED_STATUSES = {429, 503}
+# Запрос мог выполниться: повторяем только идемпотентные
+FAILED_STATUSES = {500, 502, 504}
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class BackendClient:
+    """Один пул keep-alive соединений к бэкенду на всё время работы бота.
+
+    Создаётся в post_init приложения и закрывается в post_shutdown;
+    обработчики берут его из context.bot_data["api"].
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.session = None
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=CONNECTION_LIMIT, limit_per_host=CONNECTION_LIMIT_PER_HOST, ttl_dns_cache=300
+            ),
+            timeout=aiohttp.ClientTimeout(connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+
+    async def request(self, method, path, form=None, idempotent=None, **kwargs):
+        """Запрос к бэкенду с повторами; возвращает (статус, JSON или None).
+
+        form — функция, собирающая aiohttp.FormData: тело с потоком
+        читается один раз, поэтому для каждой попытки оно собирается заново.
+        GET-запросы и запросы с Idempotency-Key считаются идемпотентными.
+        """
+        if idempotent is None:
+            idempotent = method == "GET" or "Idempotency-Key" in (kwargs.get("headers") or {})
+
+        for attempt in range(RETRY_ATTEMPTS):
+            last_attempt = attempt == RETRY_ATTEMPTS - 1
+            delay = None
+            try:
+                async with self.session.request(
+                        method, self.base_url + path, data=form() if form else None, **kwargs
+                ) as resp:
+                    retry = resp.status in REJECTED_STATUSES or (idempotent and resp.status in FAILED_STATUSES)
+                    if not retry or last_attempt:
+                        return resp.status, await self._json(resp)
+                    delay = self._retry_after(resp)
+            except aiohttp.ClientConnectorError:
+                # Соединение не установлено — запрос не ушёл
+                if last_attempt:
+                    raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if last_attempt or not idempotent:
+                    raise
+
+            if delay is None:
+                delay = RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+            await asyncio.sleep(delay)
+
+    async def download(self, file):
+        """Поток байтов файла Telegram, без загрузки целиком в память"""
+        if not file.file_path.startswith("http"):
+            # Локальный Bot API сервер отдаёт путь на диске
+            yield bytes(await file.download_as_bytearray())
+            return
+        async with self.session.get(file.file_path) as resp:
+            resp.raise_for_status()
+            async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+
+    @staticmethod
+    async def _json(resp):
+        try:
+            return await resp.json(content_type=None)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _retry_after(resp):
+        try:
+            return min(float(resp.headers["Retry-After"]), RETRY_AFTER_LIMIT)
+        except (KeyError, ValueError):
+            return None
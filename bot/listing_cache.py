@@ -0,0 +1,72 @@
+import time
+import asyncio
+from collections import OrderedDict
+
+LISTING_TTL = 60         # секунды, сколько страница списка считается свежей
+LISTING_MAX_PAGES = 5000  # страниц в кеше, старые вытесняются первыми
+
+
+class ListingCache:
+    """Кеш страниц GET /pdfs с коротким TTL.
+
+    Ключ — (владелец, страница): владелец — user_id для «моих текстов» и
+    None для общего списка, который одинаков у всех пользователей.
+    Одновременные запросы одной страницы (например, предзагрузка и нажатие
+    «Далее») ждут один и тот же запрос к бэкенду.
+    """
+
+    def __init__(self, ttl=LISTING_TTL, max_pages=LISTING_MAX_PAGES):
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self.pages = OrderedDict()
+        self.pending = {}
+
+    def get(self, key):
+        entry = self.pages.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self.pages[key]
+            return None
+        self.pages.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        self.pages[key] = (time.monotonic() + self.ttl, data)
+        self.pages.move_to_end(key)
+        while len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+
+    async def get_or_fetch(self, key, fetch):
+        """Страница из кеша или результат fetch(); None (ошибка) не кешируется"""
+        data = self.get(key)
+        if data is not None:
+            return data
+        task = self.pending.get(key)
+        if task is None:
+            task = self.pending[key] = asyncio.create_task(self._fetch(key, fetch))
+        return await asyncio.shield(task)
+
+    def prefetch(self, key, fetch):
+        """Загрузить страницу в фоне, если её ещё нет"""
+        if self.get(key) is None and key not in self.pending:
+            self.pending[key] = asyncio.create_task(self._fetch(key, fetch))
+
+    def invalidate(self, user_id):
+        """Сбросить списки, в которых появится новый текст пользователя"""
+        for key in [key for key in self.pages if key[0] in (user_id, None)]:
+            del self.pages[key]
+        # Ответы, запрошенные до загрузки, в кеш уже не попадут
+        for key in [key for key in self.pending if key[0] in (user_id, None)]:
+            del self.pending[key]
+
+    async def _fetch(self, key, fetch):
+        try:
+            data = await fetch()
+            if data is not None and self.pending.get(key) is asyncio.current_task():
+                self.put(key, data)
+            return data
+        finally:
+            if self.pending.get(key) is asyncio.current_task():
+                del self.pending[key]
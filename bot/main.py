@@ -1,21 +1,33 @@
 import os
+import html
+import asyncio
+import logging
 import aiohttp
 from telegram import (
     Update, ReplyKeyboardMarkup, InlineKeyboardMarkup,
     InlineKeyboardButton, WebAppInfo, KeyboardButton
 )
+from telegram.error import BadRequest, RetryAfter, TelegramError
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, CallbackQueryHandler,
     ContextTypes, ConversationHandler, filters
 )
 
 import data
+from backend_api import BackendClient
+from listing_cache import ListingCache
+
+logger = logging.getLogger(__name__)
 
 # --- Настройки ---
 API_BASE = data.API_URL
 BOT_TOKEN = data.TOKEN  
 MINI_APP = data.MINI_APP
 
+# --- Опрос фоновых задач ---
+JOB_POLL_INTERVAL = 2  # секунды
+JOB_POLL_ATTEMPTS = 900
+
 # --- Состояния ---
 UPLOAD_PDF, UPLOAD_AUDIO = range(2)
 
@@ -76,30 +88,40 @@ async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_pdf_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = context.user_data.get("user_id", str(update.effective_user.id))
 
+    api = context.bot_data["api"]
+
     if update.message.document:
         file = await update.message.document.get_file()
-        file_bytes = await file.download_as_bytearray()
         filename = update.message.document.file_name
 
-        async with aiohttp.ClientSession() as session:
+        def form():
+            # Файл идёт из Telegram в бэкенд потоком, не оседая в памяти бота
             data = aiohttp.FormData()
-            data.add_field("file", file_bytes, filename=filename, content_type='application/pdf')
+            data.add_field("file", api.download(file), filename=filename, content_type='application/pdf')
             data.add_field("user_id", user_id)
+            return data
 
-            async with session.post(f"{API_BASE}/upload_pdf", data=data) as resp:
-                result = await resp.json()
+        status, result = await api.request("POST", "/upload_pdf", form=form)
+        if status != 200:
+            await update.message.reply_text("❌ Ошибка при загрузке PDF.", reply_markup=main_keyboard)
+            return ConversationHandler.END
+        context.bot_data["listings"].invalidate(user_id)
 
         await update.message.reply_text(f"✅ PDF загружен! ID: {result['pdf_id']}", reply_markup=main_keyboard)
         return ConversationHandler.END
 
     elif update.message.text:
-        async with aiohttp.ClientSession() as session:
+        def form():
             data = aiohttp.FormData()
             data.add_field("text", update.message.text)
             data.add_field("user_id", user_id)
+            return data
 
-            async with session.post(f"{API_BASE}/upload_pdf", data=data) as resp:
-                result = await resp.json()
+        status, result = await api.request("POST", "/upload_pdf", form=form)
+        if status != 200:
+            await update.message.reply_text("❌ Ошибка при сохранении текста.", reply_markup=main_keyboard)
+            return ConversationHandler.END
+        context.bot_data["listings"].invalidate(user_id)
 
         await update.message.reply_text(f"✅ Текст сохранён как PDF! ID: {result['pdf_id']}", reply_markup=main_keyboard)
         return ConversationHandler.END
@@ -109,22 +131,40 @@ async def handle_pdf_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return UPLOAD_PDF
 
 # --- Список PDF ---
+def fetch_listing_page(context, user_id, only_mine, page):
+    api = context.bot_data["api"]
+    listings = context.bot_data["listings"]
+    params = {"page": page, "only_mine": str(only_mine).lower(), "user_id": user_id}
+    # Курсор предыдущей страницы избавляет бэкенд от пропуска первых записей
+    previous = listings.get(listing_key(user_id, only_mine, page - 1))
+    if previous and previous.get("next_cursor"):
+        params["cursor"] = previous["next_cursor"]
+
+    async def fetch():
+        try:
+            status, data = await api.request("GET", "/pdfs", params=params)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+        return data if status == 200 else None
+
+    return fetch
+
+def listing_key(user_id, only_mine, page):
+    # Общий список одинаков для всех, поэтому хранится один раз
+    return (user_id if only_mine else None, page)
+
 async def list_pdfs(update_or_query, context, only_mine=False, page=1):
     user_id = str(update_or_query.effective_user.id)
-    is_callback = hasattr(update_or_query, 'callback_query')
-    if hasattr(update_or_query, 'callback_query') and update_or_query.callback_query:
-        message = update_or_query.callback_query.message
-    else:
-        message = update_or_query.message
+    query = update_or_query.callback_query
+    message = query.message if query else update_or_query.message
+    listings = context.bot_data["listings"]
 
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"{API_BASE}/pdfs", params={
-            "page": page,
-            "only_mine": str(only_mine).lower(),
-            "user_id": user_id
-        }) as resp:
-            data = await resp.json()
+    data = await listings.get_or_fetch(
+        listing_key(user_id, only_mine, page), fetch_listing_page(context, user_id, only_mine, page)
+    )
+    if data is None:
+        await message.reply_text("❌ Не удалось получить список текстов.")
+        return ConversationHandler.END
 
     buttons = []
     for item in data["items"]:
@@ -132,20 +172,100 @@ async def list_pdfs(update_or_query, context, only_mine=False, page=1):
             InlineKeyboardButton(item["text"][:30], callback_data=f"pdf_{item['pdf_id']}")
         ])
 
+    has_next = page * data["page_size"] < data["total"]
     nav_buttons = []
     if page > 1:
         nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"page_{page-1}_{only_mine}"))
-    if page * data["page_size"] < data["total"]:
+    if has_next:
         nav_buttons.append(InlineKeyboardButton("➡️ Далее", callback_data=f"page_{page+1}_{only_mine}"))
     if nav_buttons:
         buttons.append(nav_buttons)
 
-    await message.reply_text(
-        "📄 Найденные тексты:",
-        reply_markup=InlineKeyboardMarkup(buttons)
-    )
+    # Следующая страница грузится, пока пользователь читает эту
+    if has_next:
+        listings.prefetch(
+            listing_key(user_id, only_mine, page + 1), fetch_listing_page(context, user_id, only_mine, page + 1)
+        )
+
+    text = f"📄 Найденные тексты ({data['total']}):"
+    if query:
+        # Листание меняет то же сообщение, а не присылает новое
+        try:
+            await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(buttons))
+        except BadRequest as e:
+            if "not modified" not in str(e):
+                raise
+    else:
+        await message.reply_text(text, reply_markup=InlineKeyboardMarkup(buttons))
     return ConversationHandler.END
 
+# --- Поиск по текстам ---
+async def search_pdfs(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = " ".join(context.args)
+    if not query:
+        await update.message.reply_text("Напиши слова из текста после команды, например: /search маяк")
+        return
+    # Запрос не помещается в callback_data кнопок, поэтому листание берёт его отсюда
+    context.user_data["search_query"] = query
+    await show_search_results(update, context, query, page=1)
+
+def highlight(snippet, highlights):
+    parts, position = [], 0
+    for start, end in highlights:
+        parts.append(html.escape(snippet[position:start]))
+        parts.append(f"<b>{html.escape(snippet[start:end])}</b>")
+        position = end
+    parts.append(html.escape(snippet[position:]))
+    return "".join(parts)
+
+async def show_search_results(update_or_query, context, query, page):
+    callback_query = update_or_query.callback_query
+    message = callback_query.message if callback_query else update_or_query.message
+    api = context.bot_data["api"]
+
+    try:
+        status, data = await api.request("GET", "/pdfs", params={"q": query, "page": page})
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        status, data = None, None
+    if status != 200:
+        await message.reply_text("❌ Поиск сейчас недоступен.")
+        return
+
+    if not data["items"]:
+        await message.reply_text(f"🔎 По запросу «{query}» ничего не найдено.")
+        return
+
+    lines = [f"🔎 Найдено текстов: {data['total']}"]
+    buttons = []
+    for number, item in enumerate(data["items"], start=(page - 1) * data["page_size"] + 1):
+        lines.append(f"{number}. {highlight(item['snippet'], item['highlights'])}")
+        buttons.append([
+            InlineKeyboardButton(f"{number}. {item['text'][:30]}", callback_data=f"pdf_{item['pdf_id']}")
+        ])
+
+    nav_buttons = []
+    if page > 1:
+        nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"search_{page-1}"))
+    if page * data["page_size"] < data["total"]:
+        nav_buttons.append(InlineKeyboardButton("➡️ Далее", callback_data=f"search_{page+1}"))
+    if nav_buttons:
+        buttons.append(nav_buttons)
+
+    text = "\n\n".join(lines)
+    if callback_query:
+        await callback_query.edit_message_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(buttons))
+    else:
+        await message.reply_text(text, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(buttons))
+
+async def handle_search_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    search_query = context.user_data.get("search_query")
+    if not search_query:
+        await query.message.reply_text("Повтори поиск: /search слова из текста")
+        return
+    await show_search_results(update, context, search_query, page=int(query.data.split("_")[1]))
+
 # --- Выбор PDF ---
 async def handle_pdf_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -182,30 +302,40 @@ async def handle_audio_upload(update: Update, context: ContextTypes.DEFAULT_TYPE
     pdf_id = context.user_data.get("pdf_id")
     uploader_id = context.user_data.get("uploader_id")
 
+    api = context.bot_data["api"]
+
     if update.message.voice or update.message.audio:
         file = await update.message.voice.get_file() if update.message.voice else await update.message.audio.get_file()
-        file_bytes = await file.download_as_bytearray()
         filename = "voice.ogg" if update.message.voice else "audio.mp3"
 
-        async with aiohttp.ClientSession() as session:
+        def form():
+            # Голосовое идёт из Telegram в бэкенд потоком; при повторе скачивается заново
             data = aiohttp.FormData()
-            data.add_field("audio", file_bytes, filename=filename, content_type="audio/ogg")
+            data.add_field("audio", api.download(file), filename=filename, content_type="audio/ogg")
             data.add_field("uploader_id", uploader_id)
-
-            async with session.post(f"{API_BASE}/upload_audio/{pdf_id}", data=data) as resp:
-                if resp.status != 200:
-                    print(resp)
-                    await update.message.reply_text("❌ Ошибка при отправке аудио на сервер.")
-                    return ConversationHandler.END
-
-                result = await resp.json()
-        
-        keyboard = [
-            [InlineKeyboardButton("▶️ Послушать эту озвучку", web_app=WebAppInfo(url=f"{MINI_APP}/{pdf_id}"))],
-        ]
-
-        await update.message.reply_text("✅ Аудио загружено и проанализировано!", reply_markup=InlineKeyboardMarkup(keyboard))
-        
+            data.add_field("async_job", "true")
+            return data
+
+        # Повторно присланное голосовое сопоставляется с уже сохранённой записью
+        headers = {"Idempotency-Key": file.file_unique_id}
+        try:
+            status, result = await api.request("POST", f"/upload_audio/{pdf_id}", form=form, headers=headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status, result = None, repr(e)
+        if status not in (200, 202):
+            logger.warning(f"upload_audio failed: {status} {result}")
+            await update.message.reply_text("❌ Ошибка при отправке аудио на сервер.")
+            return ConversationHandler.END
+
+        if "job_id" in result:
+            # Анализ идёт минуты: ждём его в отдельной задаче, чтобы не держать обработчик
+            status_message = await update.message.reply_text("⏳ Аудио принято, анализирую...")
+            context.application.create_task(
+                report_job(api, result["job_id"], status_message, pdf_id), update=update
+            )
+            return ConversationHandler.END
+
+        await send_analysis_done(update.message, pdf_id)
         return ConversationHandler.END
 
     else:
@@ -213,6 +343,68 @@ async def handle_audio_upload(update: Update, context: ContextTypes.DEFAULT_TYPE
         return UPLOAD_AUDIO
 
 
+async def send_analysis_done(message, pdf_id):
+    keyboard = [
+        [InlineKeyboardButton("▶️ Послушать эту озвучку", web_app=WebAppInfo(url=f"{MINI_APP}/{pdf_id}"))],
+    ]
+    await message.reply_text("✅ Аудио загружено и проанализировано!", reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+# --- Ожидание фоновой задачи ---
+async def report_job(api, job_id, status_message, pdf_id):
+    try:
+        job = await wait_for_job(api, job_id, status_message)
+        if job["status"] == "done":
+            await send_analysis_done(status_message, pdf_id)
+        else:
+            await status_message.edit_text("❌ Ошибка при анализе аудио.")
+    except TelegramError as e:
+        logger.warning(f"Job {job_id}: could not report the result: {e}")
+
+
+async def wait_for_job(api, job_id, status_message):
+    last_text = None
+    for _ in range(JOB_POLL_ATTEMPTS):
+        try:
+            status, job = await api.request("GET", f"/jobs/{job_id}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Бэкенд недоступен: задача продолжает выполняться, спросим снова
+            logger.warning(f"Job {job_id}: poll failed: {e!r}")
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            continue
+        if status != 200:
+            return {"status": "failed"}
+
+        if job["status"] in ("done", "failed"):
+            return job
+
+        progress = job.get("progress", {})
+        text = "⏳ Аудио в очереди..." if job["status"] == "queued" else "⏳ Анализирую аудио..."
+        if progress.get("segments_total"):
+            text = f"⏳ Анализирую аудио: {progress['segments_done']}/{progress['segments_total']}"
+        if text != last_text:
+            await show_progress(status_message, text)
+            last_text = text
+
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    return {"status": "failed"}
+
+
+async def show_progress(status_message, text):
+    # Прогресс — подсказка: ошибка Telegram не должна прерывать ожидание результата
+    try:
+        await status_message.edit_text(text)
+    except RetryAfter as e:
+        # Лимит на правку сообщений: пропускаем это обновление и выжидаем
+        delay = e.retry_after
+        await asyncio.sleep(delay.total_seconds() if hasattr(delay, "total_seconds") else delay)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            logger.warning(f"Progress update failed: {e}")
+    except TelegramError as e:
+        logger.warning(f"Progress update failed: {e}")
+
 # --- Страницы (пагинация) ---
 async def handle_page_navigation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -222,9 +414,27 @@ async def handle_page_navigation(update: Update, context: ContextTypes.DEFAULT_T
     only_mine = only_mine_str == "True"
     return await list_pdfs(update, context, only_mine=only_mine, page=page)
 
+# --- Клиент бэкенда: один пул соединений на всё время работы ---
+async def post_init(application: Application):
+    api = BackendClient(API_BASE)
+    await api.start()
+    application.bot_data["api"] = api
+    application.bot_data["listings"] = ListingCache()
+
+async def post_shutdown(application: Application):
+    await application.bot_data["api"].close()
+
 # --- Запуск ---
 def main():
-    app = Application.builder().token(BOT_TOKEN).build()
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s", level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # иначе каждый запрос к Telegram попадает в лог
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     conv_handler = ConversationHandler(
         entry_points=[
@@ -240,9 +450,11 @@ def main():
 
 
     app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("search", search_pdfs))
     app.add_handler(conv_handler)
     app.add_handler(CallbackQueryHandler(handle_pdf_selection, pattern="^pdf_"))
     app.add_handler(CallbackQueryHandler(handle_page_navigation, pattern="^page_"))
+    app.add_handler(CallbackQueryHandler(handle_search_navigation, pattern="^search_"))
     app.add_handler(CallbackQueryHandler(handle_record_audio_request, pattern="^record_"))
 
 
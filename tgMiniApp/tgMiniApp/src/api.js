@@ -2,11 +2,30 @@ import axios from 'axios';
 
 const API_BASE = import.meta.env.VITE_BACKEND_URL;
 
-export const fetchPdfData = async (pdfId) => {
-    const res = await axios.get(`${API_BASE}/pdf_data/${pdfId}`);
+export const fetchPdfData = async (pdfId, fields) => {
+    const res = await axios.get(`${API_BASE}/pdf_data/${pdfId}`, {
+        params: fields ? { fields: fields.join(',') } : {},
+    });
     return res.data;
 };
 
+export const fetchRecordings = async (pdfId, pageNum, page_size = 10) => {
+    const res = await axios.get(`${API_BASE}/pdf_data/${pdfId}/recordings`, {
+        params: {
+            page: pageNum,
+            page_size,
+        },
+    });
+    return res.data;
+};
+
+// Сервер отдаёт чанки столбцами (text/start/end), собираем их обратно в объекты
+export const fetchRecordingChunks = async (pdfId, audioId) => {
+    const res = await axios.get(`${API_BASE}/pdf_data/${pdfId}/recordings/${audioId}/chunks`);
+    const { text, start, end } = res.data;
+    return text.map((word, i) => ({ text: word, start: start[i], end: end[i] }));
+};
+
 export const fetchPdfsList = async (pageNum, page_size = 5) => {
     const res = await axios.get(`${API_BASE}/pdfs`, {
         params: {
@@ -16,3 +35,10 @@ export const fetchPdfsList = async (pageNum, page_size = 5) => {
     });
     return res.data;
 };
+
+export const blobUrl = (sha256) => `${API_BASE}/blobs/${sha256}`;
+
+export const fetchRecordingAlignment = async (pdfId, audioId) => {
+    const res = await axios.get(`${API_BASE}/pdf_data/${pdfId}/recordings/${audioId}/alignment`);
+    return res.data;
+};
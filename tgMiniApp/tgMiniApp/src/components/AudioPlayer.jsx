@@ -1,8 +1,9 @@
 import React, { useEffect, useRef, useState } from 'react';
 import WaveSurfer from 'wavesurfer.js';
 import ChunkHighlighter from './ChunkHighlighter';
+import { fetchPdfData, fetchRecordingChunks, fetchRecordingAlignment } from '../api';
 
-export default function AudioPlayer({ base64, chunks, text }) {
+export default function AudioPlayer({ pdfId, audioId, src, text }) {
     const containerRef = useRef(null);
     const waveRef = useRef(null);
 
@@ -10,6 +11,8 @@ export default function AudioPlayer({ base64, chunks, text }) {
     const [isInitialized, setIsInitialized] = useState(false);
     const [currentTime, setCurrentTime] = useState(0);
     const [error, setError] = useState(null);
+    const [chunks, setChunks] = useState([]);
+    const [alignment, setAlignment] = useState(null);
 
     // Конвертация base64 → Blob
     const base64ToBlob = (b64) => {
@@ -22,9 +25,24 @@ export default function AudioPlayer({ base64, chunks, text }) {
         return new Blob([intArray], { type: 'audio/ogg' });
     };
 
-    const initWaveSurfer = () => {
+    // Старые записи хранят аудио в base64 внутри документа
+    const loadLegacyAudio = async () => {
+        const field = `audio_recordings/${audioId}/audio_file_base64`;
+        const data = await fetchPdfData(pdfId, [field]);
+        return URL.createObjectURL(base64ToBlob(data[field]));
+    };
+
+    const initWaveSurfer = async () => {
         if (!containerRef.current || isInitialized) return;
 
+        // Выравнивание считается на сервере; у старых записей его нет — тогда берём чанки
+        fetchRecordingAlignment(pdfId, audioId)
+            .then(setAlignment)
+            .catch(() => fetchRecordingChunks(pdfId, audioId).then(setChunks))
+            .catch((e) => {
+                console.error('Ошибка загрузки чанков:', e);
+            });
+
         const wave = WaveSurfer.create({
             container: containerRef.current,
             waveColor: '#ccc',
@@ -36,8 +54,8 @@ export default function AudioPlayer({ base64, chunks, text }) {
         setIsInitialized(true);
 
         try {
-            const blob = base64ToBlob(base64);
-            const url = URL.createObjectURL(blob);
+            // Файлы из хранилища отдаются с поддержкой Range
+            const url = src || (await loadLegacyAudio());
             wave.load(url);
         } catch (e) {
             console.error('Ошибка при создании Blob:', e);
@@ -93,7 +111,7 @@ export default function AudioPlayer({ base64, chunks, text }) {
 
             
             <p style={{marginTop: '35px'}}>Синхронизированный текст:</p>
-            <ChunkHighlighter text={text} currentTime={currentTime} chunks={chunks} />
+            <ChunkHighlighter text={text} currentTime={currentTime} chunks={chunks} alignment={alignment} />
 
             <hr />
         </div>
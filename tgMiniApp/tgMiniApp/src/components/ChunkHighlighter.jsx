@@ -14,17 +14,39 @@ const tokenize = (text) => {
     return tokens;
 };
 
-export default function ChunkHighlighter({ text, currentTime, chunks }) {
+const HIGHLIGHT_COLORS = {
+    match: 'rgba(255, 255, 0, 0.585)',
+    substitution: 'orange',
+    omission: 'red',
+};
+
+export default function ChunkHighlighter({ text, currentTime, chunks, alignment: serverAlignment }) {
+    // Невыровненная запись (чтение не по тексту) подсвечивается по чанкам
+    const alignment = serverAlignment && serverAlignment.aligned !== false ? serverAlignment : null;
     const tokens = useMemo(() => tokenize(text), [text]);
 
     const maxEnd = useMemo(() => {
+        if (alignment && alignment.words.length) {
+            return Math.max(...alignment.words.map((w) => w.end));
+        }
         if (!chunks || chunks.length === 0) return 0;
         return Math.max(...chunks.map((c) => c.end));
-    }, [chunks]);
+    }, [chunks, alignment]);
 
     const tokenChunks = useMemo(() => {
         let pointer = 0;
         const mapping = new Array(tokens.length).fill(null);
+
+        // Серверное выравнивание нумерует слова так же, как tokenize
+        if (alignment) {
+            alignment.words.forEach((w) => {
+                if (w.ref !== undefined && w.ref < tokens.length) {
+                    mapping[w.ref] = { start: w.start, end: w.end, op: w.op };
+                }
+            });
+            return mapping;
+        }
+
         if (!chunks || !chunks.length) return mapping;
 
         chunks.forEach((chunk) => {
@@ -43,7 +65,7 @@ export default function ChunkHighlighter({ text, currentTime, chunks }) {
                 }
                 if (match) {
                     for (let j = 0; j < chunkTokens.length; j++) {
-                        mapping[i + j] = { start: chunk.start, end: chunk.end };
+                        mapping[i + j] = { start: chunk.start, end: chunk.end, op: 'match' };
                     }
                     pointer = i + chunkTokens.length;
                     break;
@@ -51,7 +73,7 @@ export default function ChunkHighlighter({ text, currentTime, chunks }) {
             }
         });
         return mapping;
-    }, [tokens, chunks]);
+    }, [tokens, chunks, alignment]);
 
     const segments = useMemo(() => {
         const segs = [];
@@ -65,7 +87,8 @@ export default function ChunkHighlighter({ text, currentTime, chunks }) {
                     j < tokens.length &&
                     tokenChunks[j] !== null &&
                     tokenChunks[j].start === mapping.start &&
-                    tokenChunks[j].end === mapping.end
+                    tokenChunks[j].end === mapping.end &&
+                    tokenChunks[j].op === mapping.op
                 ) {
                     segText += tokens[j].word + tokens[j].space;
                     j++;
@@ -74,7 +97,8 @@ export default function ChunkHighlighter({ text, currentTime, chunks }) {
                     text: segText,
                     start: mapping.start,
                     end: mapping.end,
-                    isMatched: true,
+                    isMatched: mapping.op === 'match',
+                    op: mapping.op,
                 });
                 i = j;
             } else {
@@ -114,7 +138,7 @@ export default function ChunkHighlighter({ text, currentTime, chunks }) {
             {segments.map((seg, idx) => {
                 let backgroundColor = 'transparent';
                 if (currentTime >= seg.start && currentTime <= seg.end) {
-                    backgroundColor = seg.isMatched ? 'rgba(255, 255, 0, 0.585)' : 'red';
+                    backgroundColor = HIGHLIGHT_COLORS[seg.op] || 'red';
                 }
                 return (
                     <>
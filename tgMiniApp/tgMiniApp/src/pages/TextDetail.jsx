@@ -1,22 +1,31 @@
 import { useState, useEffect } from 'react';
 import { useParams } from 'react-router-dom';
 
-import { fetchPdfData } from '../api';
+import { fetchPdfData, fetchRecordings, blobUrl } from '../api';
 import AudioPlayer from '../components/AudioPlayer';
 import Loading from '../components/Loading';
 
 export default function TextDetail() {
     const { id: pdfId } = useParams();
     const [data, setData] = useState(null);
+    const [recordings, setRecordings] = useState([]);
+    const [recordingsPage, setRecordingsPage] = useState(1);
+    const [recordingsTotal, setRecordingsTotal] = useState(0);
 
     useEffect(() => {
         if (!pdfId) return;
-        fetchPdfData(pdfId).then(setData);
+        fetchPdfData(pdfId, ['text']).then(setData);
     }, [pdfId]);
 
-    if (!data) return <Loading />;
+    useEffect(() => {
+        if (!pdfId) return;
+        fetchRecordings(pdfId, recordingsPage).then(({ items, total }) => {
+            setRecordings((prev) => (recordingsPage === 1 ? items : [...prev, ...items]));
+            setRecordingsTotal(total);
+        });
+    }, [pdfId, recordingsPage]);
 
-    const recordings = Object.values(data.audio_recordings || {});
+    if (!data) return <Loading />;
 
     return (
         <div style={{ padding: '20px' }}>
@@ -27,15 +36,22 @@ export default function TextDetail() {
             {recordings.length === 0 ? (
                 <p>Нет доступных аудио.</p>
             ) : (
-                recordings.map((rec, i) => (
+                recordings.map((rec) => (
                     <AudioPlayer
-                        key={i}
-                        base64={rec.audio_file_base64}
-                        chunks={rec.chunks}
+                        key={rec.audio_id}
+                        pdfId={pdfId}
+                        audioId={rec.audio_id}
+                        src={rec.audio_blob ? blobUrl(rec.audio_blob.sha256) : null}
                         text={data.text}
                     />
                 ))
             )}
+
+            {recordings.length < recordingsTotal && (
+                <button onClick={() => setRecordingsPage(recordingsPage + 1)}>
+                    Показать ещё
+                </button>
+            )}
         </div>
     );
 }